@@ -46,7 +46,7 @@ def _disambiguate_column_names(column_header, info_header):
     return ["INFO_" + i for i in info_header] if overlap else info_header
 
 #TODO: cgates: suspect this could be simplified?
-def _create_row_dict(column_list, vcf_record):
+def _create_row_dict(column_list, vcf_record, sample_matrix=None):
     row_dict = {"CHROM" : vcf_record.chrom,
                 "POS" : vcf_record.pos,
                 "ID" : vcf_record.vcf_id,
@@ -55,10 +55,20 @@ def _create_row_dict(column_list, vcf_record):
                 "QUAL" : vcf_record.qual,
                 "FILTER" : vcf_record.filter}
 
-    for sample_name in column_list[9:]:
-        format_key_values = vcf_record.sample_tag_values[sample_name]
-        for format_key, format_value in format_key_values.items():
-            row_dict[format_key + "|" + sample_name] = format_value
+    if sample_matrix is None:
+        for sample_name in column_list[9:]:
+            if sample_name not in vcf_record.sample_tag_values:
+                continue
+            format_key_values = vcf_record.sample_tag_values[sample_name]
+            for format_key, format_value in format_key_values.items():
+                row_dict[format_key + "|" + sample_name] = format_value
+    else:
+        for sample_name, values in zip(sample_matrix.sample_names,
+                                       sample_matrix.values.tolist()):
+            for format_key, format_value in zip(sample_matrix.tag_names,
+                                                values):
+                if format_value:
+                    row_dict[format_key + "|" + sample_name] = format_value
 
     for (name, value) in vcf_record.info_dict.items():
         if name in row_dict:
@@ -67,6 +77,31 @@ def _create_row_dict(column_list, vcf_record):
 
     return row_dict
 
+def _records_and_matrices(vcf_reader, include):
+    '''Pairs each record with its SampleMatrix (None without NumPy).'''
+    if vcf.numpy is None:
+        return ((vcf_record, None)
+                for vcf_record in vcf_reader.vcf_records(**include))
+    return ((sample_matrix.vcf_record, sample_matrix)
+            for sample_matrix in vcf_reader.sample_matrices(**include))
+
+def _build_projection(vcf_reader, columns):
+    '''Returns vcf_records include_ arguments for the selected columns.'''
+    selected_columns = set(columns)
+    format_tags = set()
+    sample_names = set()
+    for format_tag in vcf_reader.format_metaheaders:
+        for sample_name in vcf_reader.sample_names:
+            if format_tag + "|" + sample_name in selected_columns:
+                format_tags.add(format_tag)
+                sample_names.add(sample_name)
+    info_fields = set(info_tag for info_tag in vcf_reader.info_metaheaders
+                      if info_tag in selected_columns
+                      or "INFO_" + info_tag in selected_columns)
+    return {"include_format_tags": format_tags,
+            "include_info": info_fields,
+            "include_samples": sample_names}
+
 def _filter_column_list(column_spec_list,
                         potential_col_list,
                         column_spec_filename):
@@ -226,11 +261,17 @@ def execute(args, dummy_execution_context):
 
     file_writer.write("#" + "\t".join(columns) + "\n")
 
+    include = {}
+    if col_spec:
+        include = _build_projection(vcf_reader, columns)
+
     line_count = 0
     vcf_reader.open()
-    for vcf_record in vcf_reader.vcf_records():
+    for vcf_record, sample_matrix in _records_and_matrices(vcf_reader,
+                                                           include):
         row_dict = _create_row_dict(vcf_reader.split_column_header,
-                                    vcf_record)
+                                    vcf_record,
+                                    sample_matrix)
 
         new_line = []
         for col in columns:
@@ -2,7 +2,7 @@
 
 * Merge assumes the incoming VCFs are aligned to the same set of contigs.
 * Merge assumes incoming VCFs names follow this pattern:
-    patientIdentifier.*.vcf
+    patientIdentifier.*.vcf (or patientIdentifier.*.vcf.gz)
     Specifically, the first element of the VCF file name should be the patient
     name; for example you mihght have this:
         patientA.mutect.vcf, patientA.strelka.vcf, patientA.varscan.vcf,
@@ -31,12 +31,23 @@ from __future__ import print_function, absolute_import, division
 
 from collections import defaultdict, OrderedDict
 import glob
+import gzip
+import heapq
+import itertools
+import multiprocessing
 import os
 import re
+import signal
+import sys
 
 import natsort
 import textwrap
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 import jacquard.utils.logger as logger
 import jacquard.utils.utils as utils
 from jacquard.utils.vcf import FileWriter
@@ -52,51 +63,12 @@ _MULT_ALT_HEADER = ('##INFO=<ID={},Number=0,Type=Flag,'
                     'locus.">').format(_MULT_ALT_TAG)
 _FILE_FORMAT = ["##fileformat=VCFv4.1"]
 _FILE_OUTPUT_SUFFIX = "merged"
-
-class _BufferedReader(object):
-    """A look-ahead reader that expedites merging.
-
-    Accepts an iterator and returns element (advancing current element) if
-    requested element equals next element in collection and None otherwise.
-    Never returns StopIteration so cannot be used as iteration control-flow.
-
-    This behavior is useful only because VcfRecord equality is based on their
-    coordinate (chrom, pos, ref, alt), so by iterating over a list of
-    coordinates, you can either park on your next record or return the
-    current record and advance the reader to the next.
-
-    Each incoming VcfReader is wrapped in a a BufferedReader and readers are
-    advanced to the next reader when their current coordinate is requested.
-    This approach avoids reading all VCFs into memory, but does require a file
-    handle for each VCF you are merging and also requires that VcfReaders are
-    sorted identically.
-
-    Stylistic note:
-    This class must capture the state of the incoming iterator and provide
-    modified behavior based on data in that iterator. A small class works ok,
-    but suspect there may be a more pythonic way to curry iterator in a
-    partial function. Uncertain if that would be clearer/simpler. [cgates]
-    """
-    #pylint: disable=too-few-public-methods
-    def __init__(self, iterator):
-        self._iterator = iterator
-        try:
-            self._current_element = next(self._iterator)
-        except StopIteration:
-            self._current_element = self._iterator
-
-    def next_if_equals(self, requested_element):
-        result = None
-        if requested_element == self._current_element:
-            result = self._current_element
-            self._current_element = self._get_next()
-        return result
-
-    def _get_next(self):
-        try:
-            return next(self._iterator)
-        except StopIteration:
-            return None
+_DEFAULT_HANDLE_POOL_SIZE = 512
+_RESERVED_FILE_HANDLES = 64
+_DEFAULT_SORT_MEMORY = 512
+# Approximate bytes held per sorted line beyond its text (key, ref/alt, etc.)
+_SORT_LINE_OVERHEAD = 200
+_MAX_SORT_RUNS = 64
 
 class MergeVcfReader(vcf.VcfReader):
     def __init__(self, file_reader):
@@ -107,25 +79,14 @@ class MergeVcfReader(vcf.VcfReader):
         updated_metaheader = re.sub(r'(^##FORMAT=.*?[<,]ID=)([^,>]*)',
                                     r'\g<1>%s' % transformed_tag,
                                     original_metaheader)
-
-        self.metaheaders.append(updated_metaheader)
-        if original_metaheader in self.metaheaders:
-            self.metaheaders.remove(original_metaheader)
+        self.replace_metaheader(original_metaheader, updated_metaheader)
 
     def store_format_tags(self, original_tag, new_tag):
         self.format_tags[original_tag] = new_tag
 
-    @staticmethod
-    def modify_format_tag(vcf_record, format_tags):
-        for tags in list(vcf_record.sample_tag_values.values()):
-            for original_tag, new_tag in list(format_tags.items()):
-                if new_tag not in tags and original_tag in tags:
-                    tags[new_tag] = tags[original_tag]
-                    del tags[original_tag]
-
-        return vcf_record
-
-    def vcf_records(self, format_tags=None, qualified=False):
+    def vcf_records(self, format_tags=None, qualified=False,
+                    include_format_tags=None, include_info=None,
+                    include_samples=None):
         """Generates parsed VcfRecord objects.
 
         Typically called in a for loop to process each vcf record in a
@@ -133,7 +94,12 @@ class MergeVcfReader(vcf.VcfReader):
         complete. Skips all headers.
 
         Args:
+            format_tags: dict of original->disambiguated FORMAT tag names;
+                applied once per distinct FORMAT string rather than per record
             qualified: When True, sample names are prefixed with file name
+            include_format_tags, include_info, include_samples: projections
+                (see vcf.VcfReader.vcf_records); FORMAT tags are matched
+                after disambiguation
 
         Returns:
             Parsed VcfRecord
@@ -142,18 +108,12 @@ class MergeVcfReader(vcf.VcfReader):
             StopIteration: when reader is exhausted.
             TypeError: if reader is closed.
         """
-        if qualified:
-            sample_names = self.qualified_sample_names
-        else:
-            sample_names = self.sample_names
-
-        for line in self._file_reader.read_lines():
-            if line.startswith("#"):
-                continue
-            vcf_record = vcf.VcfRecord.parse_record(line, sample_names)
-            if format_tags:
-                vcf_record = self.modify_format_tag(vcf_record, format_tags)
-            yield vcf_record
+        #pylint: disable=too-many-arguments
+        format_layouts = self.format_layouts(format_tags, include_format_tags)
+        return self._parse_records(format_layouts,
+                                   qualified,
+                                   include_info,
+                                   include_samples)
 
 
 class _Filter(object):
@@ -410,44 +370,102 @@ def _create_vcf_readers(file_readers):
 
     return merge_vcf_readers
 
-def _create_buffered_readers(vcf_readers):
-    buffered_readers = []
+def _handle_pool_size():
+    """Returns how many inputs merge may hold open at once."""
+    if resource is None:
+        return _DEFAULT_HANDLE_POOL_SIZE
+    soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if soft_limit == resource.RLIM_INFINITY:
+        return _DEFAULT_HANDLE_POOL_SIZE
+    return max(1, soft_limit - _RESERVED_FILE_HANDLES)
+
+def _open_vcf_records(vcf_readers,
+                      handle_pool_size=None,
+                      include_format_tags=None):
+    """Opens readers for merging; returns an iterator of records per reader.
+
+    Readers share a handle pool if they do not fit. Incoming INFO is never
+    merged, so it is dropped as records are parsed, as are FORMAT tags
+    outside include_format_tags (if specified).
+    """
+    if handle_pool_size is None:
+        handle_pool_size = _handle_pool_size()
+    handle_pool = None
+    if len(vcf_readers) > handle_pool_size:
+        logger.debug("Merging [{}] files through a pool of [{}] file handles",
+                     len(vcf_readers),
+                     handle_pool_size)
+        handle_pool = vcf.FileHandlePool(handle_pool_size)
+
+    record_iterators = []
     for vcf_reader in vcf_readers:
+        if handle_pool is not None:
+            if not vcf_reader.resumes_cheaply():
+                logger.warning("Input [{}] is gzipped but not BGZF, so it is "
+                               "re-inflated each time its file handle is "
+                               "reopened; recompress it with bgzip to merge "
+                               "it faster.",
+                               vcf_reader.file_name)
+            vcf_reader.use_handle_pool(handle_pool)
         vcf_reader.open()
-        records = vcf_reader.vcf_records(vcf_reader.format_tags, qualified=True)
-        buffered_readers.append(_BufferedReader(records))
-
-    return buffered_readers
+        records = vcf_reader.vcf_records(vcf_reader.format_tags,
+                                         qualified=True,
+                                         include_format_tags=include_format_tags,
+                                         include_info=())
+        record_iterators.append(records)
 
-def _build_coordinates(vcf_readers):
-    coordinate_set = set()
-    mult_alts = defaultdict(set)
+    return record_iterators
 
-    for i, vcf_reader in enumerate(vcf_readers):
-        logger.info("Reading [{}] ({}/{})",
-                    os.path.basename(vcf_reader.file_name),
-                    i + 1,
-                    len(vcf_readers))
-        try:
-            vcf_reader.open()
-
-            for vcf_record in vcf_reader.vcf_records():
-                coordinate_set.add(vcf_record.get_empty_record())
-                ref_alt = vcf_record.ref, vcf_record.alt
-                locus = vcf_record.chrom, vcf_record.pos
-                mult_alts[locus].add(ref_alt)
-        finally:
-            vcf_reader.close()
-
-    for vcf_record in coordinate_set:
-        ref_alts_for_this_locus = mult_alts[vcf_record.chrom, vcf_record.pos]
-        inferred_mult_alt = len(ref_alts_for_this_locus) > 1
-        explicit_mult_alt = "," in next(iter(ref_alts_for_this_locus))[1]
+def _included_format_tags(vcf_readers, format_tags_to_keep):
+    """Returns FORMAT tags merge reads: those kept plus somatic tags."""
+    included_tags = set(format_tags_to_keep)
+    for vcf_reader in vcf_readers:
+        included_tags.update(tag for tag in vcf_reader.format_tags.values()
+                             if re.search(_JQ_SOMATIC_TAG, tag))
+    return included_tags
 
-        if inferred_mult_alt or explicit_mult_alt:
-            vcf_record.add_info_field(_MULT_ALT_TAG)
+def _locus_coordinates(locus_records):
+    """Yields (coordinate, records) for each coordinate at a single locus.
 
-    return sorted(list(coordinate_set))
+    Coordinates are flagged as multi-alt if the locus has more than one
+    ref/alt or a comma-separated alt.
+    """
+    ref_alts = set((record.ref, record.alt) for record in locus_records)
+    mult_alt = len(ref_alts) > 1 or "," in locus_records[0].alt
+    coordinate_records = []
+    for vcf_record in locus_records:
+        if coordinate_records and vcf_record != coordinate_records[0]:
+            yield _flag_coordinate(coordinate_records[0], mult_alt), \
+                  coordinate_records
+            coordinate_records = []
+        coordinate_records.append(vcf_record)
+    yield _flag_coordinate(coordinate_records[0], mult_alt), coordinate_records
+
+def _flag_coordinate(vcf_record, mult_alt):
+    coordinate = vcf_record.get_empty_record()
+    if mult_alt:
+        coordinate.add_info_field(_MULT_ALT_TAG)
+    return coordinate
+
+def _merge_coordinates(record_iterators):
+    """Yields (coordinate, records) for each distinct coordinate in order.
+
+    Each iterator must be sorted; they are merged through a heap (as in
+    heapq.merge), so only the records at the current locus are held in
+    memory. Records at a coordinate are listed in iterator order.
+    """
+    locus_records = []
+    for vcf_record in heapq.merge(*record_iterators):
+        #pylint: disable=protected-access
+        if locus_records and \
+                vcf_record._key[0:2] != locus_records[0]._key[0:2]:
+            for coordinate_records in _locus_coordinates(locus_records):
+                yield coordinate_records
+            locus_records = []
+        locus_records.append(vcf_record)
+    if locus_records:
+        for coordinate_records in _locus_coordinates(locus_records):
+            yield coordinate_records
 
 def _write_headers(reader, file_writer):
     headers = reader.metaheaders
@@ -455,57 +473,242 @@ def _write_headers(reader, file_writer):
 
     file_writer.write("\n".join(headers) + "\n")
 
-def _sort_vcf(reader, sorted_dir):
-    vcf_records = []
-    reader.open()
-    for vcf_record in reader.vcf_records():
-        vcf_records.append(vcf_record)
+def _sort_line_key(line):
+    fields = line.split("\t", 5)
+    return vcf.VcfRecord.sort_key(fields[0], fields[1], fields[3], fields[4])
+
+if sys.version_info[0] < 3:
+    def _encode_run_line(line):
+        return line
+
+    def _decode_run_line(data):
+        return data
+else:
+    def _encode_run_line(line):
+        return line.encode("utf8")
+
+    def _decode_run_line(data):
+        return data.decode("utf8")
+
+def _open_sort_run(run_path, mode, compress):
+    if compress:
+        return gzip.open(run_path, mode + "b", 1)
+    return open(run_path, mode + "b")
+
+def _write_sort_run(lines, run_path, compress):
+    with _open_sort_run(run_path, "w", compress) as run_file:
+        for line in lines:
+            run_file.write(_encode_run_line(line + "\n"))
+
+def _read_sort_run(run_path, run_index, compress):
+    """Generates (key, run_index, line); run_index keeps merging stable."""
+    with _open_sort_run(run_path, "r", compress) as run_file:
+        for line in run_file:
+            line = _decode_run_line(line[:-1])
+            yield _sort_line_key(line), run_index, line
+
+def _merge_sort_runs(run_paths, compress):
+    runs = [_read_sort_run(run_path, i, compress)
+            for i, run_path in enumerate(run_paths)]
+    for dummy_key, dummy_run_index, line in heapq.merge(*runs):
+        yield line
+
+def _sorted_lines(lines, run_prefix, sort_memory, compress=False):
+    """Generates lines in VcfRecord order, using at most ~sort_memory bytes.
+
+    Lines are sorted in runs that fit in sort_memory. If there is more than
+    one run, each is spilled to a temp file (run_prefix plus a suffix;
+    gzipped if compress) and the runs are merged back, at most
+    _MAX_SORT_RUNS at a time. Lines with equal keys keep their order.
+    Temp files are removed once merged.
+    """
+    run_names = ("{}.{}.run".format(run_prefix, i) for i in itertools.count())
+    run_paths = []
+    run = []
+    run_size = 0
+    for line in lines:
+        run.append((_sort_line_key(line), line))
+        run_size += len(line) + _SORT_LINE_OVERHEAD
+        if run_size >= sort_memory:
+            run.sort(key=lambda key_line: key_line[0])
+            run_paths.append(next(run_names))
+            _write_sort_run((line for dummy, line in run),
+                            run_paths[-1],
+                            compress)
+            run = []
+            run_size = 0
+    run.sort(key=lambda key_line: key_line[0])
+    if not run_paths:
+        for dummy, line in run:
+            yield line
+        return
+    if run:
+        run_paths.append(next(run_names))
+        _write_sort_run((line for dummy, line in run), run_paths[-1], compress)
+    del run
+
+    while len(run_paths) > _MAX_SORT_RUNS:
+        merged_paths = run_paths[0:_MAX_SORT_RUNS]
+        run_paths = [next(run_names)] + run_paths[_MAX_SORT_RUNS:]
+        _write_sort_run(_merge_sort_runs(merged_paths, compress),
+                        run_paths[0],
+                        compress)
+        for merged_path in merged_paths:
+            os.remove(merged_path)
 
-    reader.close()
-    vcf_records.sort()
-    writer = FileWriter(os.path.join(sorted_dir,
-                                     reader.file_name))
+    try:
+        for line in _merge_sort_runs(run_paths, compress):
+            yield line
+    finally:
+        for run_path in run_paths:
+            os.remove(run_path)
+
+def _sort_vcf(reader,
+              sorted_dir,
+              sort_memory=_DEFAULT_SORT_MEMORY,
+              compress=False):
+    """Writes a sorted copy of reader to sorted_dir; returns its reader.
+
+    Records are sorted by their raw fields, in memory if they fit in
+    sort_memory (MB) and otherwise through temp files in sorted_dir
+    (gzipped if compress). The copy is always plain text, so compressed
+    inputs are written under a plain ".vcf" name.
+    """
+    root, _ = vcf.split_vcf_extension(reader.file_name)
+    writer = FileWriter(os.path.join(sorted_dir, root + ".vcf"))
     writer.open()
-    writer.write("\n".join(reader.metaheaders) + "\n")
-    writer.write(reader.column_header + "\n")
-    for vcf_record in vcf_records:
-        writer.write(vcf_record.text())
+    reader.open()
+    try:
+        writer.write("\n".join(reader.metaheaders) + "\n")
+        writer.write(reader.column_header + "\n")
+        run_prefix = os.path.join(sorted_dir, reader.file_name)
+        for line in _sorted_lines(reader.record_lines(),
+                                  run_prefix,
+                                  sort_memory * 1024 * 1024,
+                                  compress):
+            writer.write(line + "\n")
+    finally:
+        reader.close()
+        writer.close()
+    return _sorted_copy_reader(writer.output_filepath, reader.file_name)
+
+def _sorted_copy_reader(sorted_filepath, file_name):
+    """Reads a sorted copy under the file name of the input it came from.
 
-    writer.close()
-    reader = MergeVcfReader(vcf.FileReader(writer.output_filepath))
-    return reader
+    Patient prefixes and the merge Source metaheaders come from file_name,
+    so they name the user's input (e.g. "A.vcf.gz") rather than the copy.
+    """
+    file_reader = vcf.FileReader(sorted_filepath)
+    file_reader.file_name = file_name
+    return MergeVcfReader(file_reader)
+
+def _first_unsorted_position(vcf_reader):
+    """Returns (chrom, pos) of the first out-of-order record or None."""
+    previous_key = None
+    vcf_reader.open()
+    try:
+        for line in vcf_reader.record_lines():
+            key = _sort_line_key(line)
+            if previous_key is not None and key < previous_key:
+                return tuple(line.split("\t", 2)[0:2])
+            previous_key = key
+    finally:
+        vcf_reader.close()
+    return None
+
+def _first_unsorted_position_of_file(input_filepath):
+    reader = MergeVcfReader(vcf.FileReader(input_filepath))
+    return _first_unsorted_position(reader)
+
+def _sort_file(sort_args):
+    input_filepath, sorted_dir, sort_memory, compress = sort_args
+    reader = _sort_vcf(MergeVcfReader(vcf.FileReader(input_filepath)),
+                       sorted_dir,
+                       sort_memory,
+                       compress)
+    return reader.input_filepath
+
+def _init_pool_worker():
+    """Leaves interrupts to the parent and lets terminate stop workers."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _pool_imap(function, items, processes):
+    """Generates function(item) for each item in order using a process pool.
+
+    Function and items must be picklable, so workers are given file paths
+    rather than readers. The pool is closed and joined once the last result
+    arrives; it is only terminated if the caller stops early or fails.
+    """
+    remaining = len(items)
+    pool = multiprocessing.Pool(processes, _init_pool_worker)
+    finished = False
+    try:
+        results = pool.imap(function, items)
+        pool.close()
+        for result in results:
+            remaining -= 1
+            if not remaining:
+                pool.join()
+                finished = True
+            yield result
+        if not finished:
+            pool.join()
+            finished = True
+    finally:
+        if not finished:
+            pool.terminate()
+            pool.join()
 
-def _get_unsorted_readers(vcf_readers):
+def _get_unsorted_readers(vcf_readers, processes=1):
     unsorted_readers = []
+    if processes > 1:
+        input_filepaths = [reader.input_filepath for reader in vcf_readers]
+        positions = _pool_imap(_first_unsorted_position_of_file,
+                               input_filepaths,
+                               processes)
+    else:
+        positions = (_first_unsorted_position(reader)
+                     for reader in vcf_readers)
     for i, reader in enumerate(vcf_readers):
         logger.info("Checking sort order of [{}] ({}/{})",
                     reader.file_name,
                     i+1,
                     len(vcf_readers)
                     )
-        previous_record = None
-        reader.open()
-        for vcf_record in reader.vcf_records():
-            if previous_record and vcf_record < previous_record:
-                logger.debug("VCF file:chrom:pos [{}:{}:{}] is out of order"
-                             .format(reader.file_name,
-                                     vcf_record.chrom,
-                                     vcf_record.pos))
-                unsorted_readers.append(reader)
-                break
-            else:
-                previous_record = vcf_record
-        reader.close()
+        position = next(positions)
+        if position:
+            logger.debug("VCF file:chrom:pos [{}:{}:{}] is out of order"
+                         .format(reader.file_name,
+                                 position[0],
+                                 position[1]))
+            unsorted_readers.append(reader)
     return unsorted_readers
 
-def _sort_readers(vcf_readers, output_path):
-    unsorted_readers = _get_unsorted_readers(vcf_readers)
+def _sort_readers(vcf_readers,
+                  output_path,
+                  sort_memory=_DEFAULT_SORT_MEMORY,
+                  compress=False,
+                  processes=1):
+    """Returns readers in the same order, sorting unsorted inputs to tmp/.
+
+    If processes is more than one, the sort-order check and any sorting
+    run in a pool of that many processes (each sort uses up to
+    sort_memory).
+    """
+    unsorted_readers = _get_unsorted_readers(vcf_readers, processes)
     sorted_readers = []
     unsorted_count = 0
     if unsorted_readers:
         sorted_dir = os.path.join(os.path.dirname(output_path), "tmp")
         if not os.path.isdir(sorted_dir):
             os.makedirs(sorted_dir)
+        if processes > 1:
+            sort_jobs = [(reader.input_filepath,
+                          sorted_dir,
+                          sort_memory,
+                          compress) for reader in unsorted_readers]
+            sorted_filepaths = _pool_imap(_sort_file, sort_jobs, processes)
 
     for reader in vcf_readers:
         if reader in unsorted_readers:
@@ -514,7 +717,12 @@ def _sort_readers(vcf_readers, output_path):
                         reader.file_name,
                         unsorted_count,
                         len(unsorted_readers))
-            reader = _sort_vcf(reader, sorted_dir)
+            if processes > 1:
+                sorted_filepath = next(sorted_filepaths)
+                reader = _sorted_copy_reader(sorted_filepath,
+                                             reader.file_name)
+            else:
+                reader = _sort_vcf(reader, sorted_dir, sort_memory, compress)
         sorted_readers.append(reader)
     return sorted_readers
 
@@ -557,12 +765,9 @@ def _build_merged_record(coordinate,
 
     return merged_record
 
-def _pull_matching_records(filter_strategy, coordinate, buffered_readers):
-    vcf_records = []
-    for buffered_reader in buffered_readers:
-        record = buffered_reader.next_if_equals(coordinate)
-        if record and filter_strategy.include_cell(record):
-            vcf_records.append(record)
+def _filter_records(filter_strategy, coordinate_records):
+    vcf_records = [record for record in coordinate_records
+                   if filter_strategy.include_cell(record)]
     if filter_strategy.include_row(vcf_records):
         return vcf_records
     else:
@@ -622,21 +827,20 @@ def _build_writers_to_readers(vcf_readers, output_path):
 
     return writers_to_readers
 
-def _get_readers_per_patient(file_readers):
+def _get_readers_per_patient(vcf_readers):
+    """Returns callers per patient from the readers' (already read) headers."""
     readers_per_patient = defaultdict(list)
-    for file_reader in file_readers:
-        file_reader.open()
-        patient = file_reader.file_name.split(".")[0]
-        for line in file_reader.read_lines():
-            caller_meta_header = "##jacquard.translate.caller"
-            if line.startswith(caller_meta_header):
-                readers_per_patient[patient].append(line.split("=")[1])
-        file_reader.close()
+    caller_meta_header = "##jacquard.translate.caller"
+    for vcf_reader in vcf_readers:
+        patient = vcf_reader.file_name.split(".")[0]
+        for metaheader in vcf_reader.metaheaders:
+            if metaheader.startswith(caller_meta_header):
+                readers_per_patient[patient].append(metaheader.split("=")[1])
 
     return OrderedDict(sorted(readers_per_patient.items()))
 
-def _validate_consistent_samples(file_readers):
-    readers_per_patient = _get_readers_per_patient(file_readers)
+def _validate_consistent_samples(vcf_readers):
+    readers_per_patient = _get_readers_per_patient(vcf_readers)
 
     all_callers = set()
     for callers in readers_per_patient.values():
@@ -675,38 +879,53 @@ def _validate_consistent_input(vcf_readers, include_all):
 
 
 def _merge_records(vcf_readers,
-                   coordinates,
                    filter_strategy,
                    all_sample_names,
                    format_tags_to_keep,
                    file_writer):
-    #pylint: disable=too-many-arguments
-    row_count = 0
-    next_breakpoint = 0
-    buffered_readers = _create_buffered_readers(vcf_readers)
+    """Writes merged records in a single pass over the sorted readers.
 
-    for coordinate in coordinates:
-        vcf_records = _pull_matching_records(filter_strategy,
-                                             coordinate,
-                                             buffered_readers)
+    Returns one coordinate per distinct contig and INFO field seen, so that
+    contig and INFO headers can be built once the records are written.
+    """
+    row_count = 0
+    chrom = None
+    header_coordinates = OrderedDict()
+    include_format_tags = _included_format_tags(vcf_readers,
+                                                format_tags_to_keep)
+    record_iterators = _open_vcf_records(
+            vcf_readers,
+            include_format_tags=include_format_tags)
+
+    for coordinate, coordinate_records in \
+            _merge_coordinates(record_iterators):
+        if coordinate.chrom != chrom:
+            chrom = coordinate.chrom
+            logger.info("Merging [{}]: {} rows processed", chrom, row_count)
+        header_coordinates.setdefault((chrom, coordinate.info), coordinate)
+        vcf_records = _filter_records(filter_strategy, coordinate_records)
 
         if vcf_records:
             merged_record = _build_merged_record(coordinate,
                                                  vcf_records,
                                                  all_sample_names,
                                                  format_tags_to_keep)
-            file_writer.write(merged_record.text())
+            file_writer.write(merged_record.text(trusted=True))
 
         row_count += 1
-        progress = 100 * row_count / len(coordinates)
-        if progress > next_breakpoint:
-            logger.info("Merging: {} rows processed ({}%)",
-                        row_count,
-                        next_breakpoint)
-            next_breakpoint = 10 * int(progress/10) + 10
-
-    logger.info("Merge complete: {} rows processed (100%)", row_count)
+
+    logger.info("Merge complete: {} rows processed", row_count)
     filter_strategy.log_statistics()
+    return list(header_coordinates.values())
+
+def _write_file(file_writer, file_path):
+    """Copies the contents of file_path to file_writer."""
+    block_size = vcf.FileReader.READ_BLOCK_SIZE
+    with open(file_path) as input_file:
+        block = input_file.read(block_size)
+        while block:
+            file_writer.write(block)
+            block = input_file.read(block_size)
 
 def _get_format_tag_regex(args):
     if args.tags and args.include_all:
@@ -753,6 +972,9 @@ def add_subparser(subparser):
                               "all_somatic: Include loci where all variants were somatic\n"),
                         metavar="")
     parser.add_argument("--include_format_tags", dest='tags', help=textwrap.fill("Comma-separated user-defined list of regular expressions for format tags to be included in output"), metavar="")
+    parser.add_argument("--sort_memory", type=int, default=_DEFAULT_SORT_MEMORY, help=textwrap.fill("Approximate memory (MB) used to sort an unsorted input VCF; larger inputs are sorted through temp files (default {})".format(_DEFAULT_SORT_MEMORY)), metavar="")
+    parser.add_argument("--compress_sort_runs", action="store_true", help="Gzip temp files written while sorting unsorted input VCFs")
+    parser.add_argument("--processes", type=int, default=1, help=textwrap.fill("Number of processes used to check the sort order of input VCFs and sort any that are unsorted (default 1); each sort uses up to --sort_memory"), metavar="")
     parser.add_argument("--force", action='store_true', help="Overwrite contents of output directory")
     parser.add_argument("--log_file", help="Log file destination", metavar="")
     parser.add_argument("-v", "--verbose", action='store_true')
@@ -769,8 +991,15 @@ def get_required_input_output_types():
     return ("directory", "file")
 
 #TODO (cgates): Validate should actually validate
-def validate_args(dummy):
-    pass
+def validate_args(args):
+    if args.sort_memory < 1:
+        raise utils.UsageError(("The sort memory [{}] must be at least 1 MB. "
+                                "Review inputs and try again.")\
+                               .format(args.sort_memory))
+    if args.processes < 1:
+        raise utils.UsageError(("The number of processes [{}] must be at "
+                                "least 1. Review inputs and try again.")\
+                               .format(args.processes))
 
 def execute(args, execution_context):
     input_path = os.path.abspath(args.input)
@@ -778,9 +1007,9 @@ def execute(args, execution_context):
     filter_strategy = _Filter(args)
     format_tag_regex = _get_format_tag_regex(args)
 
-    input_files = sorted(glob.glob(os.path.join(input_path, "*.vcf")))
+    input_files = sorted([i for i in glob.glob(os.path.join(input_path, "*"))
+                          if vcf.is_vcf_file_name(i)])
     file_readers = [vcf.FileReader(i) for i in input_files]
-    _validate_consistent_samples(file_readers)
 
     try:
         file_writer = vcf.FileWriter(output_path)
@@ -791,8 +1020,13 @@ def execute(args, execution_context):
 #signatures of these methods more similar or even combine some methods to
 #reduce excess iterations over the coordinates/vcf_readers
         merge_vcf_readers = _create_vcf_readers(file_readers)
+        _validate_consistent_samples(merge_vcf_readers)
         _validate_consistent_input(merge_vcf_readers, args.include_all)
-        merge_vcf_readers = _sort_readers(merge_vcf_readers, output_path)
+        merge_vcf_readers = _sort_readers(merge_vcf_readers,
+                                          output_path,
+                                          args.sort_memory,
+                                          args.compress_sort_runs,
+                                          args.processes)
         format_tags = _get_format_tags(merge_vcf_readers)
         _disambiguate_format_tags(merge_vcf_readers, format_tags)
         format_tags_to_keep = _build_format_tags(format_tag_regex,
@@ -800,25 +1034,37 @@ def execute(args, execution_context):
         (all_sample_names,
          merge_metaheaders) = _build_sample_list(merge_vcf_readers)
 
-        coordinates = _build_coordinates(merge_vcf_readers)
-        info_tags_to_keep = _build_info_tags(coordinates)
-        contigs_to_keep = _build_contigs(coordinates)
-        incoming_headers = _FILE_FORMAT + execution_context + merge_metaheaders
-        headers = _compile_metaheaders(incoming_headers,
-                                       merge_vcf_readers,
-                                       all_sample_names,
-                                       contigs_to_keep,
-                                       format_tags_to_keep,
-                                       info_tags_to_keep)
-
-        _write_metaheaders(file_writer, headers)
-
-        _merge_records(merge_vcf_readers,
-                       coordinates,
-                       filter_strategy,
-                       all_sample_names,
-                       format_tags_to_keep,
-                       file_writer)
+        # The contig and INFO metaheaders depend on which records are
+        # merged, so the body is written aside and copied in after them.
+        tmp_output_file = output_path + ".tmp"
+        try:
+            tmp_writer = vcf.FileWriter(tmp_output_file)
+            tmp_writer.open()
+            try:
+                coordinates = _merge_records(merge_vcf_readers,
+                                             filter_strategy,
+                                             all_sample_names,
+                                             format_tags_to_keep,
+                                             tmp_writer)
+            finally:
+                tmp_writer.close()
+
+            info_tags_to_keep = _build_info_tags(coordinates)
+            contigs_to_keep = _build_contigs(coordinates)
+            incoming_headers = _FILE_FORMAT + execution_context + \
+                    merge_metaheaders
+            headers = _compile_metaheaders(incoming_headers,
+                                           merge_vcf_readers,
+                                           all_sample_names,
+                                           contigs_to_keep,
+                                           format_tags_to_keep,
+                                           info_tags_to_keep)
+
+            _write_metaheaders(file_writer, headers)
+            _write_file(file_writer, tmp_output_file)
+        finally:
+            if os.path.exists(tmp_output_file):
+                os.remove(tmp_output_file)
     finally:
         for vcf_reader in merge_vcf_readers:
             vcf_reader.close()
@@ -7,6 +7,7 @@ from __future__ import print_function, absolute_import, division
 
 import os
 
+import jacquard.utils.binary_vcf as binary_vcf
 import jacquard.utils.logger as logger
 import jacquard.utils.utils as utils
 import jacquard.utils.summarize_rollup_transform as summarize_caller
@@ -63,17 +64,21 @@ def _write_zscores(caller,
         file_writer.write("\n".join(sorted_metaheaders) +"\n")
 
         vcf_reader.open()
-        for vcf_record in vcf_reader.vcf_records():
-            line = caller.add_tags(vcf_record)
-            file_writer.write(line)
+        for batch in vcf_reader.record_batches():
+            caller.add_batch_tags(batch)
+            file_writer.write_records(batch, trusted=True)
     finally:
         vcf_reader.close()
         file_writer.close()
 
-def _add_tags(caller, vcf_reader, file_writer):
+def _tagged_records(caller, vcf_reader):
     for vcf_record in vcf_reader.vcf_records():
         caller.add_tags(vcf_record)
-        file_writer.write(vcf_record.text())
+        yield vcf_record
+
+def _add_tags(caller, vcf_reader, file_writer):
+    file_writer.write_records(_tagged_records(caller, vcf_reader),
+                             trusted=True)
 
 def add_subparser(subparser):
     # pylint: disable=line-too-long
@@ -108,11 +113,11 @@ def execute(args, execution_context):
 
     vcf_reader = vcf.VcfReader(vcf.FileReader(input_file))
     tmp_output_file = output + ".tmp"
-    tmp_writer = vcf.FileWriter(tmp_output_file)
+    tmp_writer = binary_vcf.BinaryVcfWriter(tmp_output_file)
 
     _write_to_tmp_file(summary_caller, vcf_reader, tmp_writer)
 
-    tmp_reader = vcf.VcfReader(vcf.FileReader(tmp_output_file))
+    tmp_reader = binary_vcf.BinaryVcfReader(vcf.FileReader(tmp_output_file))
     file_writer = vcf.FileWriter(output)
 
     logger.info("Calculating zscores")
@@ -25,6 +25,7 @@ import jacquard.utils.logger as logger
 import jacquard.utils.utils as utils
 from jacquard.variant_caller_transforms import variant_caller_factory
 from jacquard.utils.vcf import FileReader, FileWriter
+import jacquard.utils.vcf as vcf
 
 
 _FILE_OUTPUT_SUFFIX = "translatedTags"
@@ -98,7 +99,9 @@ def _build_file_readers(input_dir):
     return file_readers
 
 def _mangle_output_filename(input_file):
-    basename, extension = os.path.splitext(os.path.basename(input_file))
+    basename, extension = vcf.split_vcf_extension(os.path.basename(input_file))
+    if vcf.is_vcf_file_name(extension):
+        extension = ".vcf"
     return ".".join([basename, _FILE_OUTPUT_SUFFIX, extension.strip(".")])
 
 def _check_snp_indel_pairings(altered_file_names, args):
@@ -123,7 +126,8 @@ def _validate_file_pairings(args, claimed_vcf_readers):
     if not os.path.isdir(input_path):
         input_path = os.path.dirname(input_path)
 
-    input_vcfs = sorted(glob.glob(os.path.join(input_path, "*.vcf")))
+    input_vcfs = sorted([i for i in glob.glob(os.path.join(input_path, "*"))
+                         if vcf.is_vcf_file_name(i)])
     altered_file_names = defaultdict(list)
     for vcf_reader in claimed_vcf_readers:
         for input_vcf in input_vcfs:
@@ -191,8 +195,7 @@ def _translate_files(trans_vcf_reader,
                        file_writer)
 
         for record in trans_vcf_reader.vcf_records():
-            for tag in new_tags:
-                tag.add_tag_values(record)
+            record.add_tags(new_tags)
             file_writer.write(record.text())
 
     finally:
@@ -0,0 +1,247 @@
+"""Compact binary record format for Jacquard intermediate files.
+
+Text VCF is the right format at the edges of a pipeline, but re-parsing it
+between stages (e.g. the temporary file summarize writes and then reads
+twice to calculate z-scores) means splitting every line, FORMAT field and
+sample field again. A Jacquard binary VCF (.jqb) stores the same content
+pre-split:
+
+    magic (4 bytes) then a stream of frames, each
+    frame type (1 byte) | payload length (uint32, little endian) | payload
+
+    H: header; the metaheader and column header lines, newline separated
+    L: FORMAT dictionary entry; a FORMAT string, assigned the next id
+    R: record; FORMAT id and sample count (2 x uint32) followed by the
+       eight fixed fields and then every sample value, joined by \\x1f
+
+FORMAT strings are written once, the first time a record uses them, so
+records refer to their tags by id and readers share one parsed layout per
+FORMAT. Sample names come from the column header. Sample values are those
+VcfRecord.text() would write, so converting to text gives identical output.
+"""
+from __future__ import print_function, absolute_import, division
+
+import os
+import struct
+
+import jacquard.utils.utils as utils
+import jacquard.utils.vcf as vcf
+
+
+EXTENSION = ".jqb"
+_MAGIC = b"JQB\x01"
+_FRAME = struct.Struct("<cI")
+_RECORD = struct.Struct("<II")
+_HEADER_FRAME = b"H"
+_FORMAT_FRAME = b"L"
+_RECORD_FRAME = b"R"
+_SEPARATOR = "\x1f"
+
+
+def _read_frame(handle):
+    frame = handle.read(_FRAME.size)
+    if not frame:
+        return None, None
+    if len(frame) < _FRAME.size:
+        raise utils.JQException("ERROR: [{}] is truncated."
+                                .format(handle.name))
+    frame_type, length = _FRAME.unpack(frame)
+    payload = handle.read(length)
+    if len(payload) < length:
+        raise utils.JQException("ERROR: [{}] is truncated."
+                                .format(handle.name))
+    return frame_type, payload
+
+
+class BinaryVcfWriter(object):
+    """Writes headers and VcfRecords in Jacquard binary format.
+
+    Mirrors vcf.FileWriter: header text passed to write() (which must come
+    before any records) is stored in the header frame; records are passed
+    to write_records().
+    """
+    def __init__(self, output_filepath,
+                 buffer_size=vcf.FileWriter.DEFAULT_BUFFER_SIZE):
+        self.output_filepath = output_filepath
+        self.buffer_size = buffer_size
+        self._file_writer = None
+        self._header_text = []
+        self._format_ids = {}
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.output_filepath)
+
+    def open(self):
+        self._file_writer = open(self.output_filepath,
+                                 "wb",
+                                 self.buffer_size or -1)
+        self._file_writer.write(_MAGIC)
+        self._header_text = []
+        self._format_ids = {}
+
+    def write(self, text):
+        if self._header_text is None:
+            raise utils.JQException("ERROR: cannot write headers to [{}] "
+                                    "after records.".format(self.file_name))
+        self._header_text.append(text)
+
+    def _write_frame(self, frame_type, payload):
+        self._file_writer.write(_FRAME.pack(frame_type, len(payload)))
+        self._file_writer.write(payload)
+
+    def _flush_header(self):
+        if self._header_text is not None:
+            header = "".join(self._header_text).rstrip("\n")
+            self._write_frame(_HEADER_FRAME, header.encode("utf8"))
+            self._header_text = None
+
+    def _format_id(self, tag_names):
+        rformat = ":".join(tag_names) if tag_names else "."
+        try:
+            return self._format_ids[rformat]
+        except KeyError:
+            self._write_frame(_FORMAT_FRAME, rformat.encode("utf8"))
+            format_id = len(self._format_ids)
+            self._format_ids[rformat] = format_id
+            return format_id
+
+    def write_records(self, vcf_records, trusted=False):
+        """Writes each VcfRecord in iterable vcf_records.
+
+        See VcfRecord.text for trusted.
+        """
+        self._flush_header()
+        check = not trusted or vcf.CHECK_TRUSTED_RECORDS
+        for vcf_record in vcf_records:
+            tag_names = vcf_record._format_tag_fields() #pylint: disable=protected-access
+            sample_values = vcf_record._all_sample_values(tag_names, check) #pylint: disable=protected-access
+            fields = [vcf_record.chrom, vcf_record.pos, vcf_record.vcf_id,
+                      vcf_record.ref, vcf_record.alt, vcf_record.qual,
+                      vcf_record.filter, vcf_record.info]
+            for values in sample_values:
+                fields.extend(values)
+            payload = _RECORD.pack(self._format_id(tag_names),
+                                   len(sample_values)) + \
+                      _SEPARATOR.join(fields).encode("utf8")
+            self._write_frame(_RECORD_FRAME, payload)
+
+    def close(self):
+        try:
+            self._flush_header()
+        finally:
+            self._file_writer.close()
+
+
+class BinaryVcfReader(vcf.VcfReader):
+    """VcfReader over a Jacquard binary VCF written by BinaryVcfWriter.
+
+    Takes a vcf.FileReader for the path (used for its name and ordering).
+    Records come back with their sample values already in columns; short
+    repeated values are interned through the reader's string table.
+    """
+    def __init__(self, file_reader):
+        self._handle = None
+        super(BinaryVcfReader, self).__init__(file_reader)
+
+    def _open_handle(self):
+        handle = open(self.input_filepath, "rb")
+        if handle.read(len(_MAGIC)) != _MAGIC:
+            handle.close()
+            raise utils.JQException("ERROR: [{}] is not a Jacquard binary "
+                                    "vcf.".format(self.file_name))
+        frame_type, payload = _read_frame(handle)
+        if frame_type != _HEADER_FRAME:
+            handle.close()
+            raise utils.JQException("ERROR: [{}] is not a valid vcf. Missing "
+                                    "column header or metaheaders."\
+                                    .format(self.file_name))
+        return handle, payload.decode("utf8").split("\n")
+
+    def _read_headers(self):
+        handle, lines = self._open_handle()
+        handle.close()
+        metaheaders = [line for line in lines if line.startswith("##")]
+        column_headers = [line for line in lines
+                          if line.startswith("#") and not line.startswith("##")]
+        if not (column_headers and metaheaders):
+            raise utils.JQException("ERROR: [{}] is not a valid vcf. Missing "
+                                    "column header or metaheaders."\
+                                    .format(self.file_name))
+        return column_headers[0], metaheaders
+
+    def open(self):
+        self._handle = self._open_handle()[0]
+
+    def close(self):
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+
+    def vcf_records(self, qualified=False,
+                    include_format_tags=None, include_info=None,
+                    include_samples=None):
+        """Generates VcfRecords; see vcf.VcfReader.vcf_records."""
+        if qualified:
+            sample_names = self.qualified_sample_names
+        else:
+            sample_names = self.sample_names
+        sample_indexes = None
+        if include_samples is not None:
+            sample_indexes = [i for i, sample_name in enumerate(sample_names)
+                              if sample_name in include_samples]
+            sample_names = [sample_names[i] for i in sample_indexes]
+        if include_format_tags is not None:
+            include_format_tags = frozenset(include_format_tags)
+
+        layouts = []
+        handle = self._handle
+        while True:
+            frame_type, payload = _read_frame(handle)
+            if frame_type == _RECORD_FRAME:
+                record = self._build_record(payload,
+                                            layouts,
+                                            sample_names,
+                                            sample_indexes,
+                                            self._strings)
+                if include_info is not None:
+                    record._project(include_info) #pylint: disable=protected-access
+                yield record
+            elif frame_type == _FORMAT_FRAME:
+                layouts.append(vcf._FormatLayout(payload.decode("utf8"), #pylint: disable=protected-access
+                                                 strings=self._strings,
+                                                 include=include_format_tags))
+            elif frame_type is None:
+                return
+
+    @staticmethod
+    def _build_record(payload, layouts, sample_names, sample_indexes,
+                      strings):
+        format_id, sample_count = _RECORD.unpack_from(payload)
+        fields = strings.get_all(payload[_RECORD.size:].decode("utf8")\
+                                 .split(_SEPARATOR))
+        chrom, pos, vcf_id, ref, alt, qual, vcf_filter, info = fields[0:8]
+        record = vcf.VcfRecord(chrom, pos, ref, alt,
+                               vcf_id, qual, vcf_filter, info)
+        if sample_count:
+            layout = layouts[format_id]
+            width = layout.width
+            rows = [fields[8 + i * width:8 + (i + 1) * width]
+                    for i in range(sample_count)]
+            if sample_indexes is not None:
+                rows = [rows[i] for i in sample_indexes if i < sample_count]
+            if layout.value_order is not None:
+                rows = [[row[i] for i in layout.value_order] for row in rows]
+            if len(rows) != len(sample_names):
+                sample_names = sample_names[0:len(rows)]
+            #pylint: disable=protected-access
+            record._columns = vcf._SampleColumns(sample_names,
+                                                 layout.tag_names,
+                                                 layout.tag_index,
+                                                 rows)
+        return record
+
+    def fetch(self, chrom, start=None, end=None, qualified=False):
+        raise utils.JQException("ERROR: [{}] is a Jacquard binary vcf; "
+                                "region queries are not supported."\
+                                .format(self.file_name))
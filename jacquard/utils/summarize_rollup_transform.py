@@ -452,9 +452,7 @@ class SummarizeCaller(object):
                      _HCGenotypeTag()]
 
     def add_tags(self, vcf_record):
-        for tag in self.tags:
-            tag.add_tag_values(vcf_record)
-        return vcf_record
+        return vcf_record.add_tags(self.tags)
 
     def get_metaheaders(self):
         return [tag.metaheader for tag in self.tags]
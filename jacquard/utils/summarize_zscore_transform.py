@@ -14,6 +14,7 @@ from __future__ import print_function, absolute_import, division
 import math
 
 import jacquard.utils.utils as utils
+import jacquard.utils.vcf as vcf
 import jacquard.variant_caller_transforms.common_tags as common_tags
 
 
@@ -51,6 +52,9 @@ class _AlleleFreqZScoreTag(common_tags.AbstractJacquardTag):
     def add_tag_values(self, vcf_record):
         self.tag.add_tag_values(vcf_record)
 
+    def add_batch_tag_values(self, batch):
+        self.tag.add_batch_tag_values(batch)
+
 class _DepthZScoreTag(common_tags.AbstractJacquardTag):
     #TODO: (jebene) change the way depthzscore understands the tags
     #it's dependent on (_range_tag should not be defined here)
@@ -77,6 +81,9 @@ class _DepthZScoreTag(common_tags.AbstractJacquardTag):
     def add_tag_values(self, vcf_record):
         self.tag.add_tag_values(vcf_record)
 
+    def add_batch_tag_values(self, batch):
+        self.tag.add_batch_tag_values(batch)
+
 class _ZScoreTag(object):
     '''Utility tag to add zscore for dependent tag (e.g. depth or allele freq)
 
@@ -155,17 +162,61 @@ class _ZScoreTag(object):
         vcf_record.add_sample_tag_value(self._tag_id,
                                         sample_values)
 
+    def add_batch_tag_values(self, batch):
+        '''Adds zscores to each record in a vcf.RecordBatch.'''
+        if not self._stdev:
+            return
+        all_values = batch.sample_values(self._dependent_tag_id)
+        for vcf_record, values in zip(batch.records, all_values):
+            if not values or values[0] is None:
+                continue
+            zscores = []
+            for value in values:
+                value = self._parse_dependent_value(value)
+                if value is None:
+                    zscores.append(".")
+                else:
+                    zscore = (value - self._mean) / self._stdev
+                    zscores.append(self._zscore_as_str(zscore))
+            sample_names = vcf_record.sample_tag_values.keys()
+            vcf_record.add_sample_tag_value(self._tag_id,
+                                            dict(zip(sample_names, zscores)))
+
     @staticmethod
     def _get_dependent_value(tag_values, dependent_tag_id):
         '''Extract (float) value of dependent tag or None if absent.'''
-        try:
-            values = tag_values[dependent_tag_id].split(",")
-            return max([float(value) for value in values])
-        except KeyError:
+        return _ZScoreTag._parse_dependent_value(tag_values.get(dependent_tag_id))
+
+    @staticmethod
+    def _parse_dependent_value(value):
+        '''Parse (max float) of a tag value; None if absent or not numeric.'''
+        if value is None:
             return None
+        try:
+            return max([float(item) for item in value.split(",")])
         except ValueError:
             return None
 
+    @staticmethod
+    def _dependent_values(vcf_reader, dependent_tag_id):
+        '''Generates (float) dependent tag values of every sample-variant.
+
+        Reads sample matrices when NumPy is available so wide VCFs are not
+        expanded into a dict per sample.'''
+        if vcf.numpy is None:
+            for batch in vcf_reader.record_batches():
+                for values in batch.sample_values(dependent_tag_id):
+                    for value in values:
+                        value = _ZScoreTag._parse_dependent_value(value)
+                        if value is not None:
+                            yield value
+            return
+        for matrix in vcf_reader.sample_matrices():
+            if dependent_tag_id in matrix.tag_index:
+                values = matrix.numeric(dependent_tag_id)
+                for value in values[~vcf.numpy.isnan(values)].tolist():
+                    yield value
+
     def _init_population_stats(self, vcf_reader, dependent_tag_id):
         '''Derive mean and stdev.
 
@@ -181,15 +232,11 @@ class _ZScoreTag(object):
         M2 = 0
         try:
             vcf_reader.open()
-            for vcf_record in vcf_reader.vcf_records():
-                for tag_values in vcf_record.sample_tag_values.values():
-                    value = self._get_dependent_value(tag_values,
-                                                      dependent_tag_id)
-                    if value is not None:
-                        n += 1
-                        delta = value - mean
-                        mean += delta / n
-                        M2 += delta * (value - mean)
+            for value in self._dependent_values(vcf_reader, dependent_tag_id):
+                n += 1
+                delta = value - mean
+                mean += delta / n
+                M2 += delta * (value - mean)
         finally:
             vcf_reader.close()
 
@@ -225,7 +272,11 @@ class ZScoreCaller(object):
         return self._metaheaders
 
     def add_tags(self, vcf_record):
+        vcf_record.add_tags(self._tags)
+        return vcf_record.text(trusted=True)
+
+    def add_batch_tags(self, batch):
+        """Adds summary tags to every record in a vcf.RecordBatch."""
         for tag in self._tags:
-            tag.add_tag_values(vcf_record)
-        return vcf_record.text()
+            tag.add_batch_tag_values(batch)
 
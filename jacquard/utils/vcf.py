@@ -1,22 +1,163 @@
 """Classes to parse, interpret, and manipulate VCF files and records."""
 from __future__ import print_function, absolute_import, division
 
+import bisect
 from collections import OrderedDict
+import gzip
+import io
 import os
 import re
+import struct
 import sys
+import threading
+import zlib
 
 import natsort
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import jacquard.utils.utils as utils
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+try:
+    _intern = sys.intern
+except AttributeError:
+    def _intern(string):
+        """Interns native strings; py2's intern rejects unicode."""
+        #pylint: disable=undefined-variable,unidiomatic-typecheck
+        return intern(string) if type(string) is str else string
+
+if sys.version_info[0] < 3:
+    def _native_str(data):
+        """Returns bytes read from a file as a native string."""
+        return data
+
+    def _text_lines(binary_stream):
+        """Returns binary stream as an iterable of native string lines."""
+        return binary_stream
+else:
+    def _native_str(data):
+        """Returns bytes read from a file as a native string."""
+        return data.decode("utf-8")
+
+    def _text_lines(binary_stream):
+        """Returns binary stream as an iterable of native string lines."""
+        return io.TextIOWrapper(binary_stream)
+
+
+# VcfRecord.text(trusted=True) skips checking that each sample's tags fit
+# the FORMAT tags; set JACQUARD_CHECK_RECORDS (or this flag) to check anyway.
+CHECK_TRUSTED_RECORDS = bool(os.environ.get("JACQUARD_CHECK_RECORDS"))
+
+VCF_EXTENSIONS = (".vcf", ".vcf.gz", ".vcf.bgz")
+_GZIP_EXTENSIONS = (".gz", ".bgz")
+
+def is_vcf_file_name(file_name):
+    """Returns True if file_name has a plain or compressed VCF extension."""
+    return file_name.endswith(VCF_EXTENSIONS)
+
+def split_vcf_extension(file_name):
+    """Splits file name into (root, extension), keeping ".vcf.gz" together.
+
+    Behaves like os.path.splitext except that compressed VCF extensions
+    (e.g. "patientA.snp.vcf.gz") are split as a single extension.
+    """
+    for extension in VCF_EXTENSIONS[1:]:
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)], extension
+    return os.path.splitext(file_name)
+
+
+_METAHEADER_ID_REGEX = re.compile(r"^##(FORMAT|INFO|FILTER|contig)=.*?[<,]ID=([^,>]*)")
+_TYPE_REGEX = re.compile(r"[<,]Type=([^,>]*)")
+# Most recently used files whose headers are cached, and distinct
+# metaheader lines shared between them before the shared set is reset.
+_HEADER_CACHE_SIZE = 256
+_HEADER_STRINGS_SIZE = 1 << 16
+_HEADER_CACHE = OrderedDict()
+_HEADER_STRINGS = {}
+
+def _header_cache_key(file_reader):
+    """Returns (path, inode, size, mtime) for a FileReader or None.
+
+    mtime is in nanoseconds where available. Returns None if the reader
+    is not a FileReader on disk.
+    """
+    if not isinstance(file_reader, FileReader):
+        return None
+    try:
+        stat = os.stat(file_reader.input_filepath)
+    except OSError:
+        return None
+    return (os.path.abspath(file_reader.input_filepath),
+            stat.st_ino,
+            stat.st_size,
+            getattr(stat, "st_mtime_ns", stat.st_mtime))
+
+def _cached_headers(cache_key):
+    """Returns cached (column header, metaheaders) or None; marks it used."""
+    headers = _HEADER_CACHE.pop(cache_key, None)
+    if headers is not None:
+        _HEADER_CACHE[cache_key] = headers
+    return headers
+
+def _cache_headers(cache_key, column_header, metaheaders):
+    """Caches headers, evicting the least recently used beyond the limit."""
+    while len(_HEADER_CACHE) >= _HEADER_CACHE_SIZE:
+        _HEADER_CACHE.popitem(last=False)
+    if len(_HEADER_STRINGS) >= _HEADER_STRINGS_SIZE:
+        _HEADER_STRINGS.clear()
+    metaheaders = [_HEADER_STRINGS.setdefault(metaheader, metaheader)
+                   for metaheader in metaheaders]
+    _HEADER_CACHE[cache_key] = (column_header, tuple(metaheaders))
+    return metaheaders
+
+def clear_header_cache():
+    """Forgets all cached VCF headers (see VcfReader).
+
+    Callers which rewrite a VCF in place and then read it again in the same
+    process must call this first; a rewrite within the file system's mtime
+    resolution that keeps the same size and inode is otherwise not noticed.
+    """
+    _HEADER_CACHE.clear()
+    _HEADER_STRINGS.clear()
+
 
 #TODO: (cgates): add context management to open/close
 class VcfReader(object):
-    """Read only wrapper providing VCF metaheaders and records."""
+    """Read only wrapper providing VCF metaheaders and records.
+
+    Headers of files on disk are parsed once per process and cached by path,
+    inode, size and mtime (for the most recently used files), so building
+    several readers for the same file (e.g. as each caller tries to claim
+    it) does not re-read it. Identical metaheader lines are shared across
+    files. Each reader gets its own metaheaders list. See clear_header_cache
+    for files rewritten in place.
+
+    FORMAT, INFO, FILTER and contig metaheaders are indexed by ID in a single
+    pass on first use. The index is rebuilt if metaheaders is reassigned or
+    changes length; use replace_metaheader to swap a line in place.
+    """
     def __init__(self, file_reader):
         self._file_reader = file_reader
         (self.column_header, self.metaheaders) = self._init_headers()
+        self._metaheader_index = {}
+        self._indexed_metaheaders = None
+        self._indexed_length = None
+        self._format_layout_caches = {}
+        self._strings = _StringTable()
         self.split_column_header = self.column_header.strip("#").split("\t")
         self.sample_names = self._init_sample_names()
         self.qualified_sample_names = self._create_qualified_sample_names()
@@ -24,15 +165,35 @@ class VcfReader(object):
     def __lt__(self, other):
         return self._file_reader < other._file_reader
 
-    def _get_tag_metaheaders(self, regex_exp):
-        tag_dict = {}
-        for metaheader in self.metaheaders:
-            tag = re.match(regex_exp, metaheader)
+    def _get_tag_metaheaders(self, tag_type):
+        if self.metaheaders is not self._indexed_metaheaders or \
+                len(self.metaheaders) != self._indexed_length:
+            self._metaheader_index = {}
+            for metaheader in self.metaheaders:
+                self._index_metaheader(metaheader)
+            self._indexed_metaheaders = self.metaheaders
+            self._indexed_length = len(self.metaheaders)
+        return self._metaheader_index.get(tag_type, {})
+
+    def _index_metaheader(self, metaheader):
+        tag = _METAHEADER_ID_REGEX.match(metaheader)
+        if tag:
+            tag_dict = self._metaheader_index.setdefault(tag.group(1), {})
+            tag_dict[tag.group(2)] = metaheader.strip()
+
+    def replace_metaheader(self, original_metaheader, updated_metaheader):
+        """Swaps one metaheader for another, keeping the tag index current."""
+        self._get_tag_metaheaders(None)
+        self.metaheaders.append(updated_metaheader)
+        self._index_metaheader(updated_metaheader)
+        if original_metaheader in self.metaheaders:
+            self.metaheaders.remove(original_metaheader)
+            tag = _METAHEADER_ID_REGEX.match(original_metaheader)
             if tag:
-                tag_key = tag.group(1)
-                tag_dict[tag_key] = metaheader.strip()
-
-        return tag_dict
+                tag_dict = self._metaheader_index[tag.group(1)]
+                if tag_dict.get(tag.group(2)) == original_metaheader.strip():
+                    del tag_dict[tag.group(2)]
+        self._indexed_length = len(self.metaheaders)
 
     @property
     def file_name(self):
@@ -44,19 +205,19 @@ class VcfReader(object):
 
     @property
     def format_metaheaders(self):
-        return dict(self._get_tag_metaheaders("^##FORMAT=.*?[<,]ID=([^,>]*)"))
+        return dict(self._get_tag_metaheaders("FORMAT"))
 
     @property
     def info_metaheaders(self):
-        return dict(self._get_tag_metaheaders("^##INFO=.*?[<,]ID=([^,>]*)"))
+        return dict(self._get_tag_metaheaders("INFO"))
 
     @property
     def filter_metaheaders(self):
-        return dict(self._get_tag_metaheaders("^##FILTER=.*?[<,]ID=([^,>]*)"))
+        return dict(self._get_tag_metaheaders("FILTER"))
 
     @property
     def contig_metaheaders(self):
-        return dict(self._get_tag_metaheaders("^##contig=.*?[<,]ID=([^,>]*)"))
+        return dict(self._get_tag_metaheaders("contig"))
 
     def _init_sample_names(self):
         sample_names = []
@@ -74,6 +235,18 @@ class VcfReader(object):
         return qualified_names
 
     def _init_headers(self):
+        cache_key = _header_cache_key(self._file_reader)
+        if cache_key:
+            headers = _cached_headers(cache_key)
+            if headers is not None:
+                return headers[0], list(headers[1])
+
+        column_header, metaheaders = self._read_headers()
+        if cache_key:
+            metaheaders = _cache_headers(cache_key, column_header, metaheaders)
+        return column_header, metaheaders
+
+    def _read_headers(self):
         metaheaders = []
         column_header = None
         try:
@@ -98,15 +271,25 @@ class VcfReader(object):
 
     #TODO (cgates): qualified is used by ONE invocation in merge. Can we
     #somehow make merge do this instead of universally complicating the method?
-    def vcf_records(self, qualified=False):
+    def vcf_records(self, qualified=False,
+                    include_format_tags=None, include_info=None,
+                    include_samples=None):
         """Generates parsed VcfRecord objects.
 
         Typically called in a for loop to process each vcf record in a
         VcfReader. VcfReader must be opened in advanced and closed when
         complete. Skips all headers.
 
+        The include_ arguments project records down to the fields a caller
+        needs; values outside them are never split out or stored. Each
+        defaults to None (keep everything).
+
         Args:
             qualified: When True, sample names are prefixed with file name
+            include_format_tags: collection of FORMAT tags to keep
+            include_info: collection of INFO field names to keep
+            include_samples: collection of sample names to keep (qualified
+                if qualified is True)
 
         Returns:
             Parsed VcfRecord
@@ -115,16 +298,149 @@ class VcfReader(object):
             StopIteration: when reader is exhausted.
             TypeError: if reader is closed.
         """
+        format_layouts = self.format_layouts(
+                include_format_tags=include_format_tags)
+        return self._parse_records(format_layouts,
+                                   qualified,
+                                   include_info,
+                                   include_samples)
+
+    def record_lines(self):
+        """Generates the unparsed text of each record, without line endings.
+
+        Like vcf_records, reader must be opened in advance and headers are
+        skipped.
+        """
+        for lines in self._file_reader.read_line_blocks():
+            for line in lines:
+                if line and not line.startswith("#"):
+                    yield line
+
+    def _parse_records(self, format_layouts, qualified,
+                       include_info, include_samples):
         if qualified:
             sample_names = self.qualified_sample_names
         else:
             sample_names = self.sample_names
+        sample_indexes = None
+        if include_samples is not None:
+            sample_indexes = [i for i, sample_name in enumerate(sample_names)
+                              if sample_name in include_samples]
+            sample_names = [sample_names[i] for i in sample_indexes]
+        project = include_info is not None or sample_indexes is not None
+
+        for lines in self._file_reader.read_line_blocks():
+            for line in lines:
+                if not line or line.startswith("#"):
+                    continue
+                vcf_record = VcfRecord.parse_record(line,
+                                                    sample_names,
+                                                    format_layouts)
+                if project:
+                    vcf_record._project(include_info, sample_indexes)
+                yield vcf_record
+
+
+    def fetch(self, chrom, start=None, end=None, qualified=False):
+        """Generates parsed VcfRecords on chrom where start <= POS <= end.
+
+        Positions are 1-based and inclusive, like VCF POS; start and end
+        default to the beginning and end of the contig. BGZF VCFs use a
+        tabix (.tbi) index if present; plain-text VCFs use a Jacquard line
+        offset index (.jqi) which is built on first use. Either way the input
+        must be sorted. Unlike vcf_records, the reader need not be opened.
 
-        for line in self._file_reader.read_lines():
-            if line.startswith("#"):
-                continue
-            yield VcfRecord.parse_record(line, sample_names)
+        Args:
+            chrom: contig name as it appears in the CHROM column
+            start: first position of region (default 1)
+            end: last position of region (default end of contig)
+            qualified: When True, sample names are prefixed with file name
+        """
+        if qualified:
+            sample_names = self.qualified_sample_names
+        else:
+            sample_names = self.sample_names
+
+        format_layouts = self.format_layouts()
+        for line in self._file_reader.fetch_lines(chrom, start, end):
+            yield VcfRecord.parse_record(line, sample_names, format_layouts)
+
+    def record_batches(self, size=None, qualified=False):
+        """Generates RecordBatches of up to size consecutive records.
+
+        Takes the same arguments as vcf_records, plus size (default
+        RecordBatch.DEFAULT_SIZE). The reader must be open.
+        """
+        size = size or RecordBatch.DEFAULT_SIZE
+        if qualified:
+            sample_names = self.qualified_sample_names
+        else:
+            sample_names = self.sample_names
+        records = []
+        for vcf_record in self.vcf_records(qualified=qualified):
+            records.append(vcf_record)
+            if len(records) == size:
+                yield RecordBatch(records, sample_names)
+                records = []
+        if records:
+            yield RecordBatch(records, sample_names)
+
+    def sample_matrices(self, qualified=False, **include):
+        """Generates a SampleMatrix for each record (requires NumPy).
+
+        An alternative to vcf_records for very wide VCFs: sample values come
+        back as one array per record instead of a dict per sample. Takes the
+        same arguments as vcf_records.
+
+        Raises:
+            JQException: if NumPy is not installed.
+        """
+        if numpy is None:
+            raise utils.JQException("ERROR: [{}] sample matrices require "
+                                    "NumPy, which is not installed."\
+                                    .format(self.file_name))
+        format_types = self.format_types
+        return (SampleMatrix.from_record(vcf_record, format_types)
+                for vcf_record in self.vcf_records(qualified=qualified,
+                                                   **include))
 
+    @property
+    def format_types(self):
+        """Returns dict of FORMAT tag to its declared Type (e.g. Float)."""
+        format_types = {}
+        for tag, metaheader in self._get_tag_metaheaders("FORMAT").items():
+            match = _TYPE_REGEX.search(metaheader)
+            if match:
+                format_types[tag] = match.group(1)
+        return format_types
+
+    def format_layouts(self, renames=None, include_format_tags=None):
+        """Returns this reader's cache of parsed FORMAT layouts.
+
+        Args:
+            renames: optional dict of original->new FORMAT tag names applied
+                to every record parsed with the returned cache
+            include_format_tags: optional collection of (renamed) FORMAT
+                tags to keep; other tags are dropped when parsing
+        """
+        if include_format_tags is not None:
+            include_format_tags = frozenset(include_format_tags)
+        cache_key = (tuple(renames.items()) if renames else None,
+                     include_format_tags)
+        if cache_key not in self._format_layout_caches:
+            self._format_layout_caches[cache_key] = \
+                    _FormatLayoutCache(renames,
+                                       self._strings,
+                                       include_format_tags)
+        return self._format_layout_caches[cache_key]
+
+    def use_handle_pool(self, handle_pool):
+        """Reads through handle_pool (see FileHandlePool); call before open."""
+        self._file_reader.handle_pool = handle_pool
+
+    def resumes_cheaply(self):
+        """See FileReader.resumes_cheaply."""
+        return self._file_reader.resumes_cheaply()
 
     def open(self):
         self._file_reader.open()
@@ -132,6 +448,578 @@ class VcfReader(object):
     def close(self):
         self._file_reader.close()
 
+
+class _FormatLayout(object):
+    """Parsed FORMAT string shared by every record that uses it.
+
+    Attributes:
+        tag_names: tuple of (possibly renamed) tag names in sample order
+        tag_index: dict of tag name to position in tag_names
+        value_order: None if sample values line up with tag_names, otherwise
+            the index of each tag_names value within the raw sample field
+        verbatim: True if joining tag_names reproduces the FORMAT string
+            (no renames, duplicate, missing or excluded tags)
+        width: number of tags in the FORMAT string
+        strings: the reader's _StringTable (or None); sample values are
+            interned through it
+    """
+    #pylint: disable=too-few-public-methods
+    __slots__ = ("tag_names", "tag_index", "value_order", "verbatim",
+                 "width", "strings")
+
+    def __init__(self, rformat, renames=None, strings=None, include=None):
+        tag_names = [_intern(tag) for tag in VcfRecord._format_list(rformat)]
+        original_tag_names = tuple(tag_names)
+        value_order = list(range(len(tag_names)))
+        for original_tag, new_tag in (renames or {}).items():
+            if new_tag not in tag_names and original_tag in tag_names:
+                i = tag_names.index(original_tag)
+                del tag_names[i]
+                tag_names.append(new_tag)
+                value_order.append(value_order.pop(i))
+        if include is not None:
+            kept = [(tag, i) for tag, i in zip(tag_names, value_order)
+                    if tag in include]
+            tag_names = [tag for tag, dummy in kept]
+            value_order = [i for dummy, i in kept]
+        self.width = len(original_tag_names)
+        if value_order == list(range(self.width)):
+            value_order = None
+        self.tag_names = tuple(tag_names)
+        self.tag_index = dict((tag, i) for i, tag in enumerate(tag_names))
+        self.value_order = value_order
+        self.verbatim = bool(tag_names) and \
+                self.tag_names == original_tag_names and \
+                len(self.tag_index) == len(tag_names)
+        self.strings = strings
+
+    def split(self, sample_field):
+        """Returns list of values in one raw sample field."""
+        if not sample_field:
+            return ["."]
+        if self.strings is None:
+            return sample_field.split(":")
+        return self.strings.get_all(sample_field.split(":"))
+
+    def tag_values(self, sample_field):
+        """Returns OrderedDict of tag-values for one raw sample field."""
+        tag_values = self.split(sample_field)
+        if self.value_order is None:
+            return OrderedDict(zip(self.tag_names, tag_values))
+        return OrderedDict((tag, tag_values[i]) for tag, i
+                           in zip(self.tag_names, self.value_order)
+                           if i < len(tag_values))
+
+    def matches(self, sample_field):
+        """True if sample_field holds a value for every tag."""
+        return bool(sample_field) and \
+                sample_field.count(":") + 1 == self.width
+
+    def verbatim_samples(self, sample_names, sample_fields):
+        """True if sample_fields would be written back unchanged."""
+        return self.verbatim and \
+                len(sample_fields) == len(sample_names) and \
+                all(self.matches(field) for field in sample_fields)
+
+
+class _StringTable(object):
+    """Reader-scoped table of short, repeated strings.
+
+    CHROM, FILTER and most sample values (e.g. '0', '.', '0/1', 'PASS')
+    repeat on nearly every line of a VCF. Parsing through the table makes
+    records share one copy of each, which keeps records that are held in
+    memory (e.g. merge's coordinates or an in-memory sort) small. Strings
+    longer than _MAX_LENGTH are passed through; the table is cleared when
+    it reaches _MAX_SIZE entries.
+    """
+    _MAX_SIZE = 4096
+    _MAX_LENGTH = 8
+
+    def __init__(self):
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def get(self, string):
+        """Returns the table's copy of string, adding it if short."""
+        try:
+            return self._strings[string]
+        except KeyError:
+            if len(string) > self._MAX_LENGTH:
+                return string
+            if len(self._strings) >= self._MAX_SIZE:
+                self._strings.clear()
+            self._strings[string] = string
+            return string
+
+    def get_all(self, strings):
+        """Returns list of the table's copies of strings."""
+        table = self._strings
+        return [table.get(string) or self.get(string) for string in strings]
+
+
+class _FormatLayoutCache(object):
+    """Small FORMAT string to _FormatLayout cache (see VcfReader).
+
+    Attributes:
+        strings: optional _StringTable used when parsing with this cache
+    """
+    #pylint: disable=too-few-public-methods
+    _MAX_SIZE = 256
+
+    def __init__(self, renames=None, strings=None, include=None):
+        self._renames = dict(renames) if renames else None
+        self._include = include
+        self._layouts = {}
+        self.strings = strings
+
+    def get(self, rformat):
+        try:
+            return self._layouts[rformat]
+        except KeyError:
+            if len(self._layouts) >= self._MAX_SIZE:
+                self._layouts.clear()
+            layout = _FormatLayout(rformat,
+                                   self._renames,
+                                   self.strings,
+                                   self._include)
+            self._layouts[rformat] = layout
+            return layout
+
+
+class _SampleColumns(object):
+    """Column-oriented FORMAT storage for one record.
+
+    Holds one ordered list of tag names and, for each sample, a list of
+    values aligned with it; None marks a tag the sample does not have. Tag
+    names and the name->index map start out shared with the _FormatLayout
+    and are copied the first time a tag is added. matches_raw stays True
+    while the columns still hold exactly the sample text they were parsed
+    from (see VcfRecord.text). The sample name->row index map is built on
+    first lookup and kept in step by add_sample and remove_sample.
+    """
+    __slots__ = ("sample_names", "tag_names", "tag_index", "rows",
+                 "matches_raw", "_shared", "_view", "_sample_index")
+
+    def __init__(self, sample_names, tag_names, tag_index, rows, shared=True):
+        self.sample_names = sample_names
+        self.tag_names = tag_names
+        self.tag_index = tag_index
+        self.rows = rows
+        self.matches_raw = False
+        self._shared = shared
+        self._view = None
+        self._sample_index = None
+
+    @classmethod
+    def from_raw(cls, sample_names, layout, sample_fields):
+        matches_raw = layout.verbatim_samples(sample_names, sample_fields)
+        width = len(layout.tag_names)
+        rows = []
+        for sample_field in sample_fields:
+            values = layout.split(sample_field)
+            if layout.value_order is not None:
+                values = [values[i] if i < len(values) else None
+                          for i in layout.value_order]
+            elif len(values) < width:
+                values.extend([None] * (width - len(values)))
+            elif len(values) > width:
+                del values[width:]
+            rows.append(values)
+        if len(rows) != len(sample_names):
+            sample_names = sample_names[0:len(rows)]
+            del rows[len(sample_names):]
+        columns = _SampleColumns(sample_names,
+                                 layout.tag_names,
+                                 layout.tag_index,
+                                 rows)
+        columns.matches_raw = matches_raw
+        return columns
+
+    @property
+    def view(self):
+        """Returns dict-like sample->tag->value view of the columns."""
+        if self._view is None:
+            self._view = _SampleColumnsView(self)
+        return self._view
+
+    def _unshare(self):
+        self.matches_raw = False
+        if self._shared:
+            self.sample_names = list(self.sample_names)
+            self.tag_names = list(self.tag_names)
+            self.tag_index = dict(self.tag_index)
+            self._shared = False
+
+    def add_tag(self, tag_name, values=None):
+        """Appends a tag column; values default to None for every sample."""
+        self._unshare()
+        self.tag_index[tag_name] = len(self.tag_names)
+        self.tag_names.append(tag_name)
+        if values is None:
+            for row in self.rows:
+                row.append(None)
+        else:
+            for row, value in zip(self.rows, values):
+                row.append(value)
+        return self.tag_index[tag_name]
+
+    def set_tag(self, tag_name, values):
+        """Sets the tag column to values, appending it if necessary."""
+        i = self.tag_index.get(tag_name)
+        if i is None:
+            self.add_tag(tag_name, values)
+        else:
+            self.matches_raw = False
+            for row, value in zip(self.rows, values):
+                row[i] = value
+
+    def sample_index(self, sample_name):
+        """Returns row index of sample_name or None if absent."""
+        if self._sample_index is None:
+            self._sample_index = {}
+            for i, name in enumerate(self.sample_names):
+                self._sample_index.setdefault(name, i)
+        return self._sample_index.get(sample_name)
+
+    def add_sample(self, sample_name):
+        self._unshare()
+        self.sample_names.append(sample_name)
+        self.rows.append([None] * len(self.tag_names))
+        if self._sample_index is not None:
+            self._sample_index.setdefault(sample_name, len(self.rows) - 1)
+        return self.rows[-1]
+
+    def remove_sample(self, sample_name):
+        self._unshare()
+        i = self.sample_index(sample_name)
+        del self.sample_names[i]
+        del self.rows[i]
+        del self._sample_index[sample_name]
+        for j, name in enumerate(self.sample_names[i:], i):
+            if self._sample_index.get(name, j) >= j:
+                self._sample_index[name] = j
+
+    def has_tag(self, tag_name):
+        """True if the first sample has tag_name (cf. VcfRecord.format_tags)."""
+        i = self.tag_index.get(tag_name)
+        return i is not None and bool(self.rows) and self.rows[0][i] is not None
+
+    def present_tags(self):
+        """Returns tag names of the first sample in order."""
+        if not self.rows:
+            return []
+        return [tag for tag, value in zip(self.tag_names, self.rows[0])
+                if value is not None]
+
+    def sample_values(self, tag_names, check=True):
+        """Returns per-sample lists of values ordered by tag_names.
+
+        Missing values are padded as '.'. Returns None if check and a sample
+        has tags beyond tag_names (see VcfRecord._sample_field).
+        """
+        indexes = [self.tag_index[tag] for tag in tag_names]
+        sample_values = []
+        for row in self.rows:
+            values = [row[i] for i in indexes]
+            if check and len(row) - row.count(None) != \
+                    len(values) - values.count(None):
+                return None
+            sample_values.append([value if value is not None else "."
+                                  for value in values])
+        return sample_values
+
+
+class RecordBatch(object):
+    """Consecutive VcfRecords from one reader with column-wise access.
+
+    Built by VcfReader.record_batches. Fixed fields are available as lists
+    parallel to records; sample values for one FORMAT tag can be pulled for
+    the whole batch at once without building per-sample dicts. Records
+    parsed by one reader share FORMAT layouts, so the split FORMAT string
+    is looked up once per distinct FORMAT rather than once per record.
+    Records remain ordinary VcfRecords and may be modified in place.
+
+    Attributes:
+        records: list of VcfRecords
+        sample_names: list of sample names (qualified if requested)
+    """
+    DEFAULT_SIZE = 1000
+
+    def __init__(self, records, sample_names):
+        self.records = records
+        self.sample_names = sample_names
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def chroms(self):
+        return [record.chrom for record in self.records]
+
+    @property
+    def positions(self):
+        """Returns POS of each record as an int."""
+        return [record._key[1] for record in self.records] #pylint: disable=protected-access
+
+    @property
+    def refs(self):
+        return [record.ref for record in self.records]
+
+    @property
+    def alts(self):
+        return [record.alt for record in self.records]
+
+    @property
+    def filters(self):
+        return [record.filter for record in self.records]
+
+    def sample_values(self, tag_name):
+        """Returns, for each record, a list of tag_name's value by sample.
+
+        Samples which lack tag_name hold None.
+        """
+        return [RecordBatch._record_values(record, tag_name)
+                for record in self.records]
+
+    @staticmethod
+    def _record_values(record, tag_name):
+        #pylint: disable=protected-access
+        if record._raw_samples is not None:
+            sample_names, layout, sample_fields = record._raw_samples
+            sample_fields = sample_fields[0:len(sample_names)]
+            i = layout.tag_index.get(tag_name)
+            if i is None:
+                return [None] * len(sample_fields)
+            if layout.value_order is not None:
+                i = layout.value_order[i]
+            values = []
+            for sample_field in sample_fields:
+                split_field = sample_field.split(":") if sample_field else "."
+                values.append(split_field[i] if i < len(split_field) else None)
+            return values
+        columns = record._sample_columns()
+        if columns is not None:
+            i = columns.tag_index.get(tag_name)
+            if i is None:
+                return [None] * len(columns.rows)
+            return [row[i] for row in columns.rows]
+        return [tag_values.get(tag_name)
+                for tag_values in record.sample_tag_values.values()]
+
+
+class SampleMatrix(object):
+    """Sample by FORMAT tag values of one VcfRecord as a NumPy array.
+
+    Built by VcfReader.sample_matrices. Rows follow sample_names and columns
+    follow tag_names; a sample without a tag holds ''. Records whose samples
+    all carry every FORMAT tag are split straight into the array without
+    building per-sample dicts.
+
+    Attributes:
+        vcf_record: the VcfRecord (fixed fields and INFO)
+        sample_names: list of sample names
+        tag_names: tuple of FORMAT tag names
+        tag_index: dict of tag name to column
+        values: 2D NumPy array of strings
+    """
+    _NUMERIC_TYPES = set(["Integer", "Float"])
+
+    def __init__(self, vcf_record, sample_names, tag_names, values,
+                 format_types=None):
+        #pylint: disable=too-many-arguments
+        self.vcf_record = vcf_record
+        self.sample_names = sample_names
+        self.tag_names = tuple(tag_names)
+        self.tag_index = dict((tag, i) for i, tag in enumerate(tag_names))
+        self.values = values
+        self._format_types = format_types or {}
+
+    @classmethod
+    def from_record(cls, vcf_record, format_types=None):
+        """Builds a SampleMatrix from a (parsed or constructed) VcfRecord."""
+        #pylint: disable=protected-access
+        if vcf_record._raw_samples is not None:
+            sample_names, layout, sample_fields = vcf_record._raw_samples
+            if layout.value_order is None and \
+                    len(sample_fields) == len(sample_names) and \
+                    all(layout.matches(field) for field in sample_fields):
+                values = numpy.array(":".join(sample_fields).split(":"))
+                return SampleMatrix(vcf_record,
+                                    sample_names,
+                                    layout.tag_names,
+                                    values.reshape(len(sample_fields),
+                                                   len(layout.tag_names)),
+                                    format_types)
+        columns = vcf_record._sample_columns()
+        if columns is not None:
+            sample_names = list(columns.sample_names)
+            tag_names = columns.tag_names
+            rows = [[value if value is not None else "" for value in row]
+                    for row in columns.rows]
+        else:
+            sample_names = list(vcf_record.sample_tag_values.keys())
+            tag_names = []
+            for tag_values in vcf_record.sample_tag_values.values():
+                tag_names.extend(tag for tag in tag_values
+                                 if tag not in tag_names)
+            rows = [[tag_values.get(tag, "") for tag in tag_names]
+                    for tag_values in vcf_record.sample_tag_values.values()]
+        values = numpy.array(rows, dtype=str)
+        values.shape = (len(sample_names), len(tag_names))
+        return SampleMatrix(vcf_record,
+                            sample_names,
+                            tag_names,
+                            values,
+                            format_types)
+
+    def column(self, tag_name):
+        """Returns array of tag_name's values by sample ('' if absent)."""
+        i = self.tag_index.get(tag_name)
+        if i is None:
+            return numpy.full(len(self.sample_names), "", dtype=str)
+        return self.values[:, i]
+
+    def numeric(self, tag_name):
+        """Returns float array of tag_name's values by sample.
+
+        Integer and Float tags both come back as floats so that missing,
+        absent or unparseable values can be NaN. Multi-valued fields (e.g.
+        '0.1,0.3') take their largest value.
+
+        Raises:
+            JQException: if tag_name is declared with a non-numeric Type.
+        """
+        declared_type = self._format_types.get(tag_name)
+        if declared_type and declared_type not in self._NUMERIC_TYPES:
+            raise utils.JQException("ERROR: FORMAT tag [{}] is Type={}, not "
+                                    "Integer or Float.".format(tag_name,
+                                                               declared_type))
+        column = self.column(tag_name)
+        try:
+            return column.astype(float)
+        except ValueError:
+            return numpy.array([SampleMatrix._max_float(value)
+                                for value in column.tolist()],
+                               dtype=float)
+
+    @staticmethod
+    def _max_float(value):
+        try:
+            return max([float(item) for item in value.split(",")])
+        except ValueError:
+            return float("nan")
+
+
+class _SampleTagsView(MutableMapping):
+    """Dict-like view of one sample's tag-values in _SampleColumns."""
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, tag_name):
+        value = self._row[self._columns.tag_index[tag_name]]
+        if value is None:
+            raise KeyError(tag_name)
+        return value
+
+    def __setitem__(self, tag_name, value):
+        i = self._columns.tag_index.get(tag_name)
+        if i is None:
+            i = self._columns.add_tag(tag_name)
+        self._columns.matches_raw = False
+        self._row[i] = value
+
+    def __delitem__(self, tag_name):
+        self[tag_name] #pylint: disable=pointless-statement
+        self._columns.matches_raw = False
+        self._row[self._columns.tag_index[tag_name]] = None
+
+    def __iter__(self):
+        for tag_name, value in zip(self._columns.tag_names, self._row):
+            if value is not None:
+                yield tag_name
+
+    def __len__(self):
+        return len(self._row) - self._row.count(None)
+
+    def __repr__(self):
+        return repr(OrderedDict(self.items()))
+
+
+class _SampleColumnsView(MutableMapping):
+    """Dict-like sample->tag-values view of _SampleColumns."""
+    __slots__ = ("_columns",)
+
+    def __init__(self, columns):
+        self._columns = columns
+
+    def __getitem__(self, sample_name):
+        i = self._columns.sample_index(sample_name)
+        if i is None:
+            raise KeyError(sample_name)
+        return _SampleTagsView(self._columns, self._columns.rows[i])
+
+    def __setitem__(self, sample_name, tag_values):
+        if sample_name in self:
+            sample_tags = self[sample_name]
+            sample_tags.clear()
+        else:
+            sample_tags = _SampleTagsView(self._columns,
+                                          self._columns.add_sample(sample_name))
+        sample_tags.update(tag_values)
+
+    def __delitem__(self, sample_name):
+        if sample_name not in self:
+            raise KeyError(sample_name)
+        self._columns.remove_sample(sample_name)
+
+    def __iter__(self):
+        return iter(list(self._columns.sample_names))
+
+    def __len__(self):
+        return len(self._columns.sample_names)
+
+    def __contains__(self, sample_name):
+        return self._columns.sample_index(sample_name) is not None
+
+    def items(self):
+        columns = self._columns
+        return [(sample_name, _SampleTagsView(columns, row))
+                for sample_name, row in zip(columns.sample_names, columns.rows)]
+
+    def values(self):
+        columns = self._columns
+        return [_SampleTagsView(columns, row) for row in columns.rows]
+
+    def __repr__(self):
+        return repr(OrderedDict((sample, OrderedDict(tags.items()))
+                                for sample, tags in self.items()))
+
+
+_CONTIG_KEYS = {}
+
+def _contig_key(chrom):
+    """Returns the sort key shared by every record on chrom.
+
+    Contigs sort naturally: chromosomes which are numeric once "chr" is
+    removed come first in numeric order, then all others by name. Each
+    contig's key is computed once.
+    """
+    try:
+        return _CONTIG_KEYS[chrom]
+    except KeyError:
+        key = (VcfRecord._str_as_int(chrom), chrom) #pylint: disable=protected-access
+        _CONTIG_KEYS[chrom] = key
+        return key
+
+
 class VcfRecord(object): #pylint: disable=too-many-instance-attributes
     """Represents an specific variant record.
 
@@ -159,42 +1047,73 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
                 Note that dict is a natural pythonic representation of sample
                 tag values, it's sometimes helpful to think of sample_tag_values
                 as a table of samples (rows) x format_tags (columns).
-            _key: tuple that defines record equality and ordering.
+            _key: tuple that defines record equality and ordering; holds the
+                shared natural sort key of the chromosome and the position as
+                an int (pos is kept as the original string so records
+                round-trip unchanged).
+
+    VcfRecords use __slots__ and defer building info_dict and
+    sample_tag_values until they are requested, so a record that only holds
+    a coordinate (see get_empty_record) stays small. Fields added with
+    add_info_field are joined back into the info string once, when info is
+    next read (e.g. by text()). Parsed records store sample values
+    column-wise (one tag list plus a value list per sample);
+    sample_tag_values is then a dict-like view over those columns.
     """
+    __slots__ = ("chrom", "pos", "vcf_id", "ref", "alt", "qual", "filter",
+                 "_info", "_info_dict", "_raw_samples", "_samples", "_columns",
+                 "_key", "_line")
+
     _EMPTY_SET = set()
+    _STALE_INFO = object()
     _FILTERS_TO_REPLACE = set(["", ".", "pass"])
 
     @classmethod
-    def parse_record(cls, vcf_line, sample_names):
+    def parse_record(cls, vcf_line, sample_names, format_layouts=None):
         """Alternative constructor that parses VcfRecord from VCF string.
 
         Aspire to parse/represent the data such that it could be reliably
         round-tripped. (This nicety means INFO fields and FORMAT tags should be
         treated as ordered to avoid shuffling.)
 
+        Sample columns are parsed lazily: the FORMAT and sample fields are
+        kept as raw strings until sample_tag_values is first accessed, so
+        callers which only need the fixed fields (e.g. CHROM/POS/REF/ALT)
+        never pay to split them. Records parsed with the same format_layouts
+        share one parsed layout (tag names, renames) per FORMAT string, and
+        short repeated values are interned through its string table.
+
         Args:
             vcf_line: the VCF variant record as a string; tab separated fields,
                 trailing newlines are ignored. Must have at least 8 fixed fields
                 (through INFO)
             sample_names: a list of sample name strings; these should match
                 the VCF header column
+            format_layouts: optional _FormatLayoutCache (see
+                VcfReader.format_layouts)
         Returns:
             A mutable VcfRecord.
         """
-        vcf_fields = vcf_line.rstrip("\r\n").split("\t")
+        vcf_line = vcf_line.rstrip("\r\n")
+        vcf_fields = vcf_line.split("\t")
         chrom, pos, rid, ref, alt, qual, rfilter, info \
                 = vcf_fields[0:8]
-        sample_fields = []
-        sample_tag_values = {}
+        strings = format_layouts and format_layouts.strings
+        if strings is not None:
+            rid, ref, alt, qual, rfilter = \
+                    strings.get_all((rid, ref, alt, qual, rfilter))
+        record = VcfRecord(chrom, pos, ref, alt,
+                           rid, qual, rfilter, info)
         if len(vcf_fields) > 9:
-            rformat = vcf_fields[8]
-            sample_fields = vcf_fields[9:]
-            sample_tag_values = VcfRecord._sample_tag_values(sample_names,
-                                                             rformat,
-                                                             sample_fields)
-        return VcfRecord(chrom, pos, ref, alt,
-                         rid, qual, rfilter, info,
-                         sample_tag_values)
+            if format_layouts is None:
+                layout = _FormatLayout(vcf_fields[8])
+            else:
+                layout = format_layouts.get(vcf_fields[8])
+            record._raw_samples = (sample_names,
+                                   layout,
+                                   vcf_fields[9:])
+            record._line = vcf_line
+        return record
 
     @classmethod
     def _sample_tag_values(cls, sample_names, rformat, sample_fields):
@@ -202,7 +1121,8 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
 
         Args:
             sample_names: list of sample name strings.
-            rformat: record format string (from VCF record).
+            rformat: record format string (from VCF record) or its parsed
+                _FormatLayout.
             sample_fields: list of strings where each string is the ';'
                 seperated format values for an individual sample.
 
@@ -211,12 +1131,12 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
                 is an dict of format-values. See attribute below for example.
                 Will return '.' if no values for sampe field.
         """
+        layout = rformat
+        if not isinstance(layout, _FormatLayout):
+            layout = _FormatLayout(rformat)
         sample_tag_values = OrderedDict()
-        tag_names = VcfRecord._format_list(rformat)
         for i, sample_field in enumerate(sample_fields):
-            tag_values = sample_field.split(":") if sample_field else "."
-            sample_tag_values[sample_names[i]] = OrderedDict(zip(tag_names,
-                                                                 tag_values))
+            sample_tag_values[sample_names[i]] = layout.tag_values(sample_field)
         return sample_tag_values
 
     @classmethod
@@ -243,43 +1163,106 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
         """Builds a mutable VcfRecord from constituent VCF fields.
 
         If building from a VCF record line, see VcfRecord.parse_record.
+        Records sort by chromosome in natural order (see _contig_key), then
+        position, ref and alt.
         """
-        self.chrom = chrom
+        self.chrom = _intern(chrom)
         self.pos = pos
         self.vcf_id = vcf_id
         self.ref = ref
         self.alt = alt
         self.qual = qual
         self.filter = vcf_filter
-        self.info = info
-        self.info_dict = self._init_info_dict()
+        self._info = info
+        self._info_dict = None
+        self._raw_samples = None
+        self._samples = sample_tag_values
+        self._columns = None
+        self._key = VcfRecord.sort_key(chrom, pos, ref, alt)
+        self._line = None
 
-        if sample_tag_values is None:
-            self.sample_tag_values = OrderedDict()
-        else:
-            self.sample_tag_values = sample_tag_values
-        self._key = self._build_key()
+    @property
+    def sample_tag_values(self):
+        """Returns dict of samples to tag-value dicts, parsing if necessary."""
+        columns = self._sample_columns()
+        if columns is not None:
+            return columns.view
+        if self._samples is None:
+            self._samples = OrderedDict()
+        return self._samples
+
+    @sample_tag_values.setter
+    def sample_tag_values(self, value):
+        self._raw_samples = None
+        self._columns = None
+        self._samples = value
+
+    def _sample_columns(self):
+        """Returns _SampleColumns of a parsed record (None for dict samples)."""
+        if self._raw_samples is not None:
+            self._columns = _SampleColumns.from_raw(*self._raw_samples)
+            self._raw_samples = None
+        return self._columns
+
+    @property
+    def info_dict(self):
+        """Returns dict of info fields, parsing the info string if necessary."""
+        if self._info_dict is None:
+            self._info_dict = self._init_info_dict()
+        return self._info_dict
+
+    @classmethod
+    def sort_key(cls, chrom, pos, ref, alt):
+        """Returns the key VcfRecords with these fields are ordered by.
 
-    def _build_key(self):
-        return (VcfRecord._str_as_int(self.chrom),
-                self.chrom,
-                VcfRecord._str_as_int(self.pos),
-                self.ref,
-                self.alt)
+        Lets callers order raw VCF lines as VcfRecords would be ordered
+        without parsing them.
+        """
+        try:
+            pos = int(pos)
+        except ValueError:
+            pos = cls._str_as_int(pos)
+        return (_contig_key(chrom), pos, ref, alt)
+
+    def _raw_layout(self):
+        """Returns shared layout if samples are unparsed and complete."""
+        if self._raw_samples is not None:
+            dummy, layout, sample_fields = self._raw_samples
+            if layout.matches(sample_fields[0]):
+                return layout
+        return None
 
     @property
     def format_tags(self):
         """Returns set of format tags."""
+        layout = self._raw_layout()
+        if layout is not None:
+            return set(layout.tag_names)
+        if self._sample_columns() is not None:
+            return set(self._columns.present_tags())
         tags = VcfRecord._EMPTY_SET
         if self.sample_tag_values:
             first_sample = list(self.sample_tag_values.keys())[0]
             tags = set(self.sample_tag_values[first_sample].keys())
         return tags
 
+    @property
+    def info(self):
+        """Returns INFO string, re-joining info_dict if fields were added."""
+        if self._info is VcfRecord._STALE_INFO:
+            self._join_info_fields()
+        return self._info
+
+    @info.setter
+    def info(self, value):
+        self._info = value
+        self._info_dict = None
+
     def _init_info_dict(self):
         info_dict = OrderedDict()
-        if self.info and self.info != ".":
-            info_list = self.info.split(";")
+        info = self._info
+        if info and info != ".":
+            info_list = info.split(";")
             for key_value in info_list:
                 if "=" in key_value:
                     key, value = key_value.split("=")
@@ -307,7 +1290,7 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
         else:
             self.info_dict[field] = field
 
-        self._join_info_fields()
+        self._info = VcfRecord._STALE_INFO
 
     #TODO:(cgates): Remove info; all external calls should reference info_dict
     def _join_info_fields(self):
@@ -321,19 +1304,42 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
                     info_fields.append(value)
                 else:
                     info_fields.append("=".join([field, value]))
-            self.info = ";".join(info_fields)
+            self._info = ";".join(info_fields)
         else:
-            self.info = "."
+            self._info = "."
+
+    def _project(self, info_fields=None, sample_indexes=None):
+        """Drops INFO fields and samples not requested by a VcfReader."""
+        if info_fields is not None:
+            kept_fields = []
+            if info_fields:
+                kept_fields = [field for field in self.info.split(";")
+                               if field.split("=", 1)[0] in info_fields]
+            self.info = ";".join(kept_fields) if kept_fields else "."
+        if sample_indexes is not None and self._raw_samples is not None:
+            sample_names, layout, sample_fields = self._raw_samples
+            self._raw_samples = (sample_names,
+                                 layout,
+                                 [sample_fields[i] for i in sample_indexes
+                                  if i < len(sample_fields)])
+            self._line = None
 
     #TODO cgates: move this to merge
     def get_empty_record(self):
-        return VcfRecord(chrom=self.chrom,
-                         pos=self.pos,
-                         ref=self.ref,
-                         alt=self.alt)
+        empty_record = VcfRecord(chrom=self.chrom,
+                                 pos=self.pos,
+                                 ref=self.ref,
+                                 alt=self.alt)
+        empty_record._key = self._key
+        return empty_record
 
     def _format_tag_fields(self):
         """Returns list of format tag names."""
+        layout = self._raw_layout()
+        if layout is not None:
+            return list(layout.tag_names)
+        if self._sample_columns() is not None:
+            return self._columns.present_tags()
         tag_names = []
         if self.sample_tag_values:
             first_sample = list(self.sample_tag_values.keys())[0]
@@ -346,6 +1352,19 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
         Missing sample_tag_values padded as '.'.
         If tag_names empty, returns '.'.
 
+        Raises:
+            KeyError: if requested sample is not defined.
+            ValueError if sample_tag_values has more keys than tag_names.
+        """
+        tag_values = self._sample_values(tag_names, sample)
+        if tag_values:
+            return ":".join(tag_values)
+        else:
+            return "."
+
+    def _sample_values(self, tag_names, sample):
+        """Returns list of sample-format values ordered by tag_names.
+
         Raises:
             KeyError: if requested sample is not defined.
             ValueError if sample_tag_values has more keys than tag_names.
@@ -366,14 +1385,59 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
                          ', '.join(missing_tag_names)
                          )
             raise ValueError(msg)
-        tag_values = [sample_tag_values.get(t, '.') for t in tag_names]
-        if tag_values:
-            return ":".join(tag_values)
-        else:
-            return "."
+        return [sample_tag_values.get(t, '.') for t in tag_names]
+
+    def _all_sample_values(self, tag_names, check=True):
+        """Returns per-sample value lists as written by text().
+
+        Unless check, assumes every sample's tags are within tag_names.
+        """
+        if self._sample_columns() is not None:
+            sample_values = self._columns.sample_values(tag_names, check)
+            if sample_values is not None:
+                return sample_values
+        if not check:
+            return [[tag_values.get(tag, ".") for tag in tag_names]
+                    for tag_values in self.sample_tag_values.values()]
+        return [self._sample_values(tag_names, sample)
+                for sample in self.sample_tag_values]
+
+    def _fixed_fields(self):
+        return (self.chrom, self.pos, self.vcf_id, self.ref, self.alt,
+                self.qual, self.filter, self.info)
+
+    def _samples_verbatim(self):
+        """True if FORMAT and sample columns of the parsed line still apply."""
+        if self._line is None or self._samples is not None:
+            return False
+        if self._raw_samples is not None:
+            sample_names, layout, sample_fields = self._raw_samples
+            return layout.verbatim_samples(sample_names, sample_fields)
+        return self._columns is not None and self._columns.matches_raw
+
+    def text(self, trusted=False):
+        """Returns tab-delimited, newline terminated string of VcfRecord.
+
+        A parsed record whose FORMAT and sample columns are unchanged reuses
+        the text of the original line: all of it if the fixed fields are
+        also unchanged, otherwise just the FORMAT and sample columns.
+
+        Args:
+            trusted: True for records whose samples all share the FORMAT
+                tags by construction (e.g. merge's output); skips checking
+                them unless CHECK_TRUSTED_RECORDS is set.
+
+        Raises:
+            ValueError: if not trusted and a sample has tags missing from
+                the first sample.
+        """
+        if self._samples_verbatim():
+            fixed_fields = self._fixed_fields()
+            line_fields = self._line.split("\t", 8)
+            if fixed_fields == tuple(line_fields[0:8]):
+                return self._line + "\n"
+            return "\t".join(fixed_fields + (line_fields[8],)) + "\n"
 
-    def text(self):
-        "Returns tab-delimited, newline terminated string of VcfRecord."
         tag_names = self._format_tag_fields()
         format_field = '.' if not tag_names else ':'.join(tag_names)
 
@@ -381,8 +1445,9 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
                   self.qual, self.filter, self.info,
                   format_field]
 
-        for sample in self.sample_tag_values:
-            fields.append(self._sample_field(tag_names, sample))
+        check = not trusted or CHECK_TRUSTED_RECORDS
+        for values in self._all_sample_values(tag_names, check):
+            fields.append(":".join(values) if values else ".")
 
         return "\t".join(fields) + "\n"
 
@@ -400,6 +1465,11 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
         Raises:
             KeyError: if tag_name to be added already exists
         """
+        columns = self._sample_columns()
+        if columns is not None:
+            self._add_sample_column(columns, tag_name, new_sample_values)
+            return
+
         if tag_name in self.format_tags:
             msg = "New format value [{}] already exists.".format(tag_name)
             raise KeyError(msg)
@@ -411,6 +1481,35 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
             value = str(new_sample_values[sample])
             self.sample_tag_values[sample][tag_name] = value
 
+    @staticmethod
+    def _add_sample_column(columns, tag_name, new_sample_values):
+        if columns.has_tag(tag_name):
+            msg = "New format value [{}] already exists.".format(tag_name)
+            raise KeyError(msg)
+        if len(new_sample_values) != len(columns.sample_names) or \
+                not all(sample in new_sample_values
+                        for sample in columns.sample_names):
+            raise KeyError("Sample name values must match "
+                           "existing sample names")
+        values = [str(new_sample_values[sample])
+                  for sample in columns.sample_names]
+        columns.set_tag(tag_name, values)
+
+    def add_tags(self, tags):
+        """Adds the values of each tag (e.g. a caller's tags) to this record.
+
+        Equivalent to calling tag.add_tag_values(self) for each tag, but
+        sample names and existing format tags are gathered once rather than
+        on every add_sample_tag_value.
+
+        Returns:
+            this VcfRecord
+        """
+        appender = _TagAppender(self)
+        for tag in tags:
+            tag.add_tag_values(appender)
+        return self
+
     def add_or_replace_filter(self, new_filter):
         """Replaces null or blank filter or adds filter to existing list."""
         if self.filter.lower() in self._FILTERS_TO_REPLACE:
@@ -424,6 +1523,9 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
     def __eq__(self, other):
         return isinstance(other, VcfRecord) and self._key == other._key
 
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
     def __hash__(self):
         return hash(self._key)
 
@@ -431,12 +1533,61 @@ class VcfRecord(object): #pylint: disable=too-many-instance-attributes
         return self._key < other._key
 
 
+class _TagAppender(object):
+    """Stands in for a VcfRecord while VcfRecord.add_tags runs its tags.
+
+    New format tags are checked against sample names and format tags
+    gathered when the appender is built and written straight through, so
+    later tags see them. Everything else is delegated to the record.
+    """
+    def __init__(self, vcf_record):
+        self._record = vcf_record
+        self._columns = vcf_record._sample_columns() #pylint: disable=protected-access
+        self._sample_names = list(vcf_record.sample_tag_values)
+        self._format_tags = set(vcf_record.format_tags)
+
+    def __getattr__(self, name):
+        return getattr(self._record, name)
+
+    def add_sample_tag_value(self, tag_name, new_sample_values):
+        """See VcfRecord.add_sample_tag_value."""
+        if tag_name in self._format_tags:
+            msg = "New format value [{}] already exists.".format(tag_name)
+            raise KeyError(msg)
+        try:
+            if len(new_sample_values) != len(self._sample_names):
+                raise KeyError()
+            values = [str(new_sample_values[sample])
+                      for sample in self._sample_names]
+        except KeyError:
+            raise KeyError("Sample name values must match "
+                           "existing sample names")
+        if self._columns is not None:
+            self._columns.set_tag(tag_name, values)
+        else:
+            sample_tag_values = self._record.sample_tag_values
+            for sample, value in zip(self._sample_names, values):
+                sample_tag_values[sample][tag_name] = value
+        self._format_tags.add(tag_name)
+
+
 #TODO cgates: add context management to open/close
 class FileWriter(object):
-    """Trivial wrapper around os file to expedite testing."""
-    def __init__(self, output_filepath):
+    """Trivial wrapper around os file to expedite testing.
+
+    Writes are gathered in memory and passed to the file with writelines
+    once buffer_size characters have accumulated (and on flush/close); this
+    keeps the number of filesystem writes low on network filesystems. A
+    buffer_size of 0 writes each call straight through.
+    """
+    DEFAULT_BUFFER_SIZE = 1 << 20
+
+    def __init__(self, output_filepath, buffer_size=DEFAULT_BUFFER_SIZE):
         self.output_filepath = output_filepath
+        self.buffer_size = buffer_size
         self._file_writer = None
+        self._buffer = []
+        self._buffered_length = 0
 
     @property
     def file_name(self):
@@ -446,10 +1597,36 @@ class FileWriter(object):
         self._file_writer = open(self.output_filepath, "w")
 
     def write(self, text):
-        return self._file_writer.write(text)
+        if not self.buffer_size:
+            return self._file_writer.write(text)
+        self._buffer.append(text)
+        self._buffered_length += len(text)
+        if self._buffered_length >= self.buffer_size:
+            self.flush()
+
+    def writelines(self, lines):
+        """Writes each string in iterable lines (newlines are not added)."""
+        for line in lines:
+            self.write(line)
+
+    def write_records(self, vcf_records, trusted=False):
+        """Writes the text of each VcfRecord in iterable vcf_records.
+
+        See VcfRecord.text for trusted.
+        """
+        self.writelines(vcf_record.text(trusted) for vcf_record in vcf_records)
+
+    def flush(self):
+        if self._buffer:
+            self._file_writer.writelines(self._buffer)
+            self._buffer = []
+            self._buffered_length = 0
 
     def close(self):
-        self._file_writer.close()
+        try:
+            self.flush()
+        finally:
+            self._file_writer.close()
 
     def __eq__(self, other):
         return (isinstance(other, self.__class__)
@@ -461,24 +1638,609 @@ class FileWriter(object):
     def __hash__(self):
         return hash(self.output_filepath)
 
+_BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+# Inflated BGZF blocks (up to 64KB each) queued ahead of the reader; a few
+# keep the inflater busy without holding megabytes per open file.
+_BGZF_READ_AHEAD_BLOCKS = 4
+
+def _is_bgzf(input_filepath):
+    """Returns True if the file starts with a BGZF (blocked gzip) header."""
+    with open(input_filepath, "rb") as handle:
+        header = handle.read(18)
+    return (len(header) == 18
+            and header[0:4] == _BGZF_MAGIC
+            and header[12:14] == b"BC")
+
+def _read_bgzf_block(handle):
+    """Reads next raw BGZF block; returns (block offset, deflated data).
+
+    Returns None at end of file. See the SAM/BAM specification for details
+    on the BGZF block layout.
+    """
+    block_offset = handle.tell()
+    block_size, xlen = _read_bgzf_block_size(handle)
+    if block_size is None:
+        return None
+    deflated_data = handle.read(block_size - xlen - 19)
+    handle.read(8) #CRC32 and ISIZE
+    return block_offset, deflated_data
+
+def _read_bgzf_block_size(handle):
+    """Reads BGZF block header; returns (BSIZE, XLEN) or (None, None) at EOF.
+
+    Leaves handle positioned after the header's extra subfields.
+    """
+    header = handle.read(12)
+    if not header:
+        return None, None
+    if len(header) < 12 or header[0:4] != _BGZF_MAGIC:
+        raise utils.JQException("ERROR: [{}] is not a valid BGZF file.",
+                                handle.name)
+    xlen = struct.unpack("<H", header[10:12])[0]
+    extra = handle.read(xlen)
+    block_size = None
+    i = 0
+    while i < xlen:
+        subfield_id1, subfield_id2, subfield_length = \
+                struct.unpack("<BBH", extra[i:i + 4])
+        if (subfield_id1, subfield_id2) == (66, 67):
+            block_size = struct.unpack("<H", extra[i + 4:i + 6])[0]
+        i += 4 + subfield_length
+    if block_size is None:
+        raise utils.JQException("ERROR: [{}] is missing a BGZF block size.",
+                                handle.name)
+    return block_size, xlen
+
+class _BgzfInflater(threading.Thread):
+    """Background thread that reads and inflates BGZF blocks.
+
+    Inflated blocks are queued in order (bounded to a fixed read-ahead) so
+    decompression overlaps with parsing in the consuming thread; zlib
+    releases the GIL while it inflates. Queue items are (block offset,
+    inflated data, next block offset) tuples, an exception raised by the
+    thread, or None at end of file.
+    """
+    def __init__(self, handle, read_ahead=_BGZF_READ_AHEAD_BLOCKS):
+        super(_BgzfInflater, self).__init__()
+        self.daemon = True
+        self.blocks = queue.Queue(read_ahead)
+        self._handle = handle
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                block = _read_bgzf_block(self._handle)
+                if block is None:
+                    break
+                block_offset, deflated_data = block
+                self._put((block_offset,
+                           zlib.decompress(deflated_data, -15),
+                           self._handle.tell()))
+        except Exception as exception: #pylint: disable=broad-except
+            self._put(exception)
+        self._put(None)
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class _BgzfRawStream(io.RawIOBase):
+    """Readable raw stream of the inflated contents of a BGZF file.
+
+    The stream can start at any BGZF virtual offset (compressed block offset
+    << 16 | offset within the inflated block), e.g. from a tabix index, and
+    reports the virtual offset it has read up to. At most read_ahead
+    inflated blocks are queued ahead of the reader. It buffers no more than
+    the current block itself, so read and readline can be used without an
+    io.BufferedReader when that offset must match what the caller consumed.
+    """
+    def __init__(self,
+                 input_filepath,
+                 virtual_offset=0,
+                 read_ahead=_BGZF_READ_AHEAD_BLOCKS):
+        super(_BgzfRawStream, self).__init__()
+        self._handle = open(input_filepath, "rb")
+        self._handle.seek(virtual_offset >> 16)
+        self._inflater = _BgzfInflater(self._handle, read_ahead)
+        self._inflater.start()
+        self._block = b""
+        self._block_offset = virtual_offset >> 16
+        self._next_block_offset = virtual_offset >> 16
+        self._block_position = 0
+        self._exhausted = False
+        if virtual_offset & 0xffff:
+            self._next_block()
+            self._block_position = virtual_offset & 0xffff
+
+    @property
+    def virtual_offset(self):
+        """Returns BGZF virtual offset of the next byte to be read."""
+        if self._block_position < len(self._block):
+            return self._block_offset << 16 | self._block_position
+        return self._next_block_offset << 16
+
+    def readable(self):
+        return True
+
+    def _next_block(self):
+        item = self._inflater.blocks.get()
+        if item is None:
+            self._exhausted = True
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            self._block_offset, self._block, self._next_block_offset = item
+            self._block_position = 0
+
+    def _fill(self):
+        """Returns False at end of file, else ensures the block has data."""
+        while self._block_position >= len(self._block):
+            if self._exhausted:
+                return False
+            self._next_block()
+        return True
+
+    def readinto(self, buffer):
+        if not self._fill():
+            return 0
+        size = min(len(buffer), len(self._block) - self._block_position)
+        end = self._block_position + size
+        buffer[0:size] = self._block[self._block_position:end]
+        self._block_position = end
+        return size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        chunks = []
+        while size > 0 and self._fill():
+            end = min(len(self._block), self._block_position + size)
+            chunks.append(self._block[self._block_position:end])
+            size -= end - self._block_position
+            self._block_position = end
+        return b"".join(chunks)
+
+    def readline(self, size=-1):
+        if size is not None and size >= 0:
+            return super(_BgzfRawStream, self).readline(size)
+        end = self._block.find(b"\n", self._block_position) + 1
+        if end:
+            line = self._block[self._block_position:end]
+            self._block_position = end
+            return line
+        chunks = []
+        while self._fill():
+            end = self._block.find(b"\n", self._block_position) + 1
+            if end == 0:
+                end = len(self._block)
+            chunks.append(self._block[self._block_position:end])
+            self._block_position = end
+            if chunks[-1].endswith(b"\n"):
+                break
+        return b"".join(chunks)
+
+    def close(self):
+        if not self.closed:
+            self._inflater.stop()
+            self._handle.close()
+        super(_BgzfRawStream, self).close()
+
+
+def _open_gzip(input_filepath):
+    """Opens gzip or BGZF file as a text stream of inflated lines."""
+    if _is_bgzf(input_filepath):
+        binary_stream = io.BufferedReader(_BgzfRawStream(input_filepath))
+    else:
+        binary_stream = gzip.GzipFile(input_filepath, "rb")
+    return _text_lines(binary_stream)
+
+def _open_text(input_filepath):
+    """Opens plain or compressed file as a text stream of lines."""
+    if input_filepath.endswith(_GZIP_EXTENSIONS):
+        return _open_gzip(input_filepath)
+    return open(input_filepath, "r")
+
+def _region_lines(lines, chrom, start, end, is_sorted=True):
+    """Yields record lines on chrom where start <= POS <= end.
+
+    When is_sorted, stops at the first line past the region instead of
+    scanning to the end of lines.
+    """
+    in_chrom = False
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        fields = line.split("\t", 2)
+        if fields[0] != chrom:
+            if in_chrom and is_sorted:
+                break
+            continue
+        in_chrom = True
+        pos = int(fields[1])
+        if pos < start:
+            continue
+        if pos > end:
+            if is_sorted:
+                break
+            continue
+        yield line
+
+
+class _TabixIndex(object):
+    """Reads a tabix (.tbi) index of a BGZF file.
+
+    Only the offset of the first chunk which could contain a region is used;
+    records are then streamed until the region is exhausted. See the tabix
+    specification for details on the binning and linear index.
+    """
+    EXTENSION = ".tbi"
+    _LINEAR_SHIFT = 14
+    _BIN_LEVELS = ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681))
+
+    def __init__(self, references):
+        self._references = references
+
+    @classmethod
+    def load(cls, index_path):
+        index_file = gzip.GzipFile(index_path, "rb")
+        try:
+            data = index_file.read()
+        finally:
+            index_file.close()
+        if data[0:4] != b"TBI\x01":
+            raise utils.JQException("ERROR: [{}] is not a valid tabix index.",
+                                    index_path)
+        n_ref = struct.unpack("<i", data[4:8])[0]
+        names_length = struct.unpack("<i", data[32:36])[0]
+        names = data[36:36 + names_length].split(b"\x00")[:n_ref]
+        position = 36 + names_length
+        references = {}
+        for name in names:
+            bins = {}
+            n_bin = struct.unpack("<i", data[position:position + 4])[0]
+            position += 4
+            for _ in range(n_bin):
+                bin_id, n_chunk = struct.unpack("<Ii",
+                                                data[position:position + 8])
+                position += 8
+                chunks = struct.unpack("<{}Q".format(2 * n_chunk),
+                                       data[position:position + 16 * n_chunk])
+                position += 16 * n_chunk
+                bins[bin_id] = list(zip(chunks[0::2], chunks[1::2]))
+            n_intv = struct.unpack("<i", data[position:position + 4])[0]
+            position += 4
+            linear_index = struct.unpack("<{}Q".format(n_intv),
+                                         data[position:position + 8 * n_intv])
+            position += 8 * n_intv
+            references[name.decode("utf-8")] = (bins, linear_index)
+        return cls(references)
+
+    @classmethod
+    def _bins(cls, begin, end):
+        """Returns tabix bins overlapping zero-based, half-open [begin, end)."""
+        end -= 1
+        bins = [0]
+        for shift, first_bin in cls._BIN_LEVELS:
+            bins.extend(range(first_bin + (begin >> shift),
+                              first_bin + (end >> shift) + 1))
+        return bins
+
+    def start_offset(self, chrom, start, end):
+        """Returns virtual offset to start reading region or None if empty."""
+        if chrom not in self._references:
+            return None
+        bins, linear_index = self._references[chrom]
+        begin = start - 1
+        min_offset = 0
+        if linear_index:
+            window = min(begin >> self._LINEAR_SHIFT, len(linear_index) - 1)
+            min_offset = linear_index[window]
+        chunk_starts = []
+        for bin_id in self._bins(begin, end):
+            for chunk_start, chunk_end in bins.get(bin_id, []):
+                if chunk_end > min_offset:
+                    chunk_starts.append(max(chunk_start, min_offset))
+        return min(chunk_starts) if chunk_starts else None
+
+
+class _LineOffsetIndex(object):
+    """Jacquard sidecar index of byte offsets into a plain-text VCF.
+
+    Stores the offset of the first record of each contig and of every
+    _INTERVAL-th record thereafter. The sidecar file records the size and
+    mtime of the indexed VCF so a stale index is rebuilt.
+    """
+    EXTENSION = ".jqi"
+    _INTERVAL = 1024
+
+    def __init__(self, source_stat, entries):
+        self.source_stat = source_stat
+        self._entries = entries
+
+    @staticmethod
+    def _stat(input_filepath):
+        stat = os.stat(input_filepath)
+        return "{}\t{!r}".format(stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def build(cls, input_filepath):
+        entries = OrderedDict()
+        last_chrom = None
+        count = 0
+        offset = 0
+        with open(input_filepath, "rb") as vcf_file:
+            for line in vcf_file:
+                if not line.startswith(b"#"):
+                    chrom, pos = line.split(b"\t", 2)[0:2]
+                    if chrom != last_chrom or count % cls._INTERVAL == 0:
+                        positions, offsets = entries.setdefault(
+                            chrom.decode("utf-8"), ([], []))
+                        positions.append(int(pos))
+                        offsets.append(offset)
+                        last_chrom = chrom
+                        count = 0
+                    count += 1
+                offset += len(line)
+        return cls(cls._stat(input_filepath), entries)
+
+    @classmethod
+    def load(cls, index_path, input_filepath):
+        """Returns saved index or None if it is missing or stale."""
+        try:
+            with open(index_path, "r") as index_file:
+                source_stat = index_file.readline().rstrip("\n")
+                if source_stat != cls._stat(input_filepath):
+                    return None
+                entries = OrderedDict()
+                for line in index_file:
+                    chrom, pos, offset = line.rstrip("\n").split("\t")
+                    positions, offsets = entries.setdefault(chrom, ([], []))
+                    positions.append(int(pos))
+                    offsets.append(int(offset))
+        except (IOError, OSError, ValueError):
+            return None
+        return cls(source_stat, entries)
+
+    def save(self, index_path):
+        with open(index_path, "w") as index_file:
+            index_file.write(self.source_stat + "\n")
+            for chrom, (positions, offsets) in self._entries.items():
+                for pos, offset in zip(positions, offsets):
+                    index_file.write("{}\t{}\t{}\n".format(chrom, pos, offset))
+
+    def start_offset(self, chrom, start, dummy_end):
+        """Returns byte offset to start reading region or None if empty."""
+        if chrom not in self._entries:
+            return None
+        positions, offsets = self._entries[chrom]
+        i = max(bisect.bisect_left(positions, start) - 1, 0)
+        return offsets[i]
+
+
+class FileHandlePool(object):
+    """Caps how many pooled FileReaders hold an open file handle at once.
+
+    When a pooled reader needs its handle and the pool is full, the least
+    recently used reader is suspended: it closes its handle, keeping its
+    offset, and reopens and seeks the next time it reads. This lets a
+    process read more files concurrently than its open file limit allows.
+    """
+    def __init__(self, max_open):
+        if max_open < 1:
+            raise ValueError("max_open must be positive")
+        self.max_open = max_open
+        self._readers = OrderedDict()
+
+    def __len__(self):
+        return len(self._readers)
+
+    def acquire(self, file_reader):
+        """Marks file_reader most recently used, suspending others if full."""
+        key = id(file_reader)
+        if key in self._readers:
+            self._readers[key] = self._readers.pop(key)
+            return
+        while len(self._readers) >= self.max_open:
+            dummy, lru_reader = self._readers.popitem(last=False)
+            lru_reader._suspend() #pylint: disable=protected-access
+        self._readers[key] = file_reader
+
+    def release(self, file_reader):
+        self._readers.pop(id(file_reader), None)
+
+
 class FileReader(object):
-    """Trivial wrapper around os file to expedite testing/natural sorting."""
+    """Trivial wrapper around os file to expedite testing/natural sorting.
+
+    Files with a .gz or .bgz extension are transparently decompressed; BGZF
+    files (e.g. from bgzip) are inflated in a background thread.
+
+    A FileReader with a handle_pool (see FileHandlePool) reads lines through
+    a binary handle that the pool may close between reads; it tracks its
+    byte offset (a virtual offset for BGZF) and reopens at that offset when
+    needed. Resuming is cheap for plain and BGZF files; plain gzip must be
+    re-inflated up to the offset (see resumes_cheaply).
+
+    read_line_blocks is a faster alternative to read_lines for scanning a
+    whole file: it reads large binary blocks and splits them into lines
+    itself (see VcfReader.vcf_records).
+    """
+    READ_BLOCK_SIZE = 1 << 20
 
-    def __init__(self, input_filepath):
+    def __init__(self, input_filepath, handle_pool=None):
         self.input_filepath = input_filepath
         self.file_name = os.path.basename(input_filepath)
+        self.handle_pool = handle_pool
         self._file_reader = None
+        self._offset = 0
+        self._virtual_offset = 0
 
     def open(self):
-        self._file_reader = open(self.input_filepath, "r")
+        if self.handle_pool is None:
+            self._file_reader = _open_text(self.input_filepath)
+        else:
+            self._file_reader = None
+            self._offset = 0
+            self._virtual_offset = 0
+
+    def resumes_cheaply(self):
+        """False if a pooled reader must re-inflate the file to resume.
+
+        That is the case for gzip files which are not BGZF.
+        """
+        return not self.input_filepath.endswith(_GZIP_EXTENSIONS) \
+                or _is_bgzf(self.input_filepath)
 
     def read_lines(self):
+        if self.handle_pool is not None:
+            for line in self._read_pooled_lines():
+                yield line
+            return
         for line in self._file_reader:
             yield line
 
+    def read_line_blocks(self):
+        """Generates lists of lines read in large binary blocks.
+
+        Each block is cut at its last newline, decoded once and split, which
+        skips text-mode newline translation and a generator step per line.
+        Lines have no trailing newline; a '\\r' from CRLF files is kept.
+        Use either read_lines or read_line_blocks after each open, not both.
+        """
+        remainder = b""
+        while True:
+            block = self._read_block()
+            if not block:
+                break
+            if remainder:
+                block = remainder + block
+            end = block.rfind(b"\n")
+            if end < 0:
+                remainder = block
+                continue
+            remainder = block[end + 1:]
+            yield _native_str(block[0:end]).split("\n")
+        if remainder:
+            yield [_native_str(remainder)]
+
+    def _read_block(self):
+        if self.handle_pool is None:
+            handle = getattr(self._file_reader, "buffer", self._file_reader)
+            return handle.read(self.READ_BLOCK_SIZE)
+        self.handle_pool.acquire(self)
+        if self._file_reader is None:
+            self._file_reader = self._open_binary_at(self._offset)
+        block = self._file_reader.read(self.READ_BLOCK_SIZE)
+        self._offset += len(block)
+        return block
+
+    def _read_pooled_lines(self):
+        while True:
+            self.handle_pool.acquire(self)
+            if self._file_reader is None:
+                self._file_reader = self._open_binary_at(self._offset)
+            line = self._file_reader.readline()
+            if not line:
+                return
+            self._offset += len(line)
+            yield _native_str(line)
+
+    def _open_binary_at(self, offset):
+        if not self.input_filepath.endswith(_GZIP_EXTENSIONS):
+            handle = open(self.input_filepath, "rb")
+            handle.seek(offset)
+        elif _is_bgzf(self.input_filepath):
+            handle = _BgzfRawStream(self.input_filepath, self._virtual_offset)
+        else:
+            handle = gzip.GzipFile(self.input_filepath, "rb")
+            handle.seek(offset)
+        return handle
+
+    def _suspend(self):
+        """Closes the handle; the next read reopens at the same offset."""
+        if self._file_reader is not None:
+            if isinstance(self._file_reader, _BgzfRawStream):
+                self._virtual_offset = self._file_reader.virtual_offset
+            self._file_reader.close()
+            self._file_reader = None
+
     def close(self):
+        if self.handle_pool is not None:
+            self.handle_pool.release(self)
+            self._suspend()
+            return
         self._file_reader.close()
 
+    def _load_index(self):
+        """Returns tabix index for BGZF input or a Jacquard sidecar index.
+
+        Plain-text VCFs are indexed on first use and the index is saved
+        alongside the VCF when possible. Returns None when the file cannot
+        be indexed (e.g. gzip which is not BGZF, or BGZF with no .tbi).
+        """
+        if self.input_filepath.endswith(_GZIP_EXTENSIONS):
+            index_path = self.input_filepath + _TabixIndex.EXTENSION
+            if _is_bgzf(self.input_filepath) and os.path.isfile(index_path):
+                return _TabixIndex.load(index_path)
+            return None
+
+        index_path = self.input_filepath + _LineOffsetIndex.EXTENSION
+        index = _LineOffsetIndex.load(index_path, self.input_filepath)
+        if index is None:
+            index = _LineOffsetIndex.build(self.input_filepath)
+            try:
+                index.save(index_path)
+            except (IOError, OSError):
+                pass
+        return index
+
+    def _read_lines_from(self, offset):
+        if self.input_filepath.endswith(_GZIP_EXTENSIONS):
+            raw_stream = _BgzfRawStream(self.input_filepath, offset)
+            with _text_lines(io.BufferedReader(raw_stream)) as lines:
+                for line in lines:
+                    yield line
+        else:
+            with open(self.input_filepath, "rb") as vcf_file:
+                vcf_file.seek(offset)
+                for line in vcf_file:
+                    yield _native_str(line)
+
+    def fetch_lines(self, chrom, start=None, end=None):
+        """Generates record lines on chrom where start <= POS <= end.
+
+        Uses an index to jump to the region when one is available; otherwise
+        scans the whole file. Does not require (or disturb) open().
+        """
+        start = 1 if start is None else start
+        end = sys.maxsize if end is None else end
+        index = self._load_index()
+        if index is None:
+            with _open_text(self.input_filepath) as lines:
+                for line in _region_lines(lines, chrom, start, end,
+                                          is_sorted=False):
+                    yield line
+            return
+
+        offset = index.start_offset(chrom, start, min(end, 1 << 29))
+        if offset is None:
+            return
+        for line in _region_lines(self._read_lines_from(offset),
+                                  chrom,
+                                  start,
+                                  end):
+            yield line
+
     def __eq__(self, other):
         return (isinstance(other, self.__class__)
                 and self.__dict__ == other.__dict__)
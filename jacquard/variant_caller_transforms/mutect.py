@@ -1,6 +1,6 @@
 """Interprets MuTect VCF files adding Jacquard standard information.
 
-MuTect VCFs are assumed to have a ".vcf" extension and have a valid
+MuTect VCFs are assumed to have a ".vcf" (or ".vcf.gz") extension and have a valid
 "##MuTect=..." metaheader.
 """
 from __future__ import print_function, absolute_import, division
@@ -309,7 +309,7 @@ class Mutect(object):
 
     @staticmethod
     def _is_mutect_vcf(file_reader):
-        if not file_reader.file_name.lower().endswith(".vcf"):
+        if not vcf.is_vcf_file_name(file_reader.file_name.lower()):
             return False
         vcf_reader = vcf.VcfReader(file_reader)
         return _get_mutect_parser(vcf_reader.metaheaders) != None
@@ -434,6 +434,4 @@ class _MutectVcfReader(object):
             yield self._add_tags(vcf_record)
 
     def _add_tags(self, vcf_record):
-        for tag in self.tags:
-            tag.add_tag_values(vcf_record)
-        return vcf_record
+        return vcf_record.add_tags(self.tags)
@@ -1,6 +1,6 @@
 """Interprets Strelka VCF files adding Jacquard standard information.
 
-* Strelka VCFs are assumed to have a ".vcf" extension and have a
+* Strelka VCFs are assumed to have a ".vcf" (or ".vcf.gz") extension and have a
     "##source=strelka" metaheader.
 * Strelka produces a separate file for SNVs and indels. Jacquard can process
     either or both.
@@ -12,7 +12,6 @@ See tag definitions for more info.
 from __future__ import print_function, absolute_import, division
 
 from collections import defaultdict, OrderedDict
-import os
 import re
 
 import jacquard.utils.logger as logger
@@ -236,7 +235,7 @@ class Strelka(object):
 
     @staticmethod
     def _is_strelka_vcf(file_reader):
-        if file_reader.file_name.endswith(".vcf"):
+        if vcf.is_vcf_file_name(file_reader.file_name):
             vcf_reader = vcf.VcfReader(file_reader)
             return "##source=strelka" in vcf_reader.metaheaders
         return False
@@ -246,7 +245,7 @@ class Strelka(object):
         unclaimed_readers = []
         for file_reader in file_readers:
             if self._is_strelka_vcf(file_reader):
-                prefix, _ = os.path.splitext(file_reader.file_name)
+                prefix, _ = vcf.split_vcf_extension(file_reader.file_name)
                 prefix_dict[prefix] = file_reader
             else:
                 unclaimed_readers.append(file_reader)
@@ -376,6 +375,4 @@ class _StrelkaVcfReader(object):
             yield self._add_tags(vcf_record)
 
     def _add_tags(self, vcf_record):
-        for tag in self.tags:
-            tag.add_tag_values(vcf_record)
-        return vcf_record
+        return vcf_record.add_tags(self.tags)
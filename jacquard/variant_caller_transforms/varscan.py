@@ -1,6 +1,6 @@
 """Interprets VarScan2 VCF files adding Jacquard standard information.
 
-* VarScan VCFs are assumed to have a ".vcf" extension and have a
+* VarScan VCFs are assumed to have a ".vcf" (or ".vcf.gz") extension and have a
     "##source=VarScan2" metaheader.
 * VarScan produces a separate file for SNPs and indels. Jacquard can process
     either or both.
@@ -20,7 +20,6 @@ See tag definitions for more info.
 from __future__ import print_function, absolute_import, division
 
 from collections import defaultdict, OrderedDict
-import os
 import re
 
 import jacquard.utils.logger as logger
@@ -207,7 +206,7 @@ class Varscan(object):
 
     @staticmethod
     def _is_varscan_vcf(file_reader):
-        if file_reader.file_name.endswith(".vcf"):
+        if vcf.is_vcf_file_name(file_reader.file_name):
             vcf_reader = vcf.VcfReader(file_reader)
             return "##source=VarScan2" in vcf_reader.metaheaders
         return False
@@ -266,7 +265,7 @@ class Varscan(object):
 
         for file_reader in file_readers:
             if self._is_varscan_vcf(file_reader):
-                prefix, _ = os.path.splitext(file_reader.file_name)
+                prefix, _ = vcf.split_vcf_extension(file_reader.file_name)
                 prefix_file_readers[prefix] = file_reader
             elif self._is_varscan_hc_filename(file_reader):
                 filter_files.add(file_reader)
@@ -482,6 +481,4 @@ class _VarscanVcfReader(object):
             yield self._add_tags(vcf_record)
 
     def _add_tags(self, vcf_record):
-        for tag in self.tags:
-            tag.add_tag_values(vcf_record)
-        return vcf_record
+        return vcf_record.add_tags(self.tags)
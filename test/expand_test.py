@@ -62,6 +62,20 @@ class ExpandTestCase(test_case.JacquardBaseTestCase):
                          "AF|SAMPLE_A|TUMOR": "0.3"}
         self.assertEquals(expected_dict, actual_dict)
 
+    def test_create_row_dict_sampleMatrix(self):
+        column_list = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER",
+                       "INFO", "FORMAT", "SAMPLE_A|NORMAL", "SAMPLE_A|TUMOR"]
+        sample_tag_values = OrderedDict([("SAMPLE_A|NORMAL", OrderedDict([("DP", "50")])),
+                                         ("SAMPLE_A|TUMOR", OrderedDict([("DP", "87"), ("AF", "0.3")]))])
+        vcf_record = vcf.VcfRecord("1", "42", "A", "AT", info="SOMATIC=1",
+                                   sample_tag_values=sample_tag_values)
+        sample_matrix = vcf.SampleMatrix.from_record(vcf_record)
+
+        actual_dict = expand._create_row_dict(column_list, vcf_record, sample_matrix)
+
+        self.assertEquals(expand._create_row_dict(column_list, vcf_record), actual_dict)
+        self.assertNotIn("AF|SAMPLE_A|NORMAL", actual_dict)
+
     def test_create_row_dict_fieldNamesMangledToAvoidCollision(self):
         column_list = ["CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER",
                        "INFO" ] #, "FORMAT", "SAMPLE_A|NORMAL", "SAMPLE_A|TUMOR"]
@@ -208,6 +222,23 @@ class ExpandTestCase(test_case.JacquardBaseTestCase):
                                      ("GT|sampleB", "GT")])
         self.assertEquals(expected_cols, actual_cols)
 
+    def test_build_projection(self):
+        metaheaders = ['##INFO=<ID=AF,Number=1,Description="AF revealed">',
+                       '##INFO=<ID=AA,Number=1,Description="AA revealed">',
+                       '##INFO=<ID=QUAL,Number=1,Description="QUAL revealed">',
+                       '##FORMAT=<ID=GT,Number=1,Description="GT revealed">',
+                       '##FORMAT=<ID=GQ,Number=1,Description="GQ revealed">']
+        mock_vcf_reader = MockVcfReader(metaheaders=metaheaders,
+                                        sample_names=["sampleA", "sampleB"])
+
+        actual = expand._build_projection(mock_vcf_reader,
+                                          ["CHROM", "AF", "INFO_QUAL", "GQ|sampleB"])
+
+        self.assertEquals({"include_format_tags": set(["GQ"]),
+                           "include_info": set(["AF", "QUAL"]),
+                           "include_samples": set(["sampleB"])},
+                          actual)
+
     def test_create_potential_column_list_preservesSampleOrdering(self):
         metaheaders = ['##FORMAT=<ID=B,Number=1>', '##FORMAT=<ID=A,Number=1>']
         sample_names = ["sample1", "sample2", "sample10"]
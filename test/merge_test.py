@@ -7,10 +7,15 @@ from __future__ import print_function, absolute_import, division
 import argparse
 from argparse import Namespace
 from collections import OrderedDict
+import gzip
 import os
+import subprocess
+import sys
+import threading
 
 from testfixtures import TempDirectory
 
+import jacquard.jacquard
 import jacquard.utils.logger
 import jacquard.merge as merge
 import jacquard.utils.utils as utils
@@ -18,16 +23,9 @@ from jacquard.utils.vcf import VcfRecord
 import jacquard.utils.vcf as vcf
 import test.utils.mock_logger
 import test.utils.test_case as test_case
-from test.utils.vcf_test import MockVcfReader, MockFileReader, MockFileWriter, MockVcfRecord
+from test.utils.vcf_test import MockVcfReader, MockFileReader, MockFileWriter
 
 
-class MockBufferedReader(object):
-    def __init__(self, vcf_records):
-        self.vcf_records_iter = iter(vcf_records)
-
-    def next_if_equals(self, dummy):
-        return next(self.vcf_records_iter)
-
 class MergeVcfReaderTestCase(test_case.JacquardBaseTestCase):
     def test_extends_vcf_readers(self):
         file_contents = ["##metaheader1\n",
@@ -58,47 +56,7 @@ class MergeVcfReaderTestCase(test_case.JacquardBaseTestCase):
 
         self.assertIn('##FORMAT=<ID=JX1_DP,Number=1,Type=Integer,Description="Read Depth">', merge_vcf_reader.metaheaders)
         self.assertNotIn('##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">', merge_vcf_reader.metaheaders)
-
-    def test_modify_format_tags(self):
-        file_contents = ["##metaheader1\n",
-                         '##FORMAT=<ID=AF,Number=A,Type=Float,Description="Allele Frequency">\n',
-                         '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">\n',
-                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n"),
-                         self.entab("chr2|1|.|A|C|.|.|INFO|FORMAT|NORMAL|TUMOR")]
-        mock_file_reader = MockFileReader("my_dir/my_file.txt", file_contents)
-        merge_vcf_reader = merge.MergeVcfReader(mock_file_reader)
-
-        format_tags = {"DP": "JX1_DP"}
-        vcf_record = MockVcfRecord("chr1", "245", "A", "G", vcf_format="AF:DP", samples=["0.2:21", "0.34:56"])
-
-        self.assertEquals(OrderedDict({0: {"AF": "0.2", "DP": "21"}, 1: {"AF": "0.34", "DP": "56"}}),
-                          vcf_record.sample_tag_values)
-
-        merge_vcf_reader.modify_format_tag(vcf_record, format_tags)
-
-        self.assertEquals(OrderedDict({0: {"AF": "0.2", "JX1_DP": "21"}, 1: {"AF": "0.34", "JX1_DP": "56"}}),
-                          vcf_record.sample_tag_values)
-
-    def test_modify_format_tags_inconsistentFormatTags(self):
-        file_contents = ["##metaheader1\n",
-                         '##FORMAT=<ID=AF,Number=A,Type=Float,Description="Allele Frequency">\n',
-                         '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">\n',
-                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n"),
-                         self.entab("chr2|1|.|A|C|.|.|INFO|AF:DP|NORMAL|TUMOR"),
-                         self.entab("chr2|1|.|A|C|.|.|INFO|AF:DP:GT|NORMAL|TUMOR")]
-        mock_file_reader = MockFileReader("my_dir/my_file.txt", file_contents)
-        merge_vcf_reader = merge.MergeVcfReader(mock_file_reader)
-
-        format_tags = {"DP": "JX1_DP", "GT": "GT"}
-        vcf_record = MockVcfRecord("chr1", "245", "A", "G", vcf_format="AF:DP", samples=["0.2:21", "0.34:56"])
-
-        self.assertEquals(OrderedDict({0: {"AF": "0.2", "DP": "21"}, 1: {"AF": "0.34", "DP": "56"}}),
-                          vcf_record.sample_tag_values)
-
-        merge_vcf_reader.modify_format_tag(vcf_record, format_tags)
-
-        self.assertEquals(OrderedDict({0: {"AF": "0.2", "JX1_DP": "21"}, 1: {"AF": "0.34", "JX1_DP": "56"}}),
-                          vcf_record.sample_tag_values)
+        self.assertEquals(["AF", "JX1_DP"], sorted(merge_vcf_reader.format_metaheaders.keys()))
 
     def test_vcf_records_modifiesFormatTags(self):
         file_contents = ["##metaheader1\n",
@@ -408,19 +366,19 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
                 self.assertFalse("[{}] not found in {}".format(key, row_help))
 
     def test_validate_consistent_samples_missingCaller(self):
-        input_files = [MockFileReader("A.mutect.vcf",
-                                      ["##jacquard.translate.caller=MuTect"]),
-                       MockFileReader("A.strelka.vcf",
-                                      ["##jacquard.translate.caller=Strelka"]),
-                       MockFileReader("A.varscan.vcf",
-                                      ["##jacquard.translate.caller=VarScan"]),
-                       MockFileReader("B.strelka.vcf",
-                                      ["##jacquard.translate.caller=Strelka"]),
-                       MockFileReader("B.varscan.vcf",
-                                      ["##jacquard.translate.caller=VarScan"]),
-                       MockFileReader("C.varscan.vcf",
-                                      ["##jacquard.translate.caller=VarScan"])]
-        merge._validate_consistent_samples(input_files)
+        vcf_readers = [MockVcfReader("A.mutect.vcf",
+                                     metaheaders=["##jacquard.translate.caller=MuTect"]),
+                       MockVcfReader("A.strelka.vcf",
+                                     metaheaders=["##jacquard.translate.caller=Strelka"]),
+                       MockVcfReader("A.varscan.vcf",
+                                     metaheaders=["##jacquard.translate.caller=VarScan"]),
+                       MockVcfReader("B.strelka.vcf",
+                                     metaheaders=["##jacquard.translate.caller=Strelka"]),
+                       MockVcfReader("B.varscan.vcf",
+                                     metaheaders=["##jacquard.translate.caller=VarScan"]),
+                       MockVcfReader("C.varscan.vcf",
+                                     metaheaders=["##jacquard.translate.caller=VarScan"])]
+        merge._validate_consistent_samples(vcf_readers)
 
         actual_log_warnings = test.utils.mock_logger.messages["WARNING"]
         expected_log_warnings = ["Sample [B] is missing VCF(s): ['MuTect']",
@@ -429,13 +387,13 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         self.assertEquals(expected_log_warnings, actual_log_warnings)
 
     def test_validate_consistent_samples_allMissingCallers(self):
-        input_files = [MockFileReader("A.mutect.vcf",
-                                      ["##jacquard.translate.caller=MuTect"]),
-                       MockFileReader("B.strelka.vcf",
-                                      ["##jacquard.translate.caller=Strelka"]),
-                       MockFileReader("C.mutect.vcf",
-                                      ["##jacquard.translate.caller=MuTect"])]
-        merge._validate_consistent_samples(input_files)
+        vcf_readers = [MockVcfReader("A.mutect.vcf",
+                                     metaheaders=["##jacquard.translate.caller=MuTect"]),
+                       MockVcfReader("B.strelka.vcf",
+                                     metaheaders=["##jacquard.translate.caller=Strelka"]),
+                       MockVcfReader("C.mutect.vcf",
+                                     metaheaders=["##jacquard.translate.caller=MuTect"])]
+        merge._validate_consistent_samples(vcf_readers)
 
         actual_log_warnings = test.utils.mock_logger.messages["WARNING"]
         expected_log_warnings = ["Sample [A] is missing VCF(s): ['Strelka']",
@@ -699,77 +657,87 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         self.assertEquals({"DP": "JX2_DP"}, merge_vcf_reader2.format_tags)
 
 
-    def test_build_coordinates(self):
+    def test_merge_coordinates(self):
         fileArec1 = vcf.VcfRecord("chr1", "1", "A", "C")
         fileArec2 = vcf.VcfRecord("chr2", "12", "A", "G", "id=1")
         fileBrec1 = vcf.VcfRecord("chr2", "12", "A", "G", "id=2")
         fileBrec2 = vcf.VcfRecord("chr42", "16", "G", "C")
 
-        mock_readers = [MockVcfReader(records=[fileArec1, fileArec2]),
-                        MockVcfReader(records=[fileBrec1, fileBrec2])]
+        record_iterators = [iter([fileArec1, fileArec2]), iter([fileBrec1, fileBrec2])]
 
-        actual_coordinates = merge._build_coordinates(mock_readers)
+        actual_coordinates = [coordinate for coordinate, dummy in merge._merge_coordinates(record_iterators)]
 
         expected = [fileArec1, fileArec2, fileBrec2]
         self.assertEquals(expected, actual_coordinates)
 
-    def test_build_coordinates_multAltsEmpty(self):
+    def test_merge_coordinates_groupsRecordsInReaderOrder(self):
+        fileArec1 = vcf.VcfRecord("chr1", "1", "A", "C")
+        fileArec2 = vcf.VcfRecord("chr2", "12", "A", "G", "id=1")
+        fileBrec1 = vcf.VcfRecord("chr2", "12", "A", "G", "id=2")
+        fileCrec1 = vcf.VcfRecord("chr2", "12", "A", "G", "id=3")
+        fileCrec2 = vcf.VcfRecord("chr10", "2", "A", "G")
+
+        record_iterators = [iter([fileCrec1, fileCrec2]), iter([fileArec1, fileArec2]), iter([]), iter([fileBrec1])]
+
+        actual = [(coordinate.vcf_id, [record.vcf_id for record in records])
+                  for coordinate, records in merge._merge_coordinates(record_iterators)]
+
+        self.assertEquals([(".", ["."]), (".", ["id=3", "id=1", "id=2"]), (".", ["."])], actual)
+        self.assertEquals([], list(merge._merge_coordinates([iter([]), iter([])])))
+
+    def test_merge_coordinates_multAltsEmpty(self):
         fileArec1 = vcf.VcfRecord("chr1", "1", "A", "C")
         fileArec2 = vcf.VcfRecord("chr2", "12", "A", "G", "id=1")
         fileBrec1 = vcf.VcfRecord("chr2", "12", "A", "G", "id=2")
         fileBrec2 = vcf.VcfRecord("chr42", "16", "G", "C")
 
-        mock_readers = [MockVcfReader(records=[fileArec1, fileArec2]),
-                        MockVcfReader(records=[fileBrec1, fileBrec2])]
+        record_iterators = [iter([fileArec1, fileArec2]), iter([fileBrec1, fileBrec2])]
 
-        actual_coordinates = merge._build_coordinates(mock_readers)
+        actual_coordinates = [coordinate for coordinate, dummy in merge._merge_coordinates(record_iterators)]
 
         actual_multalts = [record for record in actual_coordinates if record.info == "JQ_MULT_ALT_LOCUS"]
 
         self.assertEquals([], actual_multalts)
 
-    def test_build_coordinates_flagsMultAltsFromDistinctFiles(self):
+    def test_merge_coordinates_flagsMultAltsFromDistinctFiles(self):
         fileA_rec1 = vcf.VcfRecord("chr1", "1", "A", "C")
         fileA_rec2 = vcf.VcfRecord("chr2", "12", "A", "G", "id=1")
         fileB_rec1 = vcf.VcfRecord("chr2", "12", "A", "T", "id=2")
         fileB_rec2 = vcf.VcfRecord("chr42", "16", "G", "C")
 
-        mock_readers = [MockVcfReader(records=[fileA_rec1, fileA_rec2]),
-                        MockVcfReader(records=[fileB_rec1, fileB_rec2])]
+        record_iterators = [iter([fileA_rec1, fileA_rec2]), iter([fileB_rec1, fileB_rec2])]
 
-        actual_coordinates = merge._build_coordinates(mock_readers)
+        actual_coordinates = [coordinate for coordinate, dummy in merge._merge_coordinates(record_iterators)]
 
         actual_multalts = [record for record in actual_coordinates if record.info == "JQ_MULT_ALT_LOCUS"]
 
         expected = [fileA_rec2, fileB_rec1]
         self.assertEquals(expected, actual_multalts)
 
-    def test_build_coordinates_flagsMultAltsWithinFile(self):
+    def test_merge_coordinates_flagsMultAltsWithinFile(self):
         fileA_rec1 = vcf.VcfRecord("chr1", "1", "A", "C")
         fileA_rec2 = vcf.VcfRecord("chr2", "12", "A", "G,T", "id=1")
         fileB_rec1 = vcf.VcfRecord("chr3", "12", "A", "T", "id=2")
         fileB_rec2 = vcf.VcfRecord("chr42", "16", "G", "C")
 
-        mock_readers = [MockVcfReader(records=[fileA_rec1, fileA_rec2]),
-                        MockVcfReader(records=[fileB_rec1, fileB_rec2])]
+        record_iterators = [iter([fileA_rec1, fileA_rec2]), iter([fileB_rec1, fileB_rec2])]
 
-        actual_coordinates = merge._build_coordinates(mock_readers)
+        actual_coordinates = [coordinate for coordinate, dummy in merge._merge_coordinates(record_iterators)]
 
         actual_multalts = [record for record in actual_coordinates if record.info == "JQ_MULT_ALT_LOCUS"]
 
         expected = [fileA_rec2]
         self.assertEquals(expected, actual_multalts)
 
-    def test_build_coordinates_flagsMultAltsWithDistinctRefs(self):
+    def test_merge_coordinates_flagsMultAltsWithDistinctRefs(self):
         fileA_rec1 = vcf.VcfRecord("chr1", "1", "A", "C")
         fileA_rec2 = vcf.VcfRecord("chr2", "2", "A", "G", "id=1")
         fileB_rec1 = vcf.VcfRecord("chr2", "2", "AT", "T", "id=2")
         fileB_rec2 = vcf.VcfRecord("chr42", "16", "G", "C")
 
-        mock_readers = [MockVcfReader(records=[fileA_rec1, fileA_rec2]),
-                        MockVcfReader(records=[fileB_rec1, fileB_rec2])]
+        record_iterators = [iter([fileA_rec1, fileA_rec2]), iter([fileB_rec1, fileB_rec2])]
 
-        actual_coordinates = merge._build_coordinates(mock_readers)
+        actual_coordinates = [coordinate for coordinate, dummy in merge._merge_coordinates(record_iterators)]
 
         actual_multalts = [record for record in actual_coordinates if record.info == "JQ_MULT_ALT_LOCUS"]
 
@@ -914,7 +882,6 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         self.assertEquals(OD([("bar", "."), ("baz", "D1"), ("foo", ".")]), actual_record.sample_tag_values["SD"])
 
     def test_merge_records(self):
-        coordinates = [VcfRecord("chrom", "pos", "ref", "alt")]
         filter_strategy = merge._Filter(Namespace(include_all=False,
                                                   include_cells="all",
                                                   include_rows="all"))
@@ -933,17 +900,17 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         format_tags_to_keep = ["foo"]
         file_writer = MockFileWriter()
 
-        merge._merge_records(vcf_readers,
-                             coordinates,
-                             filter_strategy,
-                             all_sample_names,
-                             format_tags_to_keep,
-                             file_writer)
+        coordinates = merge._merge_records(vcf_readers,
+                                           filter_strategy,
+                                           all_sample_names,
+                                           format_tags_to_keep,
+                                           file_writer)
 
         expected_record = "chrom\tpos\t.\tref\talt\t.\t.\t.\tfoo\tA\tB\tC\tD"
         self.assertEquals([expected_record], file_writer.lines())
+        self.assertEquals([VcfRecord("chrom", "pos", "ref", "alt")], coordinates)
 
-    def test_pull_matching_records(self):
+    def test_filter_records(self):
         filter_strategy = merge._Filter(Namespace(include_all=False,
                                                   include_cells="all",
                                                   include_rows="all"))
@@ -955,12 +922,7 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         record2 = VcfRecord("chrom", "pos", "ref", "alt",
                             sample_tag_values=OD({"SC": OD({"foo":"C"}),
                                                   "SD":OD({"foo":"D"})}))
-        buffered_readers = [MockBufferedReader([record1]),
-                            MockBufferedReader([record2])]
-
-        vcf_records = merge._pull_matching_records(filter_strategy,
-                                                   coordinate,
-                                                   buffered_readers)
+        vcf_records = merge._filter_records(filter_strategy, [record1, record2])
         self.assertEqual([record1, record2], vcf_records)
 
     def test_build_sample_list_simpleSampleList(self):
@@ -1041,13 +1003,13 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
             self.assertEquals("fileA.vcf", vcf_readers[0].file_name)
             self.assertEquals("fileB.vcf", vcf_readers[1].file_name)
 
-    def test_create_buffered_readers(self):
+    def test_open_vcf_records(self):
         vcf_readers = [MockVcfReader("PA.vcf"), MockVcfReader("PB.vcf")]
-        buffered_readers = merge._create_buffered_readers(vcf_readers)
+        record_iterators = merge._open_vcf_records(vcf_readers)
 
-        self.assertEquals(2, len(buffered_readers))
+        self.assertEquals(2, len(record_iterators))
 
-    def test_create_buffered_readers_modifiesRecords(self):
+    def test_open_vcf_records_modifiesRecords(self):
         file_contents1 = ["##metaheader1\n",
                          '##FORMAT=<ID=AF,Number=A,Type=Float,Description="Allele Frequency">\n',
                          '##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read Depth">\n',
@@ -1067,18 +1029,68 @@ class MergeTestCase(test_case.JacquardBaseTestCase):
         vcf_reader1.store_format_tags("AF", "AF")
         vcf_reader2.store_format_tags("DP", "JX2_DP")
 
-        buffered_readers = merge._create_buffered_readers([vcf_reader1, vcf_reader2])
+        record_iterators = merge._open_vcf_records([vcf_reader1, vcf_reader2])
         normal_dict = OrderedDict(sorted({"AF":"0.24", "JX1_DP":"56"}.items()))
         tumor_dict = OrderedDict(sorted({"AF":"0.01", "JX1_DP":"24"}.items()))
         expected = OrderedDict(sorted({"fileA|SampleNormal": normal_dict,
                                        "fileA|SampleTumor": tumor_dict}.items()))
-        self.assertEquals(expected, buffered_readers[0]._current_element.sample_tag_values)
+        self.assertEquals(expected, next(record_iterators[0]).sample_tag_values)
 
         normal_dict = OrderedDict(sorted({"JX2_DP":"32"}.items()))
         tumor_dict = OrderedDict(sorted({"JX2_DP":"78"}.items()))
         expected = OrderedDict(sorted({"fileB|SampleNormal": normal_dict,
                                        "fileB|SampleTumor": tumor_dict}.items()))
-        self.assertEquals(expected, buffered_readers[1]._current_element.sample_tag_values)
+        self.assertEquals(expected, next(record_iterators[1]).sample_tag_values)
+
+    def test_included_format_tags(self):
+        reader1 = MockVcfReader()
+        reader1.format_tags = {"JQ_DP": "JQ_DP", "JQ_HC_SOM": "JQ_HC_SOM"}
+        reader2 = MockVcfReader()
+        reader2.format_tags = {"GT": "GT", "JQ_MT_HC_SOM": "JQ_MT_HC_SOM"}
+
+        actual = merge._included_format_tags([reader1, reader2], ["JQ_DP", "JQ_AF"])
+
+        self.assertEquals(set(["JQ_DP", "JQ_AF", "JQ_HC_SOM", "JQ_MT_HC_SOM"]), actual)
+
+    def test_open_vcf_records_sharesHandlePool(self):
+        header = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(header + "1|10|.|A|C|.|.|.|DP|1\n1|30|.|A|C|.|.|.|DP|3\n").encode("utf8"))
+            input_dir.write("B.vcf", self.entab(header + "1|20|.|A|C|.|.|.|DP|2\n1|30|.|A|C|.|.|.|DP|4\n").encode("utf8"))
+            vcf_readers = [merge.MergeVcfReader(vcf.FileReader(os.path.join(input_dir.path, name)))
+                           for name in ("A.vcf", "B.vcf")]
+
+            record_iterators = merge._open_vcf_records(vcf_readers, handle_pool_size=1)
+            self.assertIsNot(None, vcf_readers[0]._file_reader.handle_pool)
+            positions = []
+            for dummy, records in merge._merge_coordinates(record_iterators):
+                for record in records:
+                    positions.append((record.pos, list(record.sample_tag_values.values())[0]["DP"]))
+            for vcf_reader in vcf_readers:
+                vcf_reader.close()
+
+        self.assertEquals([("10", "1"), ("20", "2"), ("30", "3"), ("30", "4")], positions)
+
+    def test_open_vcf_records_warnsPooledPlainGzip(self):
+        header = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(header + "1|10|.|A|C|.|.|.|DP|1\n").encode("utf8"))
+            gzip_file = gzip.open(os.path.join(input_dir.path, "B.vcf.gz"), "wb")
+            gzip_file.write(self.entab(header + "1|20|.|A|C|.|.|.|DP|2\n").encode("utf8"))
+            gzip_file.close()
+            vcf_readers = [merge.MergeVcfReader(vcf.FileReader(os.path.join(input_dir.path, name)))
+                           for name in ("A.vcf", "B.vcf.gz")]
+
+            merge._open_vcf_records(vcf_readers, handle_pool_size=1)
+            for vcf_reader in vcf_readers:
+                vcf_reader.close()
+
+        actual_log_warnings = test.utils.mock_logger.messages["WARNING"]
+        self.assertEquals(1, len(actual_log_warnings))
+        self.assertRegexpMatches(actual_log_warnings[0], r"Input \[B.vcf.gz\] is gzipped but not BGZF")
+
+    def test_handle_pool_size(self):
+        self.assertTrue(merge._handle_pool_size() > 0)
 
     def test_build_info_tags_sorts(self):
         records = [VcfRecord("1", "42", "A", "C", info="foo"),
@@ -1375,7 +1387,10 @@ chr2|10|.|A|C|.|.|INFO|JQ_Bar2|C_2|D_2
                              tags=None,
                              include_all=False,
                              include_cells="all",
-                             include_rows="all")
+                             include_rows="all",
+                             sort_memory=1,
+                             compress_sort_runs=False,
+                             processes=1)
 
             merge.execute(args, ["##execution_header1", "##execution_header2"])
 
@@ -1404,6 +1419,33 @@ chr2|10|.|A|C|.|.|INFO|JQ_Bar2|C_2|D_2
         self.assertEquals("chr2\t1\t.\tA\tC\t.\t.\t.\tJQ_Bar1:JQ_Foo1\tA_3_2:A_3_1\tB_3_2:B_3_1\n", next(actual_lines_iter))
         self.assertEquals("chr2\t10\t.\tA\tC\t.\t.\t.\tJQ_Bar2\tC_2\tD_2\n", next(actual_lines_iter))
 
+    def test_execute_removesTmpOutputOnError(self):
+        vcf_content = ("##source=strelka\n"
+                       "##FORMAT=<ID=JQ_Foo,Number=1,Type=Float,Description=\"foo\">\n"
+                       "#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleA\n"
+                       "chr1|1|.|A|C|.|.|INFO|JQ_Foo|1\n").replace('|', "\t")
+        def _raise(*dummy_args):
+            raise ValueError("headers failed")
+        original_compile_metaheaders = merge._compile_metaheaders
+        with TempDirectory() as input_file, TempDirectory() as output_file:
+            input_file.write("P1.fileA.vcf", vcf_content.encode("utf8"))
+            args = Namespace(input=input_file.path,
+                             output=os.path.join(output_file.path, "fileB.vcf"),
+                             tags=None,
+                             include_all=False,
+                             include_cells="all",
+                             include_rows="all",
+                             sort_memory=1,
+                             compress_sort_runs=False,
+                             processes=1)
+            try:
+                merge._compile_metaheaders = _raise
+                self.assertRaises(ValueError, merge.execute, args, [])
+            finally:
+                merge._compile_metaheaders = original_compile_metaheaders
+
+            self.assertEquals(["fileB.vcf"], os.listdir(output_file.path))
+
     def test_execute_includeFormatIds(self):
         vcf_content1 = ('''##source=strelka
 ##contig=<ID=chr1,Number=1>
@@ -1423,7 +1465,10 @@ chr2|1|.|A|C|.|.|INFO|JQ_Foo:JQ_Bar1|A_3_1:A_3_2|B_3_1:B_3_2
                              tags="JQ_.*",
                              include_all=False,
                              include_cells="all",
-                             include_rows="all")
+                             include_rows="all",
+                             sort_memory=1,
+                             compress_sort_runs=False,
+                             processes=1)
 
             merge.execute(args, ["##extra_header1", "##extra_header2"])
 
@@ -1445,6 +1490,106 @@ chr2|1|.|A|C|.|.|INFO|JQ_Foo:JQ_Bar1|A_3_1:A_3_2|B_3_1:B_3_2
 
         self.assertEquals(expected_output_headers, actual_output_lines[0:len(expected_output_headers)])
 
+    def test_sorted_lines_inMemory(self):
+        lines = [self.entab(line) for line in ["chr2|1|.|A|C", "chr10|5|.|A|C", "chr1|20|.|A|G", "chr1|3|.|A|C", "chr1|20|.|A|C|id2", "chr1|20|.|A|C|id1"]]
+        with TempDirectory() as temp_dir:
+            actual = list(merge._sorted_lines(iter(lines), os.path.join(temp_dir.path, "A.vcf"), 1 << 20))
+            self.assertEquals([], os.listdir(temp_dir.path))
+
+        self.assertEquals([lines[i] for i in [3, 4, 5, 2, 0, 1]], actual)
+
+    def test_sorted_lines_spillsRuns(self):
+        lines = [self.entab("chr{}|{}|.|A|C|.|.|.|DP|{}".format(chrom, pos, i))
+                 for i, (chrom, pos) in enumerate([(2, 1), (10, 5), (1, 20), (1, 3), (1, 20), (2, 1), (1, 7)])]
+        expected = [lines[i] for i in [3, 6, 2, 4, 0, 5, 1]]
+        for compress in (False, True):
+            with TempDirectory() as temp_dir:
+                sorted_lines = merge._sorted_lines(iter(lines), os.path.join(temp_dir.path, "A.vcf"), 1, compress)
+                actual = [next(sorted_lines)]
+                self.assertEquals(len(lines), len(os.listdir(temp_dir.path)))
+                actual.extend(sorted_lines)
+                self.assertEquals([], os.listdir(temp_dir.path))
+
+            self.assertEquals(expected, actual)
+
+    def test_sorted_lines_mergesRunsInPasses(self):
+        lines = [self.entab("1|{}|.|A|C".format(pos)) for pos in range(10, 0, -1)]
+        original_max_sort_runs = merge._MAX_SORT_RUNS
+        try:
+            merge._MAX_SORT_RUNS = 3
+            with TempDirectory() as temp_dir:
+                actual = list(merge._sorted_lines(iter(lines), os.path.join(temp_dir.path, "A.vcf"), 1))
+                self.assertEquals([], os.listdir(temp_dir.path))
+        finally:
+            merge._MAX_SORT_RUNS = original_max_sort_runs
+
+        self.assertEquals(list(reversed(lines)), actual)
+
+    def test_sorted_lines_mergesRunsInPassesStably(self):
+        lines = [self.entab("1|{}|.|A|C|.|.|.|DP|{}".format(pos, i))
+                 for i, pos in enumerate([2, 1, 2, 1, 2, 1, 2, 1, 2, 1])]
+        original_max_sort_runs = merge._MAX_SORT_RUNS
+        try:
+            merge._MAX_SORT_RUNS = 3
+            with TempDirectory() as temp_dir:
+                actual = list(merge._sorted_lines(iter(lines), os.path.join(temp_dir.path, "A.vcf"), 1))
+        finally:
+            merge._MAX_SORT_RUNS = original_max_sort_runs
+
+        self.assertEquals(sorted(lines, key=merge._sort_line_key), actual)
+
+    def test_sort_vcf_spillsToDisk(self):
+        header = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+        records = ["chr2|1|.|A|C|.|.|.|DP|1\n", "chr1|5|.|A|C|.|.|.|DP|2\n", "chr1|1|.|A|C|.|.|.|DP|3\r\n"]
+        with TempDirectory() as input_dir, TempDirectory() as sorted_dir:
+            input_dir.write("A.vcf", self.entab(header + "".join(records)).encode("utf8"))
+            reader = merge.MergeVcfReader(vcf.FileReader(os.path.join(input_dir.path, "A.vcf")))
+
+            sorted_reader = merge._sort_vcf(reader, sorted_dir.path, sort_memory=0, compress=True)
+
+            self.assertEquals(["A.vcf"], os.listdir(sorted_dir.path))
+            self.assertEquals(self.entab(header + records[2] + records[1] + records[0]).encode("utf8"),
+                              sorted_dir.read("A.vcf"))
+            self.assertEquals("MergeVcfReader", type(sorted_reader).__name__)
+
+    def test_validate_args_sortMemory(self):
+        merge.validate_args(Namespace(sort_memory=1, processes=1))
+        self.assertRaisesRegexp(utils.UsageError,
+                                r"sort memory \[0\] must be at least 1 MB",
+                                merge.validate_args,
+                                Namespace(sort_memory=0, processes=1))
+
+    def test_validate_args_processes(self):
+        self.assertRaisesRegexp(utils.UsageError,
+                                r"number of processes \[0\] must be at least 1",
+                                merge.validate_args,
+                                Namespace(sort_memory=1, processes=0))
+
+    def test_sort_readers_processPool(self):
+        header = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+        contents = {"A.vcf": "1|20|.|A|C|.|.|.|DP|1\n1|10|.|A|C|.|.|.|DP|2\n",
+                    "B.vcf": "1|10|.|A|C|.|.|.|DP|3\n1|20|.|A|C|.|.|.|DP|4\n",
+                    "C.vcf": "2|5|.|A|C|.|.|.|DP|5\n1|5|.|A|C|.|.|.|DP|6\n"}
+        with TempDirectory() as input_dir, TempDirectory() as output_dir:
+            for file_name, records in contents.items():
+                input_dir.write(file_name, self.entab(header + records).encode("utf8"))
+            input_readers = [merge.MergeVcfReader(vcf.FileReader(os.path.join(input_dir.path, file_name)))
+                             for file_name in sorted(contents)]
+
+            actual_readers = merge._sort_readers(list(input_readers),
+                                                 os.path.join(output_dir.path, "merged.vcf"),
+                                                 processes=2)
+
+            self.assertEquals(["A.vcf", "B.vcf", "C.vcf"], [reader.file_name for reader in actual_readers])
+            self.assertEquals(input_readers[1], actual_readers[1])
+            self.assertEquals(os.path.join(output_dir.path, "tmp", "A.vcf"), actual_readers[0].input_filepath)
+            self.assertEquals(os.path.join(output_dir.path, "tmp", "C.vcf"), actual_readers[2].input_filepath)
+            self.assertEquals(self.entab(header + "1|5|.|A|C|.|.|.|DP|6\n2|5|.|A|C|.|.|.|DP|5\n").encode("utf8"),
+                              output_dir.read(os.path.join("tmp", "C.vcf")))
+        actual_log_infos = test.utils.mock_logger.messages["INFO"]
+        self.assertEquals(5, len(actual_log_infos))
+        self.assertRegexpMatches(actual_log_infos[3], r"Sorting vcf \[A.vcf\] \(1/2\)")
+
     def test_sort_readers_orderedVcfsPassThrough(self):
         record1 = vcf.VcfRecord("chr1", "42", "A", "C")
         record2 = vcf.VcfRecord("chr2", "42", "A", "C")
@@ -1557,17 +1702,69 @@ class MergeFunctionalTestCase(test_case.JacquardBaseTestCase):
 
             self.assertCommand(command, expected_file)
 
-class BufferedReaderTestCase(test_case.JacquardBaseTestCase):
-    def test_get_sample_info_advancesCurrentElementWhenMatched(self):
-        reader = [1, 5, 10, 15]
-        buffered_reader = merge._BufferedReader(iter(reader))
-
-        self.assertEquals(None, buffered_reader.next_if_equals(0))
-        self.assertEquals(None, buffered_reader.next_if_equals(5))
-        self.assertEquals(1, buffered_reader.next_if_equals(1))
-        self.assertEquals(None, buffered_reader.next_if_equals(1))
-        self.assertEquals(5, buffered_reader.next_if_equals(5))
-        self.assertEquals(10, buffered_reader.next_if_equals(10))
-        self.assertEquals(15, buffered_reader.next_if_equals(15))
-        self.assertEquals(None, buffered_reader.next_if_equals(15))
-        self.assertEquals(None, buffered_reader.next_if_equals(42))
+    def test_merge_unsortedGzip(self):
+        with TempDirectory() as output_dir:
+            test_dir = os.path.dirname(os.path.realpath(__file__))
+
+            module_testdir = os.path.join(test_dir,
+                                          "functional_tests",
+                                          "02_merge_unsorted")
+            input_dir = os.path.join(module_testdir, "input")
+            gzip_dir = os.path.join(output_dir.path, "input")
+            os.mkdir(gzip_dir)
+            for file_name in os.listdir(input_dir):
+                with open(os.path.join(input_dir, file_name), "rb") as vcf_file, \
+                        gzip.open(os.path.join(gzip_dir, file_name + ".gz"), "wb") as gzip_file:
+                    gzip_file.write(vcf_file.read())
+            output_file = os.path.join(output_dir.path, "merged.vcf")
+
+            expected_file = os.path.join(module_testdir,
+                                        "benchmark",
+                                        "merged.vcf")
+
+            jacquard.jacquard._dispatch(jacquard.jacquard._SUBCOMMANDS,
+                                        ["merge", gzip_dir, output_file, "--force"])
+
+            with open(expected_file) as expected_vcf:
+                expected = [line for line in expected_vcf if not line.startswith("##")]
+            with open(output_file) as actual_vcf:
+                actual_lines = actual_vcf.readlines()
+            actual = [line for line in actual_lines if not line.startswith("##")]
+            actual_sources = [line.rstrip(">\n").split("Source=")[1].split("|")
+                              for line in actual_lines
+                              if line.startswith("##jacquard.merge.sample")]
+            self.assertEquals(expected, actual)
+            self.assertEquals(2, len(actual_sources))
+            for sources in actual_sources:
+                self.assertEquals(3, len(sources))
+                for source in sources:
+                    self.assertTrue(source.endswith(".vcf.gz"), source)
+
+    def test_merge_processesWithInterruptHandler(self):
+        with TempDirectory() as output_dir:
+            test_dir = os.path.dirname(os.path.realpath(__file__))
+            input_dir = os.path.join(test_dir,
+                                     "functional_tests",
+                                     "02_merge_unsorted",
+                                     "input")
+            output_file = os.path.join(output_dir.path, "merged.vcf")
+            command = [sys.executable, "-m", "jacquard",
+                       "merge", input_dir, output_file,
+                       "--force", "--processes", "2"]
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(test_dir))
+
+            process = subprocess.Popen(command,
+                                       cwd=output_dir.path,
+                                       env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            timer = threading.Timer(60, process.kill)
+            timer.start()
+            try:
+                dummy, stderr = process.communicate()
+            finally:
+                timer.cancel()
+
+            self.assertEquals(0, process.returncode)
+            self.assertNotIn("interrupted", stderr.decode("utf8"))
+            self.assertTrue(os.path.isfile(output_file))
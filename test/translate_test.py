@@ -250,6 +250,18 @@ class TranslateTestCase(test_case.JacquardBaseTestCase):
 
             self.assertEquals(expected_desired_output_files, desired_output_files)
 
+    def test_report_prediction_compressedVcfs(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf.gz", b"")
+            input_dir.write("B.vcf", b"")
+            args = Namespace(input=input_dir.path)
+
+            desired_output_files = translate.report_prediction(args)
+            expected_desired_output_files = set(["A.translatedTags.vcf",
+                                                 "B.translatedTags.vcf"])
+
+            self.assertEquals(expected_desired_output_files, desired_output_files)
+
     def test_translate_files(self):
         record = vcf.VcfRecord("chr1", "42", "A", "C",
                                sample_tag_values=OrderedDict(sorted({"SA":OrderedDict(), "SB":OrderedDict()}.items())))
@@ -0,0 +1,116 @@
+# pylint: disable=line-too-long,too-many-public-methods,invalid-name
+from __future__ import print_function, absolute_import, division
+
+from collections import OrderedDict
+import os
+
+from testfixtures import TempDirectory
+
+import jacquard.utils.binary_vcf as binary_vcf
+import jacquard.utils.utils as utils
+import jacquard.utils.vcf as vcf
+import test.utils.test_case as test_case
+
+
+class BinaryVcfTestCase(test_case.JacquardBaseTestCase):
+    _HEADER = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA|SB\n"
+    _RECORDS = ["chr1|10|.|A|C|.|PASS|DP=4|GT:DP|0/1:4|0/0:5\n",
+                "chr1|20|rs1|A|C|20|.|.|GT:DP|0/1:6|0/0\n",
+                "chr2|30|.|AT|A|.|.|SOMATIC|AF|0.1|.\n",
+                "chr3|40|.|A|C|.|.|.|.|.|.\n"]
+
+    def _write(self, output_dir, records, file_name="A.jqb"):
+        file_path = os.path.join(output_dir.path, file_name)
+        writer = binary_vcf.BinaryVcfWriter(file_path)
+        writer.open()
+        writer.write(self.entab(self._HEADER))
+        writer.write_records(records)
+        writer.close()
+        return file_path
+
+    def _parse(self, lines, sample_names=("SA", "SB")):
+        return [vcf.VcfRecord.parse_record(self.entab(line), list(sample_names)) for line in lines]
+
+    def test_roundTripMatchesText(self):
+        records = self._parse(self._RECORDS)
+        with TempDirectory() as output_dir:
+            file_path = self._write(output_dir, records)
+            reader = binary_vcf.BinaryVcfReader(vcf.FileReader(file_path))
+            reader.open()
+            actual = list(reader.vcf_records())
+            reader.close()
+
+        self.assertEquals(["##fileformat=VCFv4.1"], reader.metaheaders)
+        self.assertEquals(["SA", "SB"], reader.sample_names)
+        self.assertEquals([record.text() for record in records],
+                          [record.text() for record in actual])
+        self.assertEquals(OrderedDict([("GT", "0/0"), ("DP", ".")]),
+                          actual[1].sample_tag_values["SB"])
+        self.assertEquals({}, actual[3].sample_tag_values["SA"])
+
+    def test_roundTripModifiedRecords(self):
+        records = self._parse(self._RECORDS[0:1])
+        records[0].add_sample_tag_value("JQ_AF", {"SA": 0.5, "SB": 0})
+        records[0].add_info_field("JQ_SOM")
+        records.append(vcf.VcfRecord("chr4", "1", "A", "C",
+                                     sample_tag_values=OrderedDict([("SA", {"X": "1"}), ("SB", {})])))
+        with TempDirectory() as output_dir:
+            file_path = self._write(output_dir, records)
+            reader = binary_vcf.BinaryVcfReader(vcf.FileReader(file_path))
+            reader.open()
+            actual = list(reader.vcf_records(qualified=True))
+            reader.close()
+
+        self.assertEquals([self.entab("chr1|10|.|A|C|.|PASS|DP=4;JQ_SOM|GT:DP:JQ_AF|0/1:4:0.5|0/0:5:0\n"),
+                           self.entab("chr4|1|.|A|C|.|.|.|X|1|.\n")],
+                          [record.text() for record in actual])
+        self.assertEquals(["A|SA", "A|SB"], list(actual[0].sample_tag_values.keys()))
+
+    def test_vcf_records_projectsLikeVcfReader(self):
+        lines = [self._RECORDS[0], self._RECORDS[2], self._RECORDS[3]]
+        records = self._parse(lines)
+        kwargs = {"qualified": True,
+                  "include_format_tags": ["DP", "AF"],
+                  "include_info": ["SOMATIC"],
+                  "include_samples": ["A|SB"]}
+        with TempDirectory() as output_dir:
+            output_dir.write("A.vcf", self.entab(self._HEADER + "".join(lines)).encode("utf8"))
+            text_reader = vcf.VcfReader(vcf.FileReader(os.path.join(output_dir.path, "A.vcf")))
+            text_reader.open()
+            expected = [record.text() for record in text_reader.vcf_records(**kwargs)]
+            text_reader.close()
+            binary_reader = binary_vcf.BinaryVcfReader(vcf.FileReader(self._write(output_dir, records)))
+            binary_reader.open()
+            actual = [record.text() for record in binary_reader.vcf_records(**kwargs)]
+            binary_reader.close()
+
+        self.assertEquals(self.entab("chr1|10|.|A|C|.|PASS|.|DP|5\n"), actual[0])
+        self.assertEquals(expected, actual)
+
+    def test_write_formatDictionaryWrittenOnce(self):
+        records = self._parse([self._RECORDS[0]] * 3)
+        with TempDirectory() as output_dir:
+            file_path = self._write(output_dir, records)
+            content = output_dir.read(os.path.basename(file_path))
+
+        self.assertEquals(1, content.count(b"GT:DP"))
+        self.assertEquals(3, content.count(b"0/1\x1f4\x1f0/0\x1f5"))
+
+    def test_write_headersAfterRecordsRaises(self):
+        with TempDirectory() as output_dir:
+            writer = binary_vcf.BinaryVcfWriter(os.path.join(output_dir.path, "A.jqb"))
+            writer.open()
+            writer.write(self.entab(self._HEADER))
+            writer.write_records([])
+            self.assertRaises(utils.JQException, writer.write, "##foo\n")
+            writer.close()
+
+    def test_init_textVcfRaises(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._HEADER).encode("utf8"))
+            file_reader = vcf.FileReader(os.path.join(input_dir.path, "A.vcf"))
+
+            self.assertRaisesRegexp(utils.JQException,
+                                    r"\[A.vcf\] is not a Jacquard binary vcf",
+                                    binary_vcf.BinaryVcfReader,
+                                    file_reader)
@@ -244,6 +244,40 @@ class ZScoreTagTest(test_case.JacquardBaseTestCase):
         self.assertEqual(["X"], sorted(rec1.sample_tag_values["SA"].keys()))
         self.assertEqual(["X"], sorted(rec1.sample_tag_values["SB"].keys()))
 
+    def test_add_batch_tag_values(self):
+        rec1 = vcf.VcfRecord("1", "42", "A", "C",
+                             sample_tag_values={"SA":{"X":"4"}, "SB":{"X":"."}})
+        rec2 = vcf.VcfRecord("1", "42", "A", "C",
+                             sample_tag_values={"SA":{"X":"."}, "SB":{"X":"8"}})
+        rec3 = vcf.VcfRecord("1", "42", "A", "C",
+                             sample_tag_values={"SA":{"Y":"1"}, "SB":{"Y":"1"}})
+        reader = MockVcfReader(records=[rec1, rec2, rec3])
+        tag = zscore_caller._ZScoreTag("ZScoreX", "ZScore for X", "X", reader)
+
+        tag.add_batch_tag_values(vcf.RecordBatch([rec1, rec2, rec3], ["SA", "SB"]))
+
+        self.assertEquals("-1.0", rec1.sample_tag_values["SA"]["ZScoreX"])
+        self.assertEquals(".", rec1.sample_tag_values["SB"]["ZScoreX"])
+        self.assertEquals("1.0", rec2.sample_tag_values["SB"]["ZScoreX"])
+        self.assertEqual(["Y"], list(rec3.sample_tag_values["SA"].keys()))
+
+    def test_init_setsPopulationStatisticsWithoutNumpy(self):
+        rec1 = vcf.VcfRecord("1", "42", "A", "C",
+                             sample_tag_values={"SA":{"X":"4"}, "SB":{"X":"7,1"}})
+        rec2 = vcf.VcfRecord("1", "42", "A", "C",
+                             sample_tag_values={"SA":{"X":"13"}, "SB":{"X":"."}})
+        reader = MockVcfReader(records=[rec1, rec2])
+        numpy = vcf.numpy
+        try:
+            vcf.numpy = None
+            tag = zscore_caller._ZScoreTag("ZScoreX", "ZScore for X", "X", reader)
+        finally:
+            vcf.numpy = numpy
+
+        values = [4, 7, 13]
+        self.assertAlmostEquals(mean(values), tag._mean, _ZScoreTag._MAX_PRECISION)
+        self.assertAlmostEquals(stdev(values), tag._stdev, _ZScoreTag._MAX_PRECISION)
+
 class AlleleFreqZScoreTagTest(test_case.JacquardBaseTestCase):
     def test_init_metaheaders(self):
         rec1 = vcf.VcfRecord("1", "42", "A", "C",
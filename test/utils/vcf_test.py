@@ -4,14 +4,18 @@
 from __future__ import print_function, absolute_import, division
 
 from collections import OrderedDict
+import gzip
 import os
 import re
+import struct
 import sys
 import unittest
+import zlib
 
 from testfixtures import TempDirectory
 
 import jacquard.utils.utils as utils
+import jacquard.utils.vcf as vcf
 from jacquard.utils.vcf import VcfRecord, VcfReader, FileWriter, FileReader
 import test.utils.test_case as test_case
 
@@ -22,6 +26,40 @@ except ImportError:
     from io import StringIO
 
 
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated_data = compressor.compress(data) + compressor.flush()
+    header = struct.pack("<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6,
+                         66, 67, 2, len(deflated_data) + 25)
+    trailer = struct.pack("<2I", zlib.crc32(data) & 0xffffffff, len(data))
+    return header + deflated_data + trailer
+
+def bgzf(*blocks):
+    return b"".join([bgzf_block(block) for block in blocks]) + bgzf_block(b"")
+
+def bgzf_with_tabix(header, lines):
+    """Returns BGZF (one block per line) and a minimal matching tabix index."""
+    data = bgzf_block(header)
+    references = OrderedDict()
+    for line in lines:
+        chrom = line.split(b"\t")[0]
+        virtual_offset = len(data) << 16
+        data += bgzf_block(line)
+        chunks = references.setdefault(chrom, [])
+        chunks.append((virtual_offset, len(data) << 16))
+    data += bgzf_block(b"")
+
+    names = b"".join([name + b"\x00" for name in references])
+    index = b"TBI\x01" + struct.pack("<8i", len(references), 2, 1, 2, 0,
+                                     ord("#"), 0, len(names)) + names
+    for chunks in references.values():
+        index += struct.pack("<iIi", 1, 4681, len(chunks))
+        for chunk in chunks:
+            index += struct.pack("<2Q", *chunk)
+        index += struct.pack("<iQ", 1, chunks[0][0])
+    return data, index
+
+
 class MockFileWriter(object):
     def __init__(self):
         self._content = []
@@ -36,6 +74,10 @@ class MockFileWriter(object):
             return
         self._content.extend(content.splitlines())
 
+    def write_records(self, vcf_records, trusted=False):
+        for vcf_record in vcf_records:
+            self.write(vcf_record.text(trusted))
+
     def lines(self):
         return self._content
 
@@ -63,6 +105,9 @@ class MockFileReader(object):
         for line in self.lines_to_iterate:
             yield line
 
+    def read_line_blocks(self):
+        yield [line.rstrip("\n") for line in self.lines_to_iterate]
+
     def close(self):
         self.close_was_called = True
         self.lines_to_iterate = None
@@ -135,7 +180,7 @@ class MockVcfReader(object):
     def open(self):
         self.opened = True
     #pylint:disable=unused-argument
-    def vcf_records(self, dummy=None, qualified=False):
+    def vcf_records(self, dummy=None, qualified=False, **dummy_include):
         for record in self.records:
             yield record
 
@@ -143,6 +188,18 @@ class MockVcfReader(object):
         for record in self.records:
             yield record
 
+    def record_lines(self):
+        for record in self.records:
+            yield record.text().rstrip("\n")
+
+    def sample_matrices(self, qualified=False):
+        for record in self.records:
+            yield vcf.SampleMatrix.from_record(record)
+
+    def record_batches(self, size=None, qualified=False):
+        if self.records:
+            yield vcf.RecordBatch(self.records, self.sample_names)
+
     def _get_tag_metaheaders(self, regex_exp):
         tag_dict = {}
         for metaheader in self.metaheaders:
@@ -291,7 +348,7 @@ class MockVcfRecord(object):
             value = str(new_sample_values[sample])
             self.sample_tag_values[sample][tag_name] = value
 
-    def text(self):
+    def text(self, dummy_trusted=False):
         stringifier = [self.chrom, self.pos, self.id, self.ref, self.alt,
                        self.qual, self.filter, self.info,
                        ":".join(self.format_set)]
@@ -351,6 +408,21 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
         record = VcfRecord.parse_record(input_line, sample_names)
         self.assertEquals("SB_bar", record.sample_tag_values["SampleA"]["BAR"])
 
+    def test_parse_record_defersSampleParsing(self):
+        sample_names = ["SampleA", "SampleB"]
+        input_line = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|F1:F2|SA.1:SA.2|SB.1:SB.2\n")
+        record = VcfRecord.parse_record(input_line, sample_names)
+        self.assertEquals(("SampleA", "SampleB"), tuple(record._raw_samples[0]))
+        self.assertEquals({"F1":"SA.1", "F2":"SA.2"}, record.sample_tag_values["SampleA"])
+        self.assertEquals(None, record._raw_samples)
+
+    def test_parse_record_assignedSampleTagValuesReplaceDeferredSamples(self):
+        sample_names = ["SampleA"]
+        input_line = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|F1|SA.1\n")
+        record = VcfRecord.parse_record(input_line, sample_names)
+        record.sample_tag_values = OrderedDict([("SampleA", OrderedDict([("F2", "SA.2")]))])
+        self.assertEquals(self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|F2|SA.2\n"), record.text())
+
     def test_format_tags(self):
         sample_names = ["SampleA", "SampleB"]
         input_line = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|F1:F2:F3|SA.1:SA.2:SA.3|SB.1:SB.2:SB.3\n")
@@ -400,6 +472,50 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
         self.assertEquals({"foo":"SA_foo", "bar":"SA_bar"}, sample_tag_values["sampleA"])
         self.assertEquals({"foo":"SB_foo", "bar":"SB_bar"}, sample_tag_values["sampleB"])
 
+    def test_parse_record_sharesFormatLayout(self):
+        layouts = vcf._FormatLayoutCache()
+        record1 = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|DP:AF|1:0.1\n"), ["SA"], layouts)
+        record2 = VcfRecord.parse_record(self.entab("chr1|2|.|A|C|.|.|.|DP:AF|2:0.2\n"), ["SA"], layouts)
+
+        self.assertIs(record1._raw_samples[1], record2._raw_samples[1])
+        self.assertEquals(["DP", "AF"], record1._format_tag_fields())
+        self.assertEquals(set(["DP", "AF"]), record2.format_tags)
+        self.assertIsNot(None, record2._raw_samples)
+        self.assertEquals({"DP": "2", "AF": "0.2"}, record2.sample_tag_values["SA"])
+
+    def test_parse_record_formatLayoutRenamesTags(self):
+        layouts = vcf._FormatLayoutCache({"DP": "JX1_DP", "AF": "AF", "GT": "JX1_GT"})
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|DP:AF:GQ|1:0.1:5|2\n"), ["SA", "SB"], layouts)
+
+        self.assertEquals(["AF", "GQ", "JX1_DP"], record._format_tag_fields())
+        self.assertEquals(["AF", "GQ", "JX1_DP"], list(record.sample_tag_values["SA"].keys()))
+        self.assertEquals(["0.1", "5", "1"], list(record.sample_tag_values["SA"].values()))
+        self.assertEquals(OrderedDict([("JX1_DP", "2")]), record.sample_tag_values["SB"])
+
+    def test_parse_record_internsThroughStringTable(self):
+        layouts = vcf._FormatLayoutCache(strings=vcf._StringTable())
+        line1 = "chr1|1|.|A|C|.|PASS|.|GT:DP|0/1:" + "1" * 20 + "\n"
+        line2 = "chr1|2|.|A|C|.|PASS|.|GT:DP|0/1:" + "1" * 20 + "\n"
+        record1 = VcfRecord.parse_record(self.entab(line1), ["SA"], layouts)
+        record2 = VcfRecord.parse_record(self.entab(line2), ["SA"], layouts)
+
+        self.assertIs(record1.filter, record2.filter)
+        self.assertIs(record1.ref, record2.ref)
+        self.assertIs(record1.sample_tag_values["SA"]["GT"], record2.sample_tag_values["SA"]["GT"])
+        self.assertIsNot(record1.sample_tag_values["SA"]["DP"], record2.sample_tag_values["SA"]["DP"])
+        self.assertEquals(self.entab(line2), record2.text())
+
+    def test_string_table_clearsWhenFull(self):
+        strings = vcf._StringTable()
+        strings._MAX_SIZE = 2
+        first = strings.get("".join(["0", "/1"]))
+
+        self.assertIs(first, strings.get("".join(["0/", "1"])))
+        self.assertEquals(["A", "B"], strings.get_all(["A", "B"]))
+        self.assertEquals(1, len(strings))
+        self.assertEquals(["1" * 9], strings.get_all(["1" * 9]))
+        self.assertEquals(1, len(strings))
+
     def test_sample_tag_values_emptyDictWhenExplicitNullSampleData(self):
         input_line = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|.|.|.\n")
         record = VcfRecord.parse_record(input_line, sample_names=["sampleA", "sampleB"])
@@ -469,6 +585,21 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
         record = VcfRecord.parse_record(input_line, sample_names)
         self.assertRaises(KeyError, record.add_sample_tag_value, "F1", {"SampleA":0.6, "SampleB":0.6})
 
+    def test_init_compactRecord(self):
+        vcf_record = VcfRecord("chr1", "42", "A", "C", info="k1=v1;baz")
+        self.assertFalse(hasattr(vcf_record, "__dict__"))
+        self.assertEquals(None, vcf_record._info_dict)
+        self.assertEquals(None, vcf_record._samples)
+        self.assertEquals(((1, "chr1"), 42, "A", "C"), vcf_record._key)
+        self.assertEquals({"k1": "v1", "baz": "baz"}, vcf_record.info_dict)
+        self.assertEquals({}, vcf_record.sample_tag_values)
+
+    def test_init_internsChrom(self):
+        chrom = "".join(["chr", "1"])
+        vcf_record1 = VcfRecord(chrom, "42", "A", "C")
+        vcf_record2 = VcfRecord("".join(["ch", "r1"]), "43", "A", "C")
+        self.assertTrue(vcf_record1.chrom is vcf_record2.chrom)
+
     def test_get_info_dict_empty(self):
         vcf_record = VcfRecord("chr1", "42", "A", "C", info="")
         self.assertEquals({}, vcf_record.info_dict)
@@ -491,6 +622,23 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
         vcf_record.add_info_field("foo")
         self.assertEquals({"k1": "v1", "k2": "v2", "baz": "baz", "foo": "foo"}, vcf_record.info_dict)
 
+    def test_add_info_field_defersJoin(self):
+        vcf_record = VcfRecord("chr1", "42", "A", "C", info="k1=v1")
+        vcf_record.add_info_field("foo")
+        vcf_record.add_info_field("bar=baz")
+
+        self.assertIs(VcfRecord._STALE_INFO, vcf_record._info)
+        self.assertEquals("k1=v1;foo;bar=baz", vcf_record.info)
+        self.assertEquals(self.entab("chr1|42|.|A|C|.|.|k1=v1;foo;bar=baz|.\n"), vcf_record.text())
+
+    def test_info_assignmentResetsInfoDict(self):
+        vcf_record = VcfRecord("chr1", "42", "A", "C", info="k1=v1")
+        self.assertEquals({"k1": "v1"}, vcf_record.info_dict)
+
+        vcf_record.info = "k2=v2"
+
+        self.assertEquals({"k2": "v2"}, vcf_record.info_dict)
+
     def test_join_info_fields_nullValues(self):
         sample_names = ["SampleA"]
         input_line = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|.|F|S\n")
@@ -532,6 +680,37 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
         expected = self.entab("CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|a:b|1:2|10:.\n")
         self.assertEquals(expected, record.text())
 
+    def test_text_unmodifiedRecordReusesLine(self):
+        input_line = self.entab("chr1|1|.|A|C|.|PASS|DP=4|F1:F2|SA.1:SA.2|SB.1:SB.2\n")
+        record = VcfRecord.parse_record(input_line, ["SA", "SB"])
+        self.assertEquals(input_line, record.text())
+        self.assertEquals(None, record._columns)
+
+        self.assertEquals("SB.2", record.sample_tag_values["SB"]["F2"])
+        self.assertEquals(input_line, record.text())
+
+    def test_text_splicesChangedFixedFields(self):
+        input_line = self.entab("chr1|1|.|A|C|.|.|DP=4|F1:F2|SA.1:SA.2|SB.1:SB.2\r\n")
+        record = VcfRecord.parse_record(input_line, ["SA", "SB"])
+        record.add_or_replace_filter("foo")
+        record.add_info_field("SOMATIC")
+
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|foo|DP=4;SOMATIC|F1:F2|SA.1:SA.2|SB.1:SB.2\n"),
+                          record.text())
+
+    def test_text_modifiedSamplesRebuildsLine(self):
+        input_line = self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:SA.2|SB.1:SB.2\n")
+        record = VcfRecord.parse_record(input_line, ["SA", "SB"])
+        record.sample_tag_values["SA"]["F1"] = "x"
+
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|x:SA.2|SB.1:SB.2\n"), record.text())
+
+    def test_text_parsedTruncatedSampleIsExpanded(self):
+        input_line = self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:SA.2|SB.1\n")
+        record = VcfRecord.parse_record(input_line, ["SA", "SB"])
+
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:SA.2|SB.1:.\n"), record.text())
+
     def test_sample_field_whenInconsistentTags(self):
         # FYI this should never happen in the wild, but I wanted to test the exception formatting.
         sampleA = OrderedDict([('a','1'), ('b','2')])
@@ -545,12 +724,124 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
             ['a'],
             'SampleA')
 
+    def test_sample_tag_values_parsedRecordIsColumnar(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:SA.2|SB.1\n"), ["SA", "SB"])
+
+        self.assertIsNot(None, record._sample_columns())
+        self.assertEquals(["F1", "F2"], list(record._columns.tag_names))
+        self.assertEquals([["SA.1", "SA.2"], ["SB.1", None]], record._columns.rows)
+        self.assertEquals({"SA": {"F1": "SA.1", "F2": "SA.2"}, "SB": {"F1": "SB.1"}},
+                          record.sample_tag_values)
+        self.assertEquals(["SA", "SB"], list(record.sample_tag_values))
+
+    def test_sample_tag_values_columnarViewWritesThrough(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:SA.2|SB.1:SB.2\n"), ["SA", "SB"])
+
+        record.sample_tag_values["SA"]["F3"] = "SA.3"
+        del record.sample_tag_values["SB"]["F1"]
+        record.sample_tag_values["SB"]["F3"] = "SB.3"
+
+        self.assertEquals(OrderedDict([("F2", "SB.2"), ("F3", "SB.3")]), record.sample_tag_values["SB"])
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2:F3|SA.1:SA.2:SA.3|.:SB.2:SB.3\n"),
+                          record.text())
+
+    def test_sample_tag_values_columnarViewAddsAndRemovesSamples(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1|SA.1|SB.1|SC.1\n"), ["SA", "SB", "SC"])
+        sample_tag_values = record.sample_tag_values
+
+        self.assertEquals(OrderedDict([("F1", "SB.1")]), sample_tag_values["SB"])
+        del sample_tag_values["SA"]
+        sample_tag_values["SD"] = {"F1": "SD.1"}
+
+        self.assertNotIn("SA", sample_tag_values)
+        self.assertRaises(KeyError, lambda: sample_tag_values["SA"])
+        self.assertEquals(["SB", "SC", "SD"], [sample for sample, _ in sample_tag_values.items()])
+        self.assertEquals(["SB.1", "SC.1", "SD.1"], [tags["F1"] for tags in sample_tag_values.values()])
+        self.assertEquals(OrderedDict([("F1", "SC.1")]), sample_tag_values["SC"])
+        self.assertEquals(OrderedDict([("F1", "SD.1")]), sample_tag_values["SD"])
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1|SB.1|SC.1|SD.1\n"), record.text())
+
+    def test_add_sample_tag_value_columnar(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1|SA.1|SB.1\n"), ["SA", "SB"])
+
+        record.add_sample_tag_value("F2", {"SB": 2, "SA": 1})
+
+        self.assertEquals(set(["F1", "F2"]), record.format_tags)
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1:1|SB.1:2\n"), record.text())
+        self.assertRaises(KeyError, record.add_sample_tag_value, "F2", {"SA": 1, "SB": 2})
+        self.assertRaises(KeyError, record.add_sample_tag_value, "F3", {"SA": 1})
+
+    def test_add_tags(self):
+        class _CountTag(object):
+            def add_tag_values(self, vcf_record):
+                count = len([tags for tags in vcf_record.sample_tag_values.values() if "F2" in tags])
+                vcf_record.add_info_field("F2_COUNT={}".format(count))
+                vcf_record.add_or_replace_filter("LOW")
+
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1|SA.1|SB.1\n"), ["SA", "SB"])
+        tags = [MockTag("F2", OrderedDict([("SA", 1), ("SB", 2)])), _CountTag()]
+
+        actual = record.add_tags(tags)
+
+        self.assertIs(record, actual)
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|LOW|F2_COUNT=2|F1:F2|SA.1:1|SB.1:2\n"), record.text())
+
+    def test_add_tags_sampleDict(self):
+        sample_tag_values = OrderedDict([("SA", OrderedDict([("F1", "1")])), ("SB", OrderedDict([("F1", "2")]))])
+        record = VcfRecord("chr1", "1", "A", "C", sample_tag_values=sample_tag_values)
+
+        record.add_tags([MockTag("F2", {"SA": 10, "SB": 20}), MockTag("F3", {"SA": "x", "SB": "y"})])
+
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2:F3|1:10:x|2:20:y\n"), record.text())
+
+    def test_add_tags_invalidTagsRaise(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1|SA.1|SB.1\n"), ["SA", "SB"])
+
+        self.assertRaisesRegexp(KeyError, r"\[F1\] already exists", record.add_tags, [MockTag("F1", {"SA": 1, "SB": 2})])
+        self.assertRaisesRegexp(KeyError, "already exists", record.add_tags, [MockTag("F2", {"SA": 1, "SB": 2}),
+                                                                             MockTag("F2", {"SA": 1, "SB": 2})])
+        self.assertRaisesRegexp(KeyError, "must match", record.add_tags, [MockTag("F3", {"SA": 1})])
+        self.assertRaisesRegexp(KeyError, "must match", record.add_tags, [MockTag("F3", {"SA": 1, "SC": 2})])
+
+    def test_text_columnarInconsistentTagsRaises(self):
+        record = VcfRecord.parse_record(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|SA.1|SB.1:SB.2\n"), ["SA", "SB"])
+
+        self.assertRaisesRegexp(ValueError, "sample format tags are not consistent", record.text)
+
+    def test_text_trustedSkipsConsistencyCheck(self):
+        sample_tag_values = OrderedDict([("SA", OrderedDict([("F1", "1"), ("F2", "2")])),
+                                         ("SB", OrderedDict([("F1", "10"), ("F2", "20")]))])
+        record = VcfRecord("chr1", "1", "A", "C", sample_tag_values=sample_tag_values)
+        self.assertEquals(record.text(), record.text(trusted=True))
+
+        record.sample_tag_values["SB"]["F3"] = "30"
+        self.assertRaises(ValueError, record.text)
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|.|F1:F2|1:2|10:20\n"), record.text(trusted=True))
+
+    def test_text_trustedCheckedWhenDebugging(self):
+        sample_tag_values = OrderedDict([("SA", OrderedDict([("F1", "1")])),
+                                         ("SB", OrderedDict([("F1", "10"), ("F2", "20")]))])
+        record = VcfRecord("chr1", "1", "A", "C", sample_tag_values=sample_tag_values)
+        check_trusted_records = vcf.CHECK_TRUSTED_RECORDS
+        try:
+            vcf.CHECK_TRUSTED_RECORDS = True
+            self.assertRaises(ValueError, record.text, trusted=True)
+        finally:
+            vcf.CHECK_TRUSTED_RECORDS = check_trusted_records
+
+
+    def test_sort_key(self):
+        record = VcfRecord("chr10", "42", "A", "C")
+
+        self.assertEquals(record._key, VcfRecord.sort_key("chr10", "42", "A", "C"))
+        self.assertTrue(VcfRecord.sort_key("chr2", "100", "A", "C") < VcfRecord.sort_key("chr10", "9", "A", "C"))
 
     def test_equals(self):
         sample_names = ["sampleA"]
         base = VcfRecord.parse_record(self.entab("A|1|ID|C|D|QUAL|FILTER|INFO|F|S\n"), sample_names)
         base_equivalent = VcfRecord.parse_record(self.entab("A|1|ID|C|D|QUAL|FILTER||foo|S\n"), sample_names)
         self.assertEquals(base, base_equivalent)
+        self.assertFalse(base != base_equivalent)
         different_chrom = VcfRecord.parse_record(self.entab("Z|1|ID|C|D|QUAL|FILTER||foo|S\n"), sample_names)
         self.assertNotEquals(base, different_chrom)
         different_pos = VcfRecord.parse_record(self.entab("A|2|ID|C|D|QUAL|FILTER||foo|S\n"), sample_names)
@@ -607,6 +898,12 @@ class VcfRecordTestCase(test_case.JacquardBaseTestCase):
 
         self.assertEquals(expected_records, sorted(input_records))
 
+    def test_init_sharesContigKey(self):
+        record1 = VcfRecord("chr1", "1", "A", "C")
+        record2 = VcfRecord("chr1", "2", "A", "C")
+        self.assertIs(record1._key[0], record2._key[0])
+        self.assertIs(record1._key, record1.get_empty_record()._key)
+
     def test_empty_record(self):
         sample_names = ["SampleA"]
         base = VcfRecord.parse_record(self.entab("chr2|1|ID|A|C|QUAL|FILTER|INFO|F|S\n"), sample_names)
@@ -786,6 +1083,32 @@ class VcfReaderTestCase(test_case.JacquardBaseTestCase):
         del reader.format_metaheaders["DP"]
         self.assertEquals(["DP"], sorted(reader.format_metaheaders.keys()))
 
+    def test_replace_metaheader_updatesIndex(self):
+        file_contents = ["##FORMAT=<ID=DP,Number=1>\n",
+                         "##INFO=<ID=SOMATIC,Number=0>\n",
+                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n")]
+        reader = VcfReader(MockFileReader("my_dir/my_file.txt", file_contents))
+        self.assertEquals(["DP"], sorted(reader.format_metaheaders.keys()))
+
+        reader.replace_metaheader("##FORMAT=<ID=DP,Number=1>", "##FORMAT=<ID=JX1_DP,Number=1>")
+
+        self.assertEquals({"JX1_DP": "##FORMAT=<ID=JX1_DP,Number=1>"}, reader.format_metaheaders)
+        self.assertEquals(["SOMATIC"], sorted(reader.info_metaheaders.keys()))
+        self.assertEquals(["##INFO=<ID=SOMATIC,Number=0>", "##FORMAT=<ID=JX1_DP,Number=1>"],
+                          reader.metaheaders)
+
+    def test_metaheaders_reassignedReindexes(self):
+        file_contents = ["##FORMAT=<ID=DP,Number=1>\n",
+                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n")]
+        reader = VcfReader(MockFileReader("my_dir/my_file.txt", file_contents))
+        self.assertEquals(["DP"], sorted(reader.format_metaheaders.keys()))
+
+        reader.metaheaders.append("##FORMAT=<ID=AF,Number=A>")
+        self.assertEquals(["AF", "DP"], sorted(reader.format_metaheaders.keys()))
+        reader.metaheaders = ["##contig=<ID=chr1,length=42>"]
+        self.assertEquals({}, reader.format_metaheaders)
+        self.assertEquals(["chr1"], list(reader.contig_metaheaders.keys()))
+
     def test_sort_delegatesToFileReader(self):
         _FILE_CONTENTS = [
                  "##FORMAT=<ID=DP,Number=1,Type=Integer,Description='Read Depth'>\n",
@@ -806,6 +1129,22 @@ class VcfReaderTestCase(test_case.JacquardBaseTestCase):
 
         self.assertEquals([reader3, reader2, reader1], actual_readers)
 
+    def test_record_lines(self):
+        file_contents = ["##metaheader1\n",
+                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n"),
+                         self.entab("chr1|1|.|A|C|.|.|INFO|FORMAT|NORMAL|TUMOR\n"),
+                         "\n",
+                         self.entab("chr2|1|.|A|C|.|.|INFO|FORMAT|NORMAL|TUMOR")]
+        reader = VcfReader(MockFileReader("my_dir/my_file.txt", file_contents))
+
+        reader.open()
+        actual_lines = list(reader.record_lines())
+        reader.close()
+
+        self.assertEquals([self.entab("chr1|1|.|A|C|.|.|INFO|FORMAT|NORMAL|TUMOR"),
+                           self.entab("chr2|1|.|A|C|.|.|INFO|FORMAT|NORMAL|TUMOR")],
+                          actual_lines)
+
     def test_vcf_records(self):
         file_contents = ["##metaheader1\n",
                          "##metaheader2\n",
@@ -827,6 +1166,34 @@ class VcfReaderTestCase(test_case.JacquardBaseTestCase):
         self.assertTrue(mock_reader.open_was_called)
         self.assertTrue(mock_reader.close_was_called)
 
+    def test_vcf_records_projection(self):
+        file_contents = ["##metaheader1\n",
+                         self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA|SB|SC\n"),
+                         self.entab("chr1|1|.|A|C|.|.|DP=4;SOM;AF=0.1|GT:DP:AF|0/1:4:0.1|0/0:5:0|./.:6:.\n"),
+                         self.entab("chr1|2|.|A|C|.|.|DP=4|AF:GT|0.2:0/1|0.3:0/0|0.4:1/1\n")]
+        reader = VcfReader(MockFileReader("my_dir/my_file.txt", file_contents))
+
+        reader.open()
+        records = list(reader.vcf_records(include_format_tags=["AF", "GT"],
+                                          include_info=["SOM", "AF"],
+                                          include_samples=["SA", "SC"]))
+        reader.close()
+
+        self.assertEquals(self.entab("chr1|1|.|A|C|.|.|SOM;AF=0.1|GT:AF|0/1:0.1|./.:.\n"), records[0].text())
+        self.assertEquals(["SA", "SC"], list(records[0].sample_tag_values.keys()))
+        self.assertEquals(self.entab("chr1|2|.|A|C|.|.|.|AF:GT|0.2:0/1|0.4:1/1\n"), records[1].text())
+        self.assertEquals(OrderedDict([("AF", "0.4"), ("GT", "1/1")]), records[1].sample_tag_values["SC"])
+
+    def test_vcf_records_projectionKeepsAllByDefault(self):
+        line = self.entab("chr1|1|.|A|C|.|.|DP=4|GT:DP|0/1:4|0/0:5\n")
+        reader = VcfReader(MockFileReader("my_dir/my_file.txt", ["##foo\n", self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA|SB\n"), line]))
+
+        reader.open()
+        records = list(reader.vcf_records(include_info=None, include_samples=["SA", "SB"]))
+        reader.close()
+
+        self.assertEquals(line, records[0].text())
+
     def test_vcf_records_raisesStopIterationWhenExhausted(self):
         file_contents = ["##metaheader1\n",
                          self.entab("#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SampleNormal|SampleTumor\n"),
@@ -888,6 +1255,287 @@ class VcfReaderTestCase(test_case.JacquardBaseTestCase):
 
         self.assertEquals(expected_format_set, sorted(actual_format_set.keys()))
 
+class VcfReaderFetchTestCase(test_case.JacquardBaseTestCase):
+    _HEADER = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+    _RECORDS = ["chr1|10|.|A|C|.|.|.|DP|1\n",
+                "chr1|20|.|A|C|.|.|.|DP|2\n",
+                "chr1|30|.|A|C|.|.|.|DP|3\n",
+                "chr1|40|.|A|C|.|.|.|DP|4\n",
+                "chr2|10|.|A|C|.|.|.|DP|5\n",
+                "chr2|20|.|A|C|.|.|.|DP|6\n",
+                "chr3|10|.|A|C|.|.|.|DP|7\n"]
+
+    def setUp(self):
+        test_case.JacquardBaseTestCase.setUp(self)
+        self.saved_interval = vcf._LineOffsetIndex._INTERVAL
+        vcf._LineOffsetIndex._INTERVAL = 2
+
+    def tearDown(self):
+        vcf._LineOffsetIndex._INTERVAL = self.saved_interval
+        test_case.JacquardBaseTestCase.tearDown(self)
+
+    def _content(self):
+        return self.entab(self._HEADER + "".join(self._RECORDS)).encode("ascii")
+
+    @staticmethod
+    def _coordinates(records):
+        return [(record.chrom, record.pos, record.sample_tag_values["SA"]["DP"]) for record in records]
+
+    def test_fetch_plainTextBuildsIndex(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self._content())
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf")))
+
+            actual = self._coordinates(reader.fetch("chr1", 20, 30))
+
+            self.assertEquals([("chr1", "20", "2"), ("chr1", "30", "3")], actual)
+            self.assertTrue(os.path.isfile(os.path.join(input_dir.path, "A.vcf.jqi")))
+
+    def test_fetch_plainTextWholeContig(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self._content())
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf")))
+
+            self.assertEquals([("chr2", "10", "5"), ("chr2", "20", "6")],
+                              self._coordinates(reader.fetch("chr2")))
+            self.assertEquals([("chr3", "10", "7")],
+                              self._coordinates(reader.fetch("chr3", 5)))
+            self.assertEquals([], self._coordinates(reader.fetch("chr4")))
+            self.assertEquals([], self._coordinates(reader.fetch("chr1", 41)))
+
+    def test_fetch_plainTextRebuildsStaleIndex(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self._content())
+            input_dir.write("A.vcf.jqi", b"0\t0\nchr1\t10\t0\n")
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf")))
+
+            self.assertEquals([("chr1", "40", "4")],
+                              self._coordinates(reader.fetch("chr1", 35, 50)))
+            index_lines = input_dir.read("A.vcf.jqi").decode("ascii").splitlines()
+            self.assertNotEquals("0\t0", index_lines[0])
+            self.assertEquals([["chr1", "10"], ["chr1", "30"], ["chr2", "10"], ["chr3", "10"]],
+                              [line.split("\t")[0:2] for line in index_lines[1:]])
+
+    def test_fetch_bgzfUsesTabixIndex(self):
+        lines = [self.entab(line).encode("ascii") for line in self._RECORDS]
+        data, index = bgzf_with_tabix(self.entab(self._HEADER).encode("ascii"), lines)
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf.gz", data)
+            index_file = gzip.open(os.path.join(input_dir.path, "A.vcf.gz.tbi"), "wb")
+            index_file.write(index)
+            index_file.close()
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf.gz")))
+
+            self.assertEquals([("chr1", "30", "3"), ("chr1", "40", "4")],
+                              self._coordinates(reader.fetch("chr1", 25)))
+            self.assertEquals([("chr2", "10", "5")],
+                              self._coordinates(reader.fetch("chr2", 1, 15)))
+            self.assertEquals([], self._coordinates(reader.fetch("chrX")))
+
+    def test_fetch_gzipWithoutIndexScans(self):
+        with TempDirectory() as input_dir:
+            gzip_file = gzip.open(os.path.join(input_dir.path, "A.vcf.gz"), "wb")
+            gzip_file.write(self._content())
+            gzip_file.close()
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf.gz")))
+
+            self.assertEquals([("chr2", "20", "6")],
+                              self._coordinates(reader.fetch("chr2", 20, 20)))
+
+
+class VcfReaderHeaderCacheTestCase(test_case.JacquardBaseTestCase):
+    _CONTENT = "##fileformat=VCFv4.1\n##FORMAT=<ID=DP>\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+
+    def setUp(self):
+        test_case.JacquardBaseTestCase.setUp(self)
+        vcf.clear_header_cache()
+
+    def tearDown(self):
+        vcf.clear_header_cache()
+        test_case.JacquardBaseTestCase.tearDown(self)
+
+    def test_init_readsHeadersOncePerFile(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._CONTENT).encode("ascii"))
+            file_reader = FileReader(os.path.join(input_dir.path, "A.vcf"))
+            first = VcfReader(file_reader)
+            file_reader.open = None
+
+            second = VcfReader(file_reader)
+
+            self.assertEquals(first.column_header, second.column_header)
+            self.assertEquals(first.metaheaders, second.metaheaders)
+            self.assertIsNot(first.metaheaders, second.metaheaders)
+            self.assertIs(first.metaheaders[0], second.metaheaders[0])
+
+    def test_init_cachedMetaheadersAreCopies(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._CONTENT).encode("ascii"))
+            file_reader = FileReader(os.path.join(input_dir.path, "A.vcf"))
+            VcfReader(file_reader).metaheaders.append("##foo")
+
+            self.assertEquals(["##fileformat=VCFv4.1", "##FORMAT=<ID=DP>"],
+                              VcfReader(file_reader).metaheaders)
+
+    def test_init_rereadsChangedFile(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._CONTENT).encode("ascii"))
+            file_path = os.path.join(input_dir.path, "A.vcf")
+            VcfReader(FileReader(file_path))
+            content = self._CONTENT.replace("##FORMAT=<ID=DP>\n", "")
+            input_dir.write("A.vcf", self.entab(content).encode("ascii"))
+            os.utime(file_path, (0, 0))
+
+            self.assertEquals(["##fileformat=VCFv4.1"],
+                              VcfReader(FileReader(file_path)).metaheaders)
+
+    def test_init_cacheEvictsLeastRecentlyUsed(self):
+        original_cache_size = vcf._HEADER_CACHE_SIZE
+        try:
+            vcf._HEADER_CACHE_SIZE = 2
+            with TempDirectory() as input_dir:
+                file_paths = []
+                for name in ("A.vcf", "B.vcf", "C.vcf"):
+                    input_dir.write(name, self.entab(self._CONTENT).encode("ascii"))
+                    file_paths.append(os.path.join(input_dir.path, name))
+                VcfReader(FileReader(file_paths[0]))
+                VcfReader(FileReader(file_paths[1]))
+                VcfReader(FileReader(file_paths[0]))
+                VcfReader(FileReader(file_paths[2]))
+
+                actual = [key[0] for key in vcf._HEADER_CACHE]
+        finally:
+            vcf._HEADER_CACHE_SIZE = original_cache_size
+
+        self.assertEquals([os.path.abspath(file_paths[0]), os.path.abspath(file_paths[2])], actual)
+
+    def test_init_rereadsReplacedFile(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._CONTENT).encode("ascii"))
+            file_path = os.path.join(input_dir.path, "A.vcf")
+            VcfReader(FileReader(file_path))
+            stat = os.stat(file_path)
+            content = self._CONTENT.replace("##FORMAT=<ID=DP>", "##FORMAT=<ID=AF>")
+            input_dir.write("B.vcf", self.entab(content).encode("ascii"))
+            os.rename(os.path.join(input_dir.path, "B.vcf"), file_path)
+            os.utime(file_path, (stat.st_atime, stat.st_mtime))
+
+            self.assertEquals(["##fileformat=VCFv4.1", "##FORMAT=<ID=AF>"],
+                              VcfReader(FileReader(file_path)).metaheaders)
+
+    def test_init_mockReaderNotCached(self):
+        file_reader = MockFileReader("A.vcf", ["##foo", "#CHROM"])
+        VcfReader(file_reader)
+        VcfReader(file_reader)
+
+        self.assertEquals({}, vcf._HEADER_CACHE)
+
+
+class RecordBatchTestCase(test_case.JacquardBaseTestCase):
+    _HEADER = "##fileformat=VCFv4.1\n#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA|SB\n"
+
+    def _record_batches(self, content, size):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._HEADER + content).encode("ascii"))
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf")))
+            reader.open()
+            batches = list(reader.record_batches(size))
+            reader.close()
+        return batches
+
+    def test_record_batches(self):
+        batches = self._record_batches("1|10|.|A|C|.|PASS|.|DP|1|2\n"
+                                       "1|20|.|G|T|.|.|.|DP|3|4\n"
+                                       "2|5|.|T|A|.|q10|.|DP|5|6\n", 2)
+
+        self.assertEquals([2, 1], [len(batch) for batch in batches])
+        self.assertEquals(["1", "1"], batches[0].chroms)
+        self.assertEquals([10, 20], batches[0].positions)
+        self.assertEquals(["A", "G"], batches[0].refs)
+        self.assertEquals(["C", "T"], batches[0].alts)
+        self.assertEquals(["PASS", "."], batches[0].filters)
+        self.assertEquals(["SA", "SB"], batches[1].sample_names)
+        self.assertEquals(["5"], [record.pos for record in batches[1]])
+
+    def test_sample_values(self):
+        batch = self._record_batches("1|10|.|A|C|.|.|.|GT:DP|0/1:1|0/0\n"
+                                     "1|20|.|A|C|.|.|.|GT|0/1|0/0\n"
+                                     "1|30|.|A|C|.|.|.|DP:GT|3:0/1|4:0/0\n", 10)[0]
+        batch.records[2].sample_tag_values["SA"]["DP"] = "7"
+
+        self.assertEquals([["1", None], [None, None], ["7", "4"]],
+                          batch.sample_values("DP"))
+        self.assertEquals([["0/1", "0/0"]] * 3, batch.sample_values("GT"))
+
+    def test_sample_values_dictSamples(self):
+        record = VcfRecord("1", "42", "A", "C",
+                           sample_tag_values=OrderedDict([("SA", {"DP": "4"}), ("SB", {})]))
+
+        self.assertEquals([["4", None]], vcf.RecordBatch([record], ["SA", "SB"]).sample_values("DP"))
+
+
+class SampleMatrixTestCase(test_case.JacquardBaseTestCase):
+    _HEADER = ("##fileformat=VCFv4.1\n"
+               "##FORMAT=<ID=GT,Number=1,Type=String>\n"
+               "##FORMAT=<ID=DP,Number=1,Type=Integer>\n"
+               "##FORMAT=<ID=AF,Number=A,Type=Float>\n"
+               "#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA|SB\n")
+
+    def _sample_matrices(self, content):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", self.entab(self._HEADER + content).encode("ascii"))
+            reader = VcfReader(FileReader(os.path.join(input_dir.path, "A.vcf")))
+            reader.open()
+            matrices = list(reader.sample_matrices(qualified=True))
+            reader.close()
+        return matrices
+
+    def test_sample_matrices(self):
+        matrices = self._sample_matrices("1|42|.|A|C|.|.|.|GT:DP:AF|0/1:5:0.1,0.3|0/0:.:0\n"
+                                         "2|10|.|A|C|.|.|.|GT:AF|0/1:0.5|0/0\n")
+
+        self.assertEquals(["A|SA", "A|SB"], matrices[0].sample_names)
+        self.assertEquals(("GT", "DP", "AF"), matrices[0].tag_names)
+        self.assertEquals([["0/1", "5", "0.1,0.3"], ["0/0", ".", "0"]], matrices[0].values.tolist())
+        self.assertEquals("42", matrices[0].vcf_record.pos)
+        self.assertEquals([["0/1", "0.5"], ["0/0", ""]], matrices[1].values.tolist())
+        self.assertEquals(["0.5", ""], matrices[1].column("AF").tolist())
+        self.assertEquals(["", ""], matrices[1].column("DP").tolist())
+
+    def test_numeric(self):
+        matrix = self._sample_matrices("1|42|.|A|C|.|.|.|GT:DP:AF|0/1:5:0.1,0.3|0/0:.:0\n")[0]
+
+        self.assertEquals([5.0], matrix.numeric("DP")[0:1].tolist())
+        self.assertTrue(vcf.numpy.isnan(matrix.numeric("DP")[1]))
+        self.assertEquals([0.3, 0.0], matrix.numeric("AF").tolist())
+        self.assertRaisesRegexp(utils.JQException,
+                                r"FORMAT tag \[GT\] is Type=String",
+                                matrix.numeric,
+                                "GT")
+
+    def test_from_record_dictSamples(self):
+        sample_tag_values = OrderedDict([("SA", OrderedDict([("DP", "4")])),
+                                         ("SB", OrderedDict([("AF", "0.2")]))])
+        record = VcfRecord("1", "42", "A", "C", sample_tag_values=sample_tag_values)
+
+        matrix = vcf.SampleMatrix.from_record(record)
+
+        self.assertEquals(["SA", "SB"], matrix.sample_names)
+        self.assertEquals(("DP", "AF"), matrix.tag_names)
+        self.assertEquals([["4", ""], ["", "0.2"]], matrix.values.tolist())
+
+    def test_sample_matrices_raisesWithoutNumpy(self):
+        numpy = vcf.numpy
+        try:
+            vcf.numpy = None
+            reader = VcfReader(MockFileReader("A.vcf", ["##foo", "#CHROM"]))
+            self.assertRaisesRegexp(utils.JQException,
+                                    r"require NumPy",
+                                    reader.sample_matrices)
+        finally:
+            vcf.numpy = numpy
+
+
 class VcfWriterTestCase(unittest.TestCase):
     def test_write(self):
         with TempDirectory() as output_file:
@@ -939,6 +1587,113 @@ class FileReaderTestCase(unittest.TestCase):
 
             self.assertEquals(["1\n", "2\n", "3"], actual_lines)
 
+    def test_read_line_blocks(self):
+        with TempDirectory() as input_file:
+            input_file.write("A.tmp", b"1\n22\r\n333\n\n4444\n5")
+            reader = FileReader(os.path.join(input_file.path, "A.tmp"))
+            reader.READ_BLOCK_SIZE = 4
+            reader.open()
+            actual_blocks = list(reader.read_line_blocks())
+            reader.close()
+
+            self.assertEquals(["1", "22\r", "333", "", "4444", "5"],
+                              [line for lines in actual_blocks for line in lines])
+            self.assertEquals([["1"], ["22\r"], ["333", ""], ["4444"], ["5"]], actual_blocks)
+
+    def test_read_line_blocks_vcfRecordsAreNativeStrings(self):
+        with TempDirectory() as input_file:
+            input_file.write("A.vcf", ("##fileformat=VCFv4.1\n"
+                                       "#CHROM|POS|ID|REF|ALT|QUAL|FILTER|INFO|FORMAT|SA\n"
+                                       "chr1|10|.|A|C|.|PASS|DP=4|GT:DP|0/1:4\n"
+                                       "chr2|20|rs1|A|G|.|.|.|GT|0/0\n").replace("|", "\t").encode("utf8"))
+            file_reader = FileReader(os.path.join(input_file.path, "A.vcf"))
+            file_reader.READ_BLOCK_SIZE = 16
+            reader = VcfReader(file_reader)
+            reader.open()
+            actual_records = list(reader.vcf_records())
+            reader.close()
+
+        self.assertEquals(["chr1", "chr2"], [record.chrom for record in actual_records])
+        self.assertEquals([str, str], [type(record.chrom) for record in actual_records])
+        self.assertEquals("chr2\t20\trs1\tA\tG\t.\t.\t.\tGT\t0/0\n", actual_records[1].text())
+
+    def test_read_line_blocks_gzipWithHandlePool(self):
+        with TempDirectory() as input_file:
+            for name in ("A.vcf.gz", "B.vcf.gz"):
+                gzip_file = gzip.open(os.path.join(input_file.path, name), "wb")
+                gzip_file.write(name[0].encode("ascii") + b"1\n" + name[0].encode("ascii") + b"2\n")
+                gzip_file.close()
+            handle_pool = vcf.FileHandlePool(1)
+            readers = [FileReader(os.path.join(input_file.path, name), handle_pool)
+                       for name in ("A.vcf.gz", "B.vcf.gz")]
+            blocks = []
+            for reader in readers:
+                reader.READ_BLOCK_SIZE = 3
+                reader.open()
+                blocks.append(reader.read_line_blocks())
+            actual = [next(blocks[0]), next(blocks[1]), next(blocks[0]), next(blocks[1])]
+            self.assertEquals(1, len(handle_pool))
+            for reader in readers:
+                reader.close()
+
+            self.assertEquals([["A1"], ["B1"], ["A2"], ["B2"]], actual)
+
+    def test_read_lines_gzip(self):
+        with TempDirectory() as input_file:
+            gzip_file = gzip.open(os.path.join(input_file.path, "A.vcf.gz"), "wb")
+            gzip_file.write(b"1\n2\n3")
+            gzip_file.close()
+            reader = FileReader(os.path.join(input_file.path, "A.vcf.gz"))
+            reader.open()
+            actual_lines = [line for line in reader.read_lines()]
+            reader.close()
+
+            self.assertEquals(["1\n", "2\n", "3"], actual_lines)
+
+    def test_read_lines_bgzf(self):
+        with TempDirectory() as input_file:
+            input_file.write("A.vcf.gz", bgzf(b"1\n2", b"2\n3\n", b"4"))
+            reader = FileReader(os.path.join(input_file.path, "A.vcf.gz"))
+            reader.open()
+            actual_lines = [line for line in reader.read_lines()]
+            reader.close()
+
+            self.assertEquals(["1\n", "22\n", "3\n", "4"], actual_lines)
+
+    def test_read_lines_bgzfManyBlocks(self):
+        lines = ["{}\n".format(i) for i in range(1000)]
+        blocks = [line.encode("ascii") for line in lines]
+        with TempDirectory() as input_file:
+            input_file.write("A.vcf.bgz", bgzf(*blocks))
+            reader = FileReader(os.path.join(input_file.path, "A.vcf.bgz"))
+            reader.open()
+            actual_lines = [line for line in reader.read_lines()]
+            reader.close()
+
+            self.assertEquals(lines, actual_lines)
+
+    def test_bgzf_raw_stream_readAhead(self):
+        blocks = ["{}\n".format(i).encode("ascii") for i in range(100)]
+        with TempDirectory() as input_file:
+            input_file.write("A.vcf.gz", bgzf(*blocks))
+            stream = vcf._BgzfRawStream(os.path.join(input_file.path, "A.vcf.gz"), read_ahead=1)
+            try:
+                self.assertEquals(1, stream._inflater.blocks.maxsize)
+                actual = stream.read()
+            finally:
+                stream.close()
+
+            self.assertEquals(b"".join(blocks), actual)
+
+    def test_close_bgzfBeforeExhausted(self):
+        blocks = ["{}\n".format(i).encode("ascii") for i in range(1000)]
+        with TempDirectory() as input_file:
+            input_file.write("A.vcf.gz", bgzf(*blocks))
+            reader = FileReader(os.path.join(input_file.path, "A.vcf.gz"))
+            reader.open()
+            self.assertEquals("0\n", next(reader.read_lines()))
+            reader.close()
+
     def test_read_lines_raisesTypeErrorWhenClosed(self):
         with TempDirectory() as input_file:
             input_file.write("A.tmp", b"1\n2\n3")
@@ -946,6 +1701,118 @@ class FileReaderTestCase(unittest.TestCase):
             line_iter = reader.read_lines()
             self.assertRaises(TypeError, next, line_iter)
 
+class FileHandlePoolTestCase(unittest.TestCase):
+    _LINES = ["1\tA\n", "2\tB\n", "3\tC\n", "4\tD\n"]
+
+    def _read_interleaved(self, file_paths):
+        pool = vcf.FileHandlePool(1)
+        readers = [FileReader(file_path, pool) for file_path in file_paths]
+        iterators = []
+        for reader in readers:
+            reader.open()
+            iterators.append(reader.read_lines())
+        actual = [[] for dummy in readers]
+        for dummy in self._LINES:
+            for i, iterator in enumerate(iterators):
+                actual[i].append(next(iterator))
+                self.assertEquals(1, len(pool))
+        for reader in readers:
+            reader.close()
+        self.assertEquals(0, len(pool))
+        return actual
+
+    def test_read_lines_plainText(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", "".join(self._LINES).encode("utf8"))
+            input_dir.write("B.vcf", "".join(self._LINES[::-1]).encode("utf8"))
+
+            actual = self._read_interleaved([os.path.join(input_dir.path, "A.vcf"),
+                                             os.path.join(input_dir.path, "B.vcf")])
+
+        self.assertEquals([self._LINES, self._LINES[::-1]], actual)
+
+    def test_read_lines_compressed(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf.gz", bgzf(*[line.encode("utf8") for line in self._LINES]))
+            gzip_file = gzip.open(os.path.join(input_dir.path, "B.vcf.gz"), "wb")
+            gzip_file.write("".join(self._LINES).encode("utf8"))
+            gzip_file.close()
+
+            actual = self._read_interleaved([os.path.join(input_dir.path, "A.vcf.gz"),
+                                             os.path.join(input_dir.path, "B.vcf.gz")])
+
+        self.assertEquals([self._LINES, self._LINES], actual)
+
+    def test_bgzf_virtual_offset(self):
+        with TempDirectory() as input_dir:
+            data = bgzf(b"1\n23", b"45\n", b"678")
+            input_dir.write("A.vcf.gz", data)
+            file_path = os.path.join(input_dir.path, "A.vcf.gz")
+            second_block = len(bgzf_block(b"1\n23"))
+            third_block = second_block + len(bgzf_block(b"45\n"))
+            stream = vcf._BgzfRawStream(file_path)
+            actual = []
+            try:
+                actual.append(stream.virtual_offset)
+                self.assertEquals(b"1\n", stream.readline())
+                actual.append(stream.virtual_offset)
+                self.assertEquals(b"2345\n", stream.readline())
+                actual.append(stream.virtual_offset)
+                self.assertEquals(b"67", stream.read(2))
+                actual.append(stream.virtual_offset)
+                self.assertEquals(b"8", stream.readline())
+                actual.append(stream.virtual_offset)
+            finally:
+                stream.close()
+
+        self.assertEquals([0, 2, third_block << 16, third_block << 16 | 2, len(data) << 16], actual)
+
+    def test_read_lines_bgzfResumesAtVirtualOffset(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf.gz", bgzf(*[line.encode("utf8") for line in self._LINES]))
+            file_path = os.path.join(input_dir.path, "A.vcf.gz")
+            second_block = len(bgzf_block(self._LINES[0].encode("utf8")))
+            reader = FileReader(file_path, vcf.FileHandlePool(1))
+            reader.open()
+            lines = reader.read_lines()
+            actual = [next(lines)]
+            reader._suspend()
+            self.assertEquals(second_block << 16, reader._virtual_offset)
+            actual.extend(lines)
+            reader.close()
+
+        self.assertEquals(self._LINES, actual)
+
+    def test_resumes_cheaply(self):
+        with TempDirectory() as input_dir:
+            input_dir.write("A.vcf", b"1\n")
+            input_dir.write("B.vcf.gz", bgzf(b"1\n"))
+            gzip_file = gzip.open(os.path.join(input_dir.path, "C.vcf.gz"), "wb")
+            gzip_file.write(b"1\n")
+            gzip_file.close()
+
+            actual = [FileReader(os.path.join(input_dir.path, name)).resumes_cheaply()
+                      for name in ("A.vcf", "B.vcf.gz", "C.vcf.gz")]
+
+        self.assertEquals([True, True, False], actual)
+
+    def test_init_invalidSize(self):
+        self.assertRaises(ValueError, vcf.FileHandlePool, 0)
+
+
+class VcfFileNameTestCase(unittest.TestCase):
+    def test_is_vcf_file_name(self):
+        self.assertTrue(vcf.is_vcf_file_name("A.vcf"))
+        self.assertTrue(vcf.is_vcf_file_name("A.snp.vcf.gz"))
+        self.assertTrue(vcf.is_vcf_file_name("A.snp.vcf.bgz"))
+        self.assertFalse(vcf.is_vcf_file_name("A.gz"))
+        self.assertFalse(vcf.is_vcf_file_name("A.vcf.fpfilter.pass"))
+
+    def test_split_vcf_extension(self):
+        self.assertEquals(("A.snp", ".vcf"), vcf.split_vcf_extension("A.snp.vcf"))
+        self.assertEquals(("A.snp", ".vcf.gz"), vcf.split_vcf_extension("A.snp.vcf.gz"))
+        self.assertEquals(("A.snp", ".txt"), vcf.split_vcf_extension("A.snp.txt"))
+
 class FileWriterTestCase(unittest.TestCase):
     def test_equality(self):
         self.assertEquals(FileWriter("foo"), FileWriter("foo"))
@@ -974,3 +1841,39 @@ class FileWriterTestCase(unittest.TestCase):
             actual_file.close()
 
             self.assertEquals(["1\n", "2\n", "3"], actual_output)
+
+    def test_write_buffersUntilFull(self):
+        with TempDirectory() as output_file:
+            file_path = os.path.join(output_file.path, "A.tmp")
+            writer = FileWriter(file_path, buffer_size=4)
+            writer.open()
+            writer.write("1\n")
+            self.assertEquals(0, os.path.getsize(file_path))
+            writer.write("2\n")
+            writer._file_writer.flush()
+            self.assertEquals(4, os.path.getsize(file_path))
+            writer.writelines(["3\n"])
+            writer.close()
+
+            self.assertEquals("1\n2\n3\n", output_file.read("A.tmp", encoding="utf8"))
+
+    def test_write_unbuffered(self):
+        with TempDirectory() as output_file:
+            file_path = os.path.join(output_file.path, "A.tmp")
+            writer = FileWriter(file_path, buffer_size=0)
+            writer.open()
+            writer.write("1\n")
+            writer._file_writer.flush()
+            self.assertEquals(2, os.path.getsize(file_path))
+            writer.close()
+
+    def test_write_records(self):
+        with TempDirectory() as output_file:
+            writer = FileWriter(os.path.join(output_file.path, "A.tmp"))
+            writer.open()
+            writer.write_records([VcfRecord("chr1", "1", "A", "C"),
+                                  VcfRecord("chr1", "2", "A", "C")])
+            writer.close()
+
+            self.assertEquals("chr1\t1\t.\tA\tC\t.\t.\t.\t.\nchr1\t2\t.\tA\tC\t.\t.\t.\t.\n",
+                              output_file.read("A.tmp", encoding="utf8"))